@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+"""
+Measure the startup time and memory of many devices.
+
+The "pooled" layout starts devices the way the platform driver does now: a DriverAgent object per device
+sharing the parent's core, started through a pool of max_concurrent_startups greenlets. The "spawn" layout is
+the baseline with the same objects started the way update_driver used to, one greenlet per device as soon as
+its configuration arrives; this is also what max_concurrent_startups 0 does. The "agents" layout additionally
+gives every device its own BasicAgent and runs its core in a greenlet, which is what each device used to
+carry. It needs a VOLTTRON installation. All layouts use the fake driver with the same registry.
+
+--setup-delay makes every device wait before it is set up, standing in for an interface that contacts its
+device while configuring. Startup is timed in a fresh process, and memory is traced in another because
+tracing slows the startup down. The traced memory is the peak while devices start.
+
+Run from the PlatformDriverAgent directory:
+
+    python benchmarks/device_startup.py --devices 1000 10000
+"""
+
+import argparse
+import multiprocessing
+import resource
+import tracemalloc
+from time import perf_counter
+
+import gevent
+from gevent.pool import Pool
+
+from fake_devices import Parent, device_config
+from platform_driver.driver import DriverAgent
+
+LAYOUTS = ("pooled", "spawn", "agents")
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize()
+
+
+def start_device(driver, delay):
+    if delay:
+        gevent.sleep(delay)
+    driver.start()
+
+
+def start_devices(layout, devices, points, max_concurrent_startups, delay, trace, results):
+    if layout == "agents":
+        from volttron.platform.vip.agent import BasicAgent
+    parent = Parent()
+    config = device_config(points)
+    agents = []
+    rss_before = rss_bytes()
+    if trace:
+        tracemalloc.start()
+    start = perf_counter()
+    pool = Pool(max_concurrent_startups if layout == "pooled" else None)
+    for index in range(devices):
+        driver = DriverAgent(parent, config, index % 1000, 0.02, "campus/building/device{}".format(index), 0, 0.0)
+        if layout == "agents":
+            agent = BasicAgent()
+            agents.append(agent)
+            gevent.spawn(agent.core.run)
+        pool.spawn(start_device, driver, delay)
+    pool.join()
+    elapsed = perf_counter() - start
+    traced = 0
+    if trace:
+        _, traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    results.put((elapsed, traced, rss_bytes() - rss_before))
+    for agent in agents:
+        agent.core.stop()
+    parent.scrape_scheduler.stop()
+
+
+def run(layout, devices, points, max_concurrent_startups, delay, trace):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=start_devices, args=(layout, devices, points, max_concurrent_startups,
+                                                                  delay, trace, results))
+    process.start()
+    process.join()
+    if process.exitcode:
+        raise RuntimeError("{} layout failed with exit code {}".format(layout, process.exitcode))
+    return results.get()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--points", type=int, default=20, help="points per device")
+    parser.add_argument("--max-concurrent-startups", type=int, default=50)
+    parser.add_argument("--setup-delay", type=float, default=0.0, help="seconds each device waits before setup")
+    parser.add_argument("--layout", choices=LAYOUTS, nargs="+", default=list(LAYOUTS))
+    args = parser.parse_args()
+
+    for devices in args.devices:
+        for layout in args.layout:
+            options = (layout, devices, args.points, args.max_concurrent_startups, args.setup_delay)
+            elapsed, _, rss = run(*options, False)
+            _, traced, _ = run(*options, True)
+            print("{:>6} devices, {:<6}: {:8.2f} s, {:7.1f} KiB peak traced and {:7.1f} KiB RSS per device".format(
+                devices, layout, elapsed, traced / devices / 1024.0, rss / devices / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
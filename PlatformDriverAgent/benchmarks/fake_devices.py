@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+"""Fake driver devices shared by the benchmarks."""
+
+import os
+import sys
+
+import gevent
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from platform_driver.scheduler import ScrapeScheduler
+
+
+class Parent:
+    """The parts of the platform driver agent a device uses while starting and scraping."""
+    def __init__(self, publish_queue=None):
+        self.vip = None
+        self.core = self
+        self.subscription_cache = None
+        self.batch_publisher = None
+        self.publish_queue = publish_queue
+        # Scrapes are queued but never dispatched.
+        self.scrape_scheduler = ScrapeScheduler(spawn=lambda run: None)
+
+    @staticmethod
+    def spawn(func, *args, **kwargs):
+        return gevent.spawn(func, *args, **kwargs)
+
+    def scrape_starting(self, topic):
+        pass
+
+    def scrape_ending(self, topic):
+        pass
+
+    def record_scrape_duration(self, device_path, duration):
+        pass
+
+
+def device_config(points):
+    """Return a fake driver device configuration with ``points`` floating point registers."""
+    registry = [{"Point Name": "Point{}".format(i),
+                 "Volttron Point Name": "Point{}".format(i),
+                 "Units": "degF",
+                 "Writable": "FALSE",
+                 "Starting Value": "70.0",
+                 "Type": "float"} for i in range(points)]
+    return {"driver_config": {}, "driver_type": "fakedriver", "registry_config": registry, "interval": 60}
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+"""
+Compare setting and clearing global override patterns by scanning every device with fnmatch against the
+OverrideIndex the platform driver uses.
+
+Every pattern is set and then cleared again, as set_override_on and set_override_off do. The "scan"
+version is the bookkeeping the platform driver used before: setting a pattern tests it against every
+device, and clearing one rebuilds the overridden set from all remaining patterns. The "indexed" version
+finds the devices through the DeviceIndex prefix lookup and keeps a reference count per device.
+
+Run from the PlatformDriverAgent directory:
+
+    python benchmarks/override_patterns.py --devices 10000 --patterns 100
+"""
+
+import argparse
+import fnmatch
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from platform_driver.device_index import DeviceIndex
+from platform_driver.override_index import OverrideIndex
+
+
+def scan(devices, patterns):
+    override_patterns, override_devices = set(), set()
+    for pattern in patterns:
+        override_patterns.add(pattern)
+        override_devices.update(device for device in devices if fnmatch.fnmatch(device, pattern))
+    for pattern in patterns:
+        override_patterns.discard(pattern)
+        override_devices.clear()
+        for remaining in override_patterns:
+            override_devices.update(device for device in devices if fnmatch.fnmatch(device, remaining))
+    return override_devices
+
+
+def indexed(devices, patterns):
+    device_index, override_devices = DeviceIndex(devices), OverrideIndex()
+    for pattern in patterns:
+        override_devices.add_pattern(pattern, device_index.match(pattern))
+    for pattern in patterns:
+        override_devices.remove_pattern(pattern)
+    return set(override_devices)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=10000)
+    parser.add_argument("--patterns", type=int, default=100)
+    args = parser.parse_args()
+
+    buildings = args.patterns
+    devices = ["campus/building{}/vav{}".format(i % buildings, i // buildings) for i in range(args.devices)]
+    patterns = ["campus/building{}/*".format(b) for b in range(buildings)]
+
+    for name, run in (("scan", scan), ("indexed", indexed)):
+        start = perf_counter()
+        remaining = run(devices, patterns)
+        assert not remaining
+        print("{} devices, {} patterns, {:<7}: {:8.3f} s".format(len(devices), len(patterns), name,
+                                                                 perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
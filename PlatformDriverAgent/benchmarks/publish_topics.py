@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+"""
+Compare building the publish topics of every point on each scrape with looking them up in the table a device
+builds when it is set up.
+
+"per scrape" calls get_paths_for_point for each point, which formats the depth first topic and splits,
+reverses and joins it into the breadth first topic, as periodic_read used to. "table" calls
+get_point_topics, which periodic_read uses now.
+
+Run from the PlatformDriverAgent directory:
+
+    python benchmarks/publish_topics.py --points 300
+"""
+
+import argparse
+import timeit
+
+from fake_devices import Parent, device_config
+from platform_driver.driver import DriverAgent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=300, help="points per device")
+    parser.add_argument("--scrapes", type=int, default=1000)
+    args = parser.parse_args()
+
+    driver = DriverAgent(Parent(), device_config(args.points), 0, 0.02, "campus/building/device", 0, 0.0)
+    driver.setup_device()
+    points = list(driver.interface.get_register_names())
+
+    def per_scrape():
+        for point in points:
+            driver.get_paths_for_point(point)
+
+    def table():
+        for point in points:
+            driver.get_point_topics(point)
+
+    assert [driver.get_paths_for_point(point) for point in points] == [driver.get_point_topics(point)
+                                                                       for point in points]
+    for name, scrape in (("per scrape", per_scrape), ("table", table)):
+        elapsed = min(timeit.repeat(scrape, number=args.scrapes, repeat=5)) / args.scrapes
+        print("{} points, {:<10}: {:7.3f} ms per scrape".format(len(points), name, elapsed * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+"""
+Compare dispatching scrapes from one timer per device with the platform driver's shared ScrapeScheduler.
+
+Every device is scheduled for the same deadline, which is what happens when many devices share a scrape
+interval and time slot. The script reports the time spent scheduling, the number of timers left waiting
+in the gevent hub, and how late the callbacks ran. The per device case uses one gevent timer each, like the
+core.schedule event every device used to hold; it creates its greenlets when scheduling, while the shared
+scheduler creates them when the deadline is reached.
+
+Run from the PlatformDriverAgent directory:
+
+    python benchmarks/scheduler_dispatch.py --devices 100 1000 10000
+"""
+
+import argparse
+import os
+import sys
+from time import perf_counter
+from datetime import datetime, timedelta, timezone
+
+import gevent
+from gevent.event import Event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from platform_driver.scheduler import ScrapeScheduler
+
+
+class Recorder:
+    def __init__(self, expected):
+        self.expected = expected
+        self.lateness = []
+        self.done = Event()
+
+    def __call__(self, deadline):
+        self.lateness.append((datetime.now(timezone.utc) - deadline).total_seconds())
+        if len(self.lateness) == self.expected:
+            self.done.set()
+
+
+def active_timers():
+    return gevent.get_hub().loop.activecnt
+
+
+def per_device_timers(devices, deadline):
+    recorder = Recorder(devices)
+    start = perf_counter()
+    delay = (deadline - datetime.now(timezone.utc)).total_seconds()
+    for _ in range(devices):
+        gevent.spawn_later(delay, recorder, deadline)
+    scheduling = perf_counter() - start
+    timers = active_timers()
+    recorder.done.wait()
+    return scheduling, timers, recorder.lateness
+
+
+def shared_scheduler(devices, deadline):
+    recorder = Recorder(devices)
+    scheduler = ScrapeScheduler()
+    start = perf_counter()
+    for _ in range(devices):
+        scheduler.schedule(deadline, recorder, deadline)
+    scheduling = perf_counter() - start
+    gevent.sleep(0)
+    timers = active_timers()
+    recorder.done.wait()
+    scheduler.stop()
+    return scheduling, timers, recorder.lateness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--lead", type=float, default=0.5, help="seconds between scheduling and the deadline")
+    args = parser.parse_args()
+
+    for devices in args.devices:
+        for name, run in (("per device timers", per_device_timers), ("shared scheduler", shared_scheduler)):
+            deadline = datetime.now(timezone.utc) + timedelta(seconds=args.lead)
+            scheduling, timers, lateness = run(devices, deadline)
+            print("{:>6} devices, {:<17}: scheduling {:7.2f} ms, hub watchers {:>6}, last dispatch {:7.2f} ms "
+                  "late, mean {:7.2f} ms".format(devices, name, scheduling * 1e3, timers, max(lateness) * 1e3,
+                                                 sum(lateness) / len(lateness) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+"""
+Measure how scraping scales when devices are sharded across platform driver processes.
+
+Each process owns the devices shard_for_device assigns to it, exactly as a shard does, sets them up as fake
+driver devices and scrapes each of them repeatedly with periodic_read. Publishes go through the publish queue
+to a publish function that JSON encodes them, standing in for the message bus. The script reports device
+scrapes per second and how evenly the devices were spread.
+
+Shards only add throughput when there is a CPU for each of them. With fewer CPUs than shards the processes
+take turns and the rate stays that of one process.
+
+Run from the PlatformDriverAgent directory:
+
+    python benchmarks/shard_throughput.py --devices 2000 --points 100 --shards 1 2 4
+"""
+
+import argparse
+import multiprocessing
+import os
+from time import monotonic
+
+import gevent
+
+from fake_devices import Parent, device_config
+from volttron.platform import jsonapi
+
+from platform_driver.driver import DriverAgent
+from platform_driver.publish_queue import PublishQueue
+from platform_driver.scheduler import ScrapeScheduler
+from platform_driver.sharding import shard_for_device, SHARD_BY_HASH, SHARD_METHODS
+
+
+def device_topics(devices):
+    return ["campus/building{}/device{}".format(i // 100, i) for i in range(devices)]
+
+
+def publish(topic, headers, message):
+    jsonapi.dumps({"topic": topic, "headers": headers, "message": message})
+
+
+def process_shard(topics, points, rounds, ready, results):
+    queue = PublishQueue(publish)
+    parent = Parent(queue)
+    config = device_config(points)
+    drivers = []
+    for index, topic in enumerate(topics):
+        driver = DriverAgent(parent, config, index % 1000, 0.02, topic, 0, 0.0)
+        driver.start()
+        # The platform driver's default publish types.
+        driver.update_publish_types(True, False, True, False)
+        drivers.append(driver)
+
+    # Every shard finishes setting up its devices before any of them starts scraping.
+    ready.wait()
+    start = monotonic()
+    for scrape in range(rounds):
+        for driver in drivers:
+            driver.periodic_read(ScrapeScheduler.now())
+            while len(queue):
+                gevent.sleep(0)
+    results.put((start, monotonic()))
+    queue.stop()
+
+
+def run(devices, points, rounds, shards, shard_by):
+    topics = device_topics(devices)
+    assigned = [[] for _ in range(shards)]
+    for index, topic in enumerate(topics):
+        assigned[shard_for_device(topic, index % 10, shards, shard_by)].append(topic)
+    ready = multiprocessing.Barrier(shards)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=process_shard, args=(shard_topics, points, rounds, ready, results))
+                 for shard_topics in assigned]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            raise RuntimeError("shard process failed with exit code {}".format(process.exitcode))
+    times = [results.get() for _ in processes]
+    elapsed = max(end for _, end in times) - min(start for start, _ in times)
+    sizes = [len(shard_topics) for shard_topics in assigned]
+    return devices * rounds / elapsed, min(sizes), max(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--points", type=int, default=100, help="points per device")
+    parser.add_argument("--rounds", type=int, default=3, help="scrapes of every device")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--shard-by", choices=SHARD_METHODS, default=SHARD_BY_HASH)
+    args = parser.parse_args()
+
+    print("{} CPUs available".format(os.cpu_count()))
+    for shards in args.shards:
+        rate, smallest, largest = run(args.devices, args.points, args.rounds, shards, args.shard_by)
+        print("{:>2} shards: {:9.0f} device scrapes/s, {}-{} devices per shard".format(shards, rate, smallest,
+                                                                                   largest))
+
+
+if __name__ == '__main__':
+    main()
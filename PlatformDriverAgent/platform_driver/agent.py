@@ -37,26 +37,49 @@
 # }}}
 
 import logging
+import sqlite3
 import sys
 import gevent
+from gevent.pool import Pool
 from collections import defaultdict
-from volttron.platform.vip.agent import Agent, RPC
+from volttron.platform.vip.agent import Agent, Core, RPC
+from volttron.platform.vip.agent.errors import Again
 from volttron.platform.agent import utils
 from volttron.platform.agent import math_utils
 from volttron.platform.agent.known_identities import PLATFORM_DRIVER
+from volttron.platform.messaging import headers as headers_mod
 from .driver import DriverAgent
 import resource
 from datetime import datetime, timedelta
 import bisect
-import fnmatch
 from volttron.platform import jsonapi
 from .interfaces import DriverInterfaceError
-from .driver_locks import configure_socket_lock, configure_publish_lock
+from .driver_locks import (configure_socket_lock, configure_endpoint_limit,
+                           clear_endpoint_limits, get_lock_statistics)
+from .scheduler import ScrapeScheduler, TickClock
+from .slot_allocator import SlotAllocator
+from .sharding import shard_for_device, SHARD_METHODS, SHARD_BY_HASH
+from .lifecycle import DeviceChangeQueue, StartupProgress
+from .interface_registry import interface_registry
+from .registry_cache import registry_cache
+from .batch_publisher import BatchPublisher, DEFAULT_BATCH_TOPIC
+from .deadband import merge_changes
+from .publish_queue import PublishQueue, OVERFLOW_POLICIES, OVERFLOW_DROP_OLDEST
+from .publish_buffer import PublishBuffer, DEFAULT_PUBLISH_BUFFER_FILE
+from .subscriptions import SubscriptionCache
+from .device_index import DeviceIndex
+from .override_index import OverrideIndex
+from .revert_engine import RevertEngine
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
 __version__ = '4.0'
 
+SHARD_RPC_TIMEOUT = 60.0
+# Separates the shard identity from the revert job id in the job ids set_override_on returns with shards.
+SHARD_JOB_SEPARATOR = "/"
+SUBSCRIPTION_LIST_TIMEOUT = 10.0
+
 
 class OverrideError(DriverInterfaceError):
     """Error raised when the user tries to set/revert point when global override is set."""
@@ -94,9 +117,23 @@ def platform_driver_agent(config_path, **kwargs):
             system_socket_limit = soft
 
     max_open_sockets = get_config('max_open_sockets', None)
-
-    # TODO: update the default after scalability testing.
-    max_concurrent_publishes = get_config('max_concurrent_publishes', 10000)
+    max_concurrent_startups = get_config('max_concurrent_startups', 50)
+    max_concurrent_bulk_requests = get_config('max_concurrent_bulk_requests', 50)
+    revert_concurrency = get_config('revert_concurrency', 20)
+    revert_endpoint_concurrency = get_config('revert_endpoint_concurrency', 0)
+    revert_timeout = get_config('revert_timeout', 30.0)
+    revert_stagger_interval = get_config('revert_stagger_interval', 0.05)
+    endpoint_limits = get_config('endpoint_limits', {})
+    shards = get_config('shards', [])
+    shard_by = get_config('shard_by', SHARD_BY_HASH)
+
+    max_concurrent_publishes = get_config('max_concurrent_publishes', 50)
+    publish_queue_size = get_config('publish_queue_size', 10000)
+    publish_queue_overflow = get_config('publish_queue_overflow', OVERFLOW_DROP_OLDEST)
+    publish_max_retries = get_config('publish_max_retries', -1)
+    publish_buffer_size = get_config('publish_buffer_size', 0)
+    publish_buffer_file = get_config('publish_buffer_file', DEFAULT_PUBLISH_BUFFER_FILE)
+    publish_buffer_replay_rate = get_config('publish_buffer_replay_rate', 50.0)
 
     driver_config_list = get_config('driver_config_list')
     
@@ -104,6 +141,7 @@ def platform_driver_agent(config_path, **kwargs):
     scalability_test_iterations = get_config('scalability_test_iterations', 3)
 
     driver_scrape_interval = get_config('driver_scrape_interval', 0.02)
+    scrape_clock_resolution = get_config('scrape_clock_resolution', 0.1)
 
     if config.get("driver_config_list") is not None:
         _log.warning("Platform driver configured with old setting. This is no longer supported.")
@@ -113,8 +151,16 @@ def platform_driver_agent(config_path, **kwargs):
     publish_breadth_first_all = bool(get_config("publish_breadth_first_all", False))
     publish_depth_first = bool(get_config("publish_depth_first", False))
     publish_breadth_first = bool(get_config("publish_breadth_first", False))
+    include_metadata = bool(get_config("include_metadata", True))
+    subscription_aware_publishing = bool(get_config("subscription_aware_publishing", False))
+    subscription_refresh_interval = get_config("subscription_refresh_interval", 60.0)
 
     group_offset_interval = get_config("group_offset_interval", 0.0)
+    adaptive_time_slots = bool(get_config("adaptive_time_slots", False))
+
+    batch_publish_window = get_config("batch_publish_window", 0.0)
+    batch_publish_topic = get_config("batch_publish_topic", DEFAULT_BATCH_TOPIC)
+    batch_publish_only = bool(get_config("batch_publish_only", False))
 
     return PlatformDriverAgent(driver_config_list, scalability_test,
                              scalability_test_iterations,
@@ -127,6 +173,29 @@ def platform_driver_agent(config_path, **kwargs):
                              publish_breadth_first_all,
                              publish_depth_first,
                              publish_breadth_first,
+                             adaptive_time_slots,
+                             endpoint_limits,
+                             shards,
+                             shard_by,
+                             max_concurrent_startups,
+                             batch_publish_window,
+                             batch_publish_topic,
+                             batch_publish_only,
+                             publish_queue_size,
+                             publish_queue_overflow,
+                             include_metadata,
+                             subscription_aware_publishing,
+                             subscription_refresh_interval,
+                             publish_buffer_size,
+                             publish_buffer_file,
+                             publish_buffer_replay_rate,
+                             scrape_clock_resolution,
+                             max_concurrent_bulk_requests,
+                             revert_concurrency,
+                             revert_endpoint_concurrency,
+                             revert_timeout,
+                             revert_stagger_interval,
+                             publish_max_retries,
                              heartbeat_autostart=True, **kwargs)
 
 
@@ -136,12 +205,35 @@ class PlatformDriverAgent(Agent):
                  driver_scrape_interval=0.02,
                  group_offset_interval=0.0,
                  max_open_sockets=None,
-                 max_concurrent_publishes=10000,
+                 max_concurrent_publishes=50,
                  system_socket_limit=None,
                  publish_depth_first_all=True,
                  publish_breadth_first_all=False,
                  publish_depth_first=False,
                  publish_breadth_first=False,
+                 adaptive_time_slots=False,
+                 endpoint_limits=None,
+                 shards=None,
+                 shard_by=SHARD_BY_HASH,
+                 max_concurrent_startups=50,
+                 batch_publish_window=0.0,
+                 batch_publish_topic=DEFAULT_BATCH_TOPIC,
+                 batch_publish_only=False,
+                 publish_queue_size=10000,
+                 publish_queue_overflow=OVERFLOW_DROP_OLDEST,
+                 include_metadata=True,
+                 subscription_aware_publishing=False,
+                 subscription_refresh_interval=60.0,
+                 publish_buffer_size=0,
+                 publish_buffer_file=DEFAULT_PUBLISH_BUFFER_FILE,
+                 publish_buffer_replay_rate=50.0,
+                 scrape_clock_resolution=0.1,
+                 max_concurrent_bulk_requests=50,
+                 revert_concurrency=20,
+                 revert_endpoint_concurrency=0,
+                 revert_timeout=30.0,
+                 revert_stagger_interval=0.05,
+                 publish_max_retries=-1,
                  **kwargs):
         super(PlatformDriverAgent, self).__init__(**kwargs)
         self.instances = {}
@@ -160,17 +252,54 @@ class PlatformDriverAgent(Agent):
             self.group_offset_interval = 0.0
 
         self.system_socket_limit = system_socket_limit
+        self.scrape_scheduler = ScrapeScheduler(clock=TickClock(formatter=utils.format_timestamp,
+                                                                date_headers=(headers_mod.DATE,
+                                                                              headers_mod.TIMESTAMP),
+                                                                sync_header=headers_mod.SYNC_TIMESTAMP))
         self.freed_time_slots = defaultdict(list)
         self.group_counts = defaultdict(int)
+        self.adaptive_time_slots = bool(adaptive_time_slots)
+        self.slot_allocator = SlotAllocator(self.driver_scrape_interval, self.group_offset_interval)
         self._name_map = {}
+        self.device_index = DeviceIndex()
 
         self.publish_depth_first_all = bool(publish_depth_first_all)
         self.publish_breadth_first_all = bool(publish_breadth_first_all)
         self.publish_depth_first = bool(publish_depth_first)
         self.publish_breadth_first = bool(publish_breadth_first)
-        self._override_devices = set()
+        self.include_metadata = bool(include_metadata)
+        self.subscription_cache = None
+        self._subscription_refresh = None
+        self.batch_publisher = None
+        self.publish_max_retries = int(publish_max_retries)
+        self.publish_queue = PublishQueue(self._publish_message, workers=10, retry_on=(Again,),
+                                          max_retries=self.publish_max_retries, collapse=merge_changes)
+        self.publish_buffer = None
+        # Overridden devices and the patterns covering each of them.
+        self._override_devices = OverrideIndex()
         self._override_patterns = None
+        self.revert_engine = RevertEngine()
+        self.revert_stagger_interval = 0.05
         self._override_interval_events = {}
+        self._shard_identities = []
+        self._shard_index = 0
+        self.shard_by = shard_by
+        self._device_shards = {}
+        self._device_changes = DeviceChangeQueue()
+        self._device_change_greenlet = None
+        self.startup_progress = StartupProgress()
+        try:
+            self.max_concurrent_startups = int(max_concurrent_startups)
+        except (TypeError, ValueError):
+            _log.warning("Invalid max_concurrent_startups, setting to default value.")
+            self.max_concurrent_startups = 50
+        self.startup_pool = Pool(self.max_concurrent_startups if self.max_concurrent_startups > 0 else None)
+        try:
+            self.max_concurrent_bulk_requests = int(max_concurrent_bulk_requests)
+        except (TypeError, ValueError):
+            _log.warning("Invalid max_concurrent_bulk_requests, setting to default value.")
+            self.max_concurrent_bulk_requests = 50
+        self.bulk_pool = Pool(self.max_concurrent_bulk_requests if self.max_concurrent_bulk_requests > 0 else None)
 
         if scalability_test:
             self.waiting_to_finish = set()
@@ -181,18 +310,41 @@ class PlatformDriverAgent(Agent):
         self.default_config = {"scalability_test": scalability_test,
                                "scalability_test_iterations": scalability_test_iterations,
                                "max_open_sockets": max_open_sockets,
+                               "endpoint_limits": endpoint_limits or {},
+                               "shards": shards or [],
+                               "shard_by": shard_by,
+                               "max_concurrent_startups": self.max_concurrent_startups,
+                               "max_concurrent_bulk_requests": self.max_concurrent_bulk_requests,
+                               "revert_concurrency": revert_concurrency,
+                               "revert_endpoint_concurrency": revert_endpoint_concurrency,
+                               "revert_timeout": revert_timeout,
+                               "revert_stagger_interval": revert_stagger_interval,
                                "max_concurrent_publishes": max_concurrent_publishes,
+                               "publish_queue_size": publish_queue_size,
+                               "publish_queue_overflow": publish_queue_overflow,
+                               "publish_max_retries": self.publish_max_retries,
+                               "publish_buffer_size": publish_buffer_size,
+                               "publish_buffer_file": publish_buffer_file,
+                               "publish_buffer_replay_rate": publish_buffer_replay_rate,
                                "driver_scrape_interval": self.driver_scrape_interval,
                                "group_offset_interval": self.group_offset_interval,
+                               "scrape_clock_resolution": scrape_clock_resolution,
+                               "adaptive_time_slots": self.adaptive_time_slots,
                                "publish_depth_first_all": self.publish_depth_first_all,
                                "publish_breadth_first_all": self.publish_breadth_first_all,
                                "publish_depth_first": self.publish_depth_first,
-                               "publish_breadth_first": self.publish_breadth_first}
+                               "publish_breadth_first": self.publish_breadth_first,
+                               "include_metadata": self.include_metadata,
+                               "subscription_aware_publishing": bool(subscription_aware_publishing),
+                               "subscription_refresh_interval": subscription_refresh_interval,
+                               "batch_publish_window": batch_publish_window,
+                               "batch_publish_topic": batch_publish_topic,
+                               "batch_publish_only": bool(batch_publish_only)}
 
         self.vip.config.set_default("config", self.default_config)
         self.vip.config.subscribe(self.configure_main, actions=["NEW", "UPDATE"], pattern="config")
-        self.vip.config.subscribe(self.update_driver, actions=["NEW", "UPDATE"], pattern="devices/*")
-        self.vip.config.subscribe(self.remove_driver, actions="DELETE", pattern="devices/*")
+        self.vip.config.subscribe(self.queue_device_change, actions=["NEW", "UPDATE", "DELETE"],
+                                  pattern="devices/*")
         
     def configure_main(self, config_name, action, contents):
         config = self.default_config.copy()
@@ -217,16 +369,67 @@ class PlatformDriverAgent(Agent):
 
                 self.max_concurrent_publishes = config['max_concurrent_publishes']
                 max_concurrent_publishes = int(self.max_concurrent_publishes)
+                self.publish_queue_size = int(config['publish_queue_size'])
+                self.publish_queue_overflow = config['publish_queue_overflow']
+                if self.publish_queue_overflow not in OVERFLOW_POLICIES:
+                    raise ValueError("publish_queue_overflow must be one of " + ", ".join(OVERFLOW_POLICIES))
                 if max_concurrent_publishes < 1:
                     _log.warning("No limit set on the maximum number of concurrent driver publishes. "
                                  "Consider setting max_concurrent_publishes if you plan to work with many devices.")
+                    max_concurrent_publishes = self.publish_queue_size
                 else:
                     _log.info("maximum concurrent driver publishes limited to " + str(max_concurrent_publishes))
-                configure_publish_lock(max_concurrent_publishes)
+                publish_queue = PublishQueue(self._publish_message, workers=max_concurrent_publishes,
+                                             max_size=self.publish_queue_size,
+                                             overflow=self.publish_queue_overflow, retry_on=(Again,),
+                                             max_retries=self.publish_max_retries, collapse=merge_changes)
+                # Keep anything published before the configuration was loaded.
+                publish_queue.take_over(self.publish_queue)
+                self.publish_queue = publish_queue
+                self.publish_buffer_size = int(config['publish_buffer_size'])
+                self.publish_buffer_file = config['publish_buffer_file']
+                self.publish_buffer_replay_rate = float(config['publish_buffer_replay_rate'])
+                self._configure_publish_buffer()
+
+                try:
+                    self.max_concurrent_startups = int(config['max_concurrent_startups'])
+                except (TypeError, ValueError):
+                    _log.warning("Invalid max_concurrent_startups, setting to default value.")
+                    self.max_concurrent_startups = 50
+                # Devices already starting keep their place in the previous pool.
+                self.startup_pool = Pool(self.max_concurrent_startups if self.max_concurrent_startups > 0 else None)
+                try:
+                    self.max_concurrent_bulk_requests = int(config['max_concurrent_bulk_requests'])
+                except (TypeError, ValueError):
+                    _log.warning("Invalid max_concurrent_bulk_requests, setting to default value.")
+                    self.max_concurrent_bulk_requests = 50
+                self.bulk_pool = Pool(self.max_concurrent_bulk_requests
+                                      if self.max_concurrent_bulk_requests > 0 else None)
+
+                try:
+                    self.revert_concurrency = int(config['revert_concurrency'])
+                except (TypeError, ValueError):
+                    _log.warning("Invalid revert_concurrency, setting to default value.")
+                    self.revert_concurrency = 20
+                try:
+                    self.revert_endpoint_concurrency = int(config['revert_endpoint_concurrency'])
+                except (TypeError, ValueError):
+                    _log.warning("Invalid revert_endpoint_concurrency, setting to default value.")
+                    self.revert_endpoint_concurrency = 0
+                try:
+                    self.revert_timeout = float(config['revert_timeout'])
+                except (TypeError, ValueError):
+                    _log.warning("Invalid revert_timeout, setting to default value.")
+                    self.revert_timeout = 30.0
+                self.revert_engine = RevertEngine(self.revert_concurrency, self.revert_timeout,
+                                                  self.revert_endpoint_concurrency)
 
                 self.scalability_test = bool(config["scalability_test"])
                 self.scalability_test_iterations = int(config["scalability_test_iterations"])
 
+                self.shards = config["shards"]
+                self._configure_shards(self.shards, config["shard_by"])
+
                 if self.scalability_test:
                     self.waiting_to_finish = set()
                     self.test_iterations = 0
@@ -243,10 +446,39 @@ class PlatformDriverAgent(Agent):
                 _log.info("The platform driver must be restarted for changes to the max_open_sockets setting to take "
                           "effect")
 
+            if self.shards != config["shards"] or self.shard_by != config["shard_by"]:
+                _log.info("The platform driver must be restarted for changes to the shards or shard_by settings to "
+                          "take effect")
+
+            if self.max_concurrent_startups != config["max_concurrent_startups"]:
+                _log.info("The platform driver must be restarted for changes to the max_concurrent_startups setting to "
+                          "take effect")
+
+            if (self.revert_concurrency != config["revert_concurrency"] or
+                    self.revert_endpoint_concurrency != config["revert_endpoint_concurrency"] or
+                    self.revert_timeout != config["revert_timeout"]):
+                _log.info("The platform driver must be restarted for changes to the revert_concurrency, "
+                          "revert_endpoint_concurrency or revert_timeout settings to take effect")
+
+            if self.max_concurrent_bulk_requests != config["max_concurrent_bulk_requests"]:
+                _log.info("The platform driver must be restarted for changes to the max_concurrent_bulk_requests "
+                          "setting to take effect")
+
             if self.max_concurrent_publishes != config["max_concurrent_publishes"]:
                 _log.info("The platform driver must be restarted for changes to the max_concurrent_publishes setting to "
                           "take effect")
 
+            if (self.publish_queue_size != config["publish_queue_size"] or
+                    self.publish_queue_overflow != config["publish_queue_overflow"]):
+                _log.info("The platform driver must be restarted for changes to the publish_queue_size or "
+                          "publish_queue_overflow settings to take effect")
+
+            if (self.publish_buffer_size != config["publish_buffer_size"] or
+                    self.publish_buffer_file != config["publish_buffer_file"] or
+                    self.publish_buffer_replay_rate != config["publish_buffer_replay_rate"]):
+                _log.info("The platform driver must be restarted for changes to the publish_buffer_* settings to "
+                          "take effect")
+
             if self.scalability_test != bool(config["scalability_test"]):
                 if not self.scalability_test:
                     _log.info(
@@ -262,6 +494,8 @@ class PlatformDriverAgent(Agent):
             except ValueError:
                 pass
 
+        self._configure_endpoint_limits(config["endpoint_limits"])
+
         # update override patterns
         if self._override_patterns is None:
             try:
@@ -303,37 +537,268 @@ class PlatformDriverAgent(Agent):
             _log.error("Platform driver group interval settings unchanged")
             # TODO: set a health status for the agent
 
+        try:
+            self.revert_stagger_interval = float(config["revert_stagger_interval"])
+        except (TypeError, ValueError) as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver revert stagger interval unchanged")
+
+        try:
+            self.publish_max_retries = int(config["publish_max_retries"])
+            self.publish_queue.max_retries = self.publish_max_retries
+        except (TypeError, ValueError) as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver publish retry limit unchanged")
+
+        try:
+            scrape_clock_resolution = float(config["scrape_clock_resolution"])
+            if scrape_clock_resolution < 0.0:
+                raise ValueError("scrape_clock_resolution may not be negative")
+            self.scrape_scheduler.clock.resolution = scrape_clock_resolution
+        except (TypeError, ValueError) as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver scrape clock resolution unchanged")
+
         if self.scalability_test and action == "UPDATE":
             _log.info("Running scalability test. Settings may not be changed without restart.")
             return
 
+        adaptive_time_slots = bool(config["adaptive_time_slots"])
+
         if (self.driver_scrape_interval != driver_scrape_interval or
-                self.group_offset_interval != group_offset_interval):
+                self.group_offset_interval != group_offset_interval or
+                self.adaptive_time_slots != adaptive_time_slots):
             self.driver_scrape_interval = driver_scrape_interval
             self.group_offset_interval = group_offset_interval
+            self.adaptive_time_slots = adaptive_time_slots
 
             _log.info("Setting time delta between driver device scrapes to  " + str(driver_scrape_interval))
 
-            # Reset all scrape schedules
-            self.freed_time_slots.clear()
-            self.group_counts.clear()
-            for driver in self.instances.values():
-                time_slot = self.group_counts[driver.group]
-                driver.update_scrape_schedule(time_slot, self.driver_scrape_interval,
-                                              driver.group, self.group_offset_interval)
-                self.group_counts[driver.group] += 1
+            self._reset_scrape_schedules()
 
         self.publish_depth_first_all = bool(config["publish_depth_first_all"])
         self.publish_breadth_first_all = bool(config["publish_breadth_first_all"])
         self.publish_depth_first = bool(config["publish_depth_first"])
         self.publish_breadth_first = bool(config["publish_breadth_first"])
+        self.include_metadata = bool(config["include_metadata"])
+
+        self._configure_batch_publisher(config["batch_publish_window"], config["batch_publish_topic"],
+                                        bool(config["batch_publish_only"]))
+
+        self._configure_subscription_cache(bool(config["subscription_aware_publishing"]),
+                                           config["subscription_refresh_interval"])
 
         # Update the publish settings on running devices.
         for driver in self.instances.values():
             driver.update_publish_types(self.publish_depth_first_all,
                                         self.publish_breadth_first_all,
                                         self.publish_depth_first,
-                                        self.publish_breadth_first)
+                                        self.publish_breadth_first,
+                                        self.include_metadata)
+
+    @Core.receiver('onstop')
+    def onstop(self, sender, **kwargs):
+        if self._device_change_greenlet is not None:
+            self._device_change_greenlet.kill(block=False)
+        self.startup_pool.kill(block=False)
+        self.bulk_pool.kill(block=False)
+        self.revert_engine.stop()
+        self.scrape_scheduler.stop()
+        if self.batch_publisher is not None:
+            self.batch_publisher.flush_all()
+        self.publish_queue.stop()
+        if self.publish_buffer is not None:
+            self.publish_buffer.stop()
+        if self._subscription_refresh is not None:
+            self._subscription_refresh.kill()
+
+    def _configure_subscription_cache(self, enabled, refresh_interval):
+        """
+        With subscription aware publishing, devices skip depth first and breadth first topics that nobody is
+        subscribed to. The subscriptions on the message bus are listed every refresh_interval seconds.
+        """
+        if self._subscription_refresh is not None:
+            self._subscription_refresh.kill()
+            self._subscription_refresh = None
+        if not enabled:
+            self.subscription_cache = None
+            return
+        try:
+            refresh_interval = float(refresh_interval)
+            if refresh_interval <= 0.0:
+                raise ValueError
+        except (TypeError, ValueError):
+            _log.error("Invalid subscription_refresh_interval {}, using 60 seconds.".format(refresh_interval))
+            refresh_interval = 60.0
+        if self.subscription_cache is None:
+            self.subscription_cache = SubscriptionCache()
+        self._subscription_refresh = self.core.periodic(refresh_interval, self.refresh_subscriptions)
+
+    def _configure_publish_buffer(self):
+        """
+        Keep publishes that fail on disk and replay them once the message bus recovers when publish_buffer_size is
+        greater than zero. Replay only runs while the publish queue is idle.
+        """
+        if self.publish_buffer_size <= 0:
+            return
+        try:
+            self.publish_buffer = PublishBuffer(self.publish_buffer_file, self._publish_message,
+                                                self.publish_buffer_size, self.publish_buffer_replay_rate,
+                                                is_idle=self.publish_queue.is_idle)
+        except sqlite3.Error as e:
+            _log.error("Unable to open publish buffer {}, buffering disabled: {}".format(self.publish_buffer_file, e))
+            return
+        self.publish_queue.on_failure = self.publish_buffer.store
+        self.publish_buffer.start()
+        _log.info("Buffering up to {} failed publishes in {}".format(self.publish_buffer_size,
+                                                                     self.publish_buffer_file))
+
+    def _publish_message(self, topic, headers, message):
+        self.vip.pubsub.publish('pubsub', topic, headers=headers, message=message).get(timeout=10.0)
+
+    def _configure_batch_publisher(self, window, topic, publish_only):
+        """
+        Enable batching of device "all" publishes when batch_publish_window is greater than zero. The batch
+        publisher is only replaced when its settings change; a batch still open under the previous settings is
+        published first.
+        """
+        try:
+            window = float(window)
+        except (TypeError, ValueError):
+            _log.error("Invalid batch_publish_window {}, batch publishing disabled.".format(window))
+            window = 0.0
+
+        current = self.batch_publisher
+        if (current is not None and window > 0.0 and current.window == window and
+                current.topic == topic.strip('/') and current.per_device == (not publish_only)):
+            return
+
+        if self.batch_publisher is not None:
+            self.batch_publisher.flush_all()
+            self.batch_publisher = None
+
+        if window > 0.0:
+            self.batch_publisher = BatchPublisher(self._publish_batch, window, topic, per_device=not publish_only)
+            _log.info("Publishing device results in batches to {}/<group> every {} seconds".format(
+                self.batch_publisher.topic, window))
+
+    def _publish_batch(self, topic, message):
+        utcnow_string = utils.format_timestamp(utils.get_aware_utc_now())
+        headers = {headers_mod.DATE: utcnow_string,
+                   headers_mod.TIMESTAMP: utcnow_string}
+        self.publish_queue.put(topic, headers, message)
+
+    def _configure_shards(self, shards, shard_by):
+        """
+        Set up sharding of devices across several platform driver processes. ``shards`` lists the VIP identities
+        of all platform driver agents that share this configuration, this agent included. Each agent only runs the
+        devices it owns and forwards RPC calls for other devices to their owner.
+        """
+        self._shard_identities = []
+        self._shard_index = 0
+        if not shards or len(shards) < 2:
+            return
+        if shard_by not in SHARD_METHODS:
+            _log.error("Invalid shard_by setting {}, must be one of {}. Sharding disabled.".format(
+                shard_by, ", ".join(SHARD_METHODS)))
+            return
+        identity = self.core.identity
+        if identity not in shards:
+            _log.error("This agent's identity {} is not in the shards list. Sharding disabled.".format(identity))
+            return
+        self._shard_identities = list(shards)
+        self._shard_index = self._shard_identities.index(identity)
+        self.shard_by = shard_by
+        _log.info("Running shard {} of {}, devices assigned by {}".format(self._shard_index + 1,
+                                                                          len(self._shard_identities), shard_by))
+
+    def _remote_shard(self, path):
+        """Return the identity of the shard running a device if it is not this agent, otherwise None."""
+        if not self._shard_identities or path in self.instances:
+            return None
+        shard = self._device_shards.get(path)
+        if shard is None or shard == self._shard_index:
+            return None
+        return self._shard_identities[shard]
+
+    def _call_shard(self, identity, method, *args, **kwargs):
+        return self.vip.rpc.call(identity, method, *args, **kwargs).get(timeout=SHARD_RPC_TIMEOUT)
+
+    def _called_by_shard(self):
+        if not self._shard_identities:
+            return False
+        try:
+            peer = self.vip.rpc.context.vip_message.peer
+        except AttributeError:
+            return False
+        return peer in self._shard_identities
+
+    def _forward_to_shards(self, method, *args, **kwargs):
+        """
+        Repeat a call that applies to all devices on the other shards. Calls that came from another shard are not
+        forwarded again. Returns the results from each shard that answered.
+        """
+        results, _ = self._gather_from_shards(method, args, kwargs)
+        return list(results.values())
+
+    def _gather_from_shards(self, method, args=(), kwargs=None):
+        """
+        Like _forward_to_shards, but returns dictionaries of the shards that answered to their results and of the
+        shards that failed to answer to their error messages.
+        """
+        results, errors = {}, {}
+        if not self._shard_identities or self._called_by_shard():
+            return results, errors
+        for index, identity in enumerate(self._shard_identities):
+            if index == self._shard_index:
+                continue
+            try:
+                results[identity] = self._call_shard(identity, method, *args, **(kwargs or {}))
+            except (Exception, gevent.Timeout) as e:
+                _log.error("Failed to forward {} to shard {}: {}".format(method, identity, e))
+                errors[identity] = repr(e)
+        return results, errors
+
+    @staticmethod
+    def _configure_endpoint_limits(endpoint_limits):
+        """
+        Apply per endpoint concurrency and rate limits from the main configuration. Each entry maps an endpoint
+        ("host:port", serial port or proxy identity) to a dictionary with any of "max_connections", "rate" and "burst".
+        """
+        clear_endpoint_limits(source="main")
+        if not isinstance(endpoint_limits, dict):
+            _log.error("endpoint_limits must be a dictionary of endpoints to limits, ignoring.")
+            return
+        for endpoint, limits in endpoint_limits.items():
+            try:
+                configure_endpoint_limit(endpoint, source="main", **limits)
+            except (TypeError, ValueError) as e:
+                _log.error("Invalid limits for endpoint {}: {}".format(endpoint, e))
+
+    def _reset_scrape_schedules(self):
+        """
+        Reassign time slots to all running devices using the current scrape settings. With adaptive time slots the
+        allocator keeps the measured scrape durations and re-plans every device, slowest first.
+        """
+        self.freed_time_slots.clear()
+        self.group_counts.clear()
+        slots = {}
+        if self.adaptive_time_slots:
+            for topic, driver in self.instances.items():
+                if topic not in self.slot_allocator:
+                    self.slot_allocator.add(topic, driver.interval, driver.group)
+            slots = self.slot_allocator.update_intervals(self.driver_scrape_interval, self.group_offset_interval)
+        else:
+            # Durations are not measured while adaptive time slots are off.
+            self.slot_allocator = SlotAllocator(self.driver_scrape_interval, self.group_offset_interval)
+        for topic, driver in self.instances.items():
+            if self.adaptive_time_slots:
+                time_slot = slots[topic]
+            else:
+                time_slot = self.group_counts[driver.group]
+            driver.update_scrape_schedule(time_slot, self.driver_scrape_interval,
+                                          driver.group, self.group_offset_interval)
+            self.group_counts[driver.group] += 1
 
     def derive_device_topic(self, config_name):
         _, topic = config_name.split('/', 1)
@@ -346,15 +811,25 @@ class PlatformDriverAgent(Agent):
 
         if driver is None:
             return
+        self.device_index.remove(real_name)
+        self._update_override_state(real_name, 'remove')
 
         _log.info("Stopping driver: {}".format(real_name))
 
+        # Scrapes are queued on the shared scheduler, so cancel the device's next scrape here even if its
+        # shutdown fails.
+        if driver.periodic_read_event is not None:
+            driver.periodic_read_event.cancel()
+
         try:
-            driver.core.stop(timeout=5.0)
+            driver.stop()
         except Exception as e:
             _log.error("Failure during {} driver shutdown: {}".format(real_name, e))
 
-        bisect.insort(self.freed_time_slots[driver.group], driver.time_slot)
+        if self.adaptive_time_slots:
+            self.slot_allocator.remove(real_name)
+        else:
+            bisect.insort(self.freed_time_slots[driver.group], driver.time_slot)
         self.group_counts[driver.group] -= 1
 
     def update_driver(self, config_name, action, contents):
@@ -364,9 +839,19 @@ class PlatformDriverAgent(Agent):
 
         group = int(contents.get("group", 0))
 
+        if self._shard_identities:
+            shard = shard_for_device(topic, group, len(self._shard_identities), self.shard_by)
+            self._device_shards[topic] = shard
+            if shard != self._shard_index:
+                _log.debug("Device {} is run by shard {}".format(topic, self._shard_identities[shard]))
+                self.startup_progress.device_skipped(topic)
+                return
+
         slot = self.group_counts[group]
 
-        if self.freed_time_slots[group]:
+        if self.adaptive_time_slots:
+            slot = 0
+        elif self.freed_time_slots[group]:
             slot = self.freed_time_slots[group].pop(0)
 
         _log.info("Starting driver: {}".format(topic))
@@ -375,17 +860,71 @@ class PlatformDriverAgent(Agent):
                              self.publish_depth_first_all,
                              self.publish_breadth_first_all,
                              self.publish_depth_first,
-                             self.publish_breadth_first)
-        gevent.spawn(driver.core.run)
+                             self.publish_breadth_first,
+                             self.include_metadata)
+        if self.adaptive_time_slots:
+            slot = self.slot_allocator.add(topic, driver.interval, group)
+            driver.update_scrape_schedule(slot, self.driver_scrape_interval, group, self.group_offset_interval)
+        self.startup_pool.spawn(self._start_driver, topic, driver)
         self.instances[topic] = driver
+        self.device_index.add(topic)
         self.group_counts[group] += 1
         self._name_map[topic.lower()] = topic
         self._update_override_state(topic, 'add')
 
+    def _start_driver(self, topic, driver):
+        if driver.stopped:
+            return
+        try:
+            driver.start()
+        except Exception as e:
+            _log.exception("Failure during {} driver startup: {}".format(topic, e))
+            self.startup_progress.device_started(topic, success=False)
+        else:
+            self.startup_progress.device_started(topic)
+
+    def queue_device_change(self, config_name, action, contents):
+        """
+        Config store callback for device configurations. Changes are collected and applied together by
+        _apply_device_changes so that a large number of devices delivered at once are started as a batch.
+        """
+        topic = self.derive_device_topic(config_name)
+        self._device_changes.add(topic, action, contents)
+        if self._device_change_greenlet is None:
+            self._device_change_greenlet = gevent.spawn(self._apply_device_changes)
+
+    def _apply_device_changes(self):
+        """
+        Apply queued device changes in the order they arrived. Stopping devices and assigning time slots is done
+        here so slot assignment does not depend on how long devices take to start. Interface configuration, which
+        often talks to the device, runs on the startup pool with at most max_concurrent_startups at a time.
+        """
+        try:
+            while len(self._device_changes):
+                changes = self._device_changes.drain()
+                started = [topic for topic, action, _ in changes if action != "DELETE"]
+                if started:
+                    self.startup_progress.begin(started)
+                    _log.info("Applying configuration changes for {} devices".format(len(changes)))
+                for topic, action, contents in changes:
+                    try:
+                        if action == "DELETE":
+                            self.remove_driver("devices/" + topic, action, contents)
+                        else:
+                            self.update_driver("devices/" + topic, action, contents)
+                    except Exception as e:
+                        _log.exception("Failed to apply {} for device {}: {}".format(action, topic, e))
+                        self.startup_progress.device_started(topic, success=False)
+                # Let queued starts run before looking for more changes.
+                gevent.sleep(0)
+        finally:
+            self._device_change_greenlet = None
+
     def remove_driver(self, config_name, action, contents):
         topic = self.derive_device_topic(config_name)
         self.stop_driver(topic)
-        self._update_override_state(topic, 'remove')
+        self.startup_progress.device_skipped(topic)
+        self._device_shards.pop(topic, None)
 
     # def device_startup_callback(self, topic, driver):
     #     _log.debug("Driver hooked up for "+topic)
@@ -406,6 +945,8 @@ class PlatformDriverAgent(Agent):
                 f"{topic} started twice before test finished, increase the length of scrape interval and rerun test")
 
     def scrape_ending(self, topic):
+        self.startup_progress.device_published(topic)
+
         if not self.scalability_test:
             return
         
@@ -433,11 +974,29 @@ class PlatformDriverAgent(Agent):
                 _log.info("Std dev publish time: "+str(stdev))
                 sys.exit(0)
 
+    def record_scrape_duration(self, topic, duration):
+        """
+        Called by a device after each scrape. With adaptive time slots enabled the device is moved to a quieter
+        part of the scrape interval when its scrape duration changes significantly.
+        """
+        if not self.adaptive_time_slots:
+            return
+
+        time_slot = self.slot_allocator.record_duration(topic, duration)
+        if time_slot is None:
+            return
+
+        driver = self.instances.get(topic)
+        if driver is not None:
+            driver.update_scrape_schedule(time_slot, self.driver_scrape_interval,
+                                          driver.group, self.group_offset_interval)
+
     @RPC.export
     def get_point(self, path, point_name, **kwargs):
         """RPC method
 
-        Return value of specified device set point
+        Return value of specified device set point. Pass max_age to accept a value scraped or read no more than
+        that many seconds ago instead of reading the device.
         :param path: device path
         :type path: str
         :param point_name: set point
@@ -445,6 +1004,9 @@ class PlatformDriverAgent(Agent):
         :param kwargs: additional arguments for the device
         :type kwargs: arguments pointer
         """
+        shard = self._remote_shard(path)
+        if shard is not None:
+            return self._call_shard(shard, 'get_point', path, point_name, **kwargs)
         return self.instances[path].get_point(point_name, **kwargs)
 
     @RPC.export
@@ -461,6 +1023,9 @@ class PlatformDriverAgent(Agent):
         :param kwargs: additional arguments for the device
         :type kwargs: arguments pointer
         """
+        shard = self._remote_shard(path)
+        if shard is not None:
+            return self._call_shard(shard, 'set_point', path, point_name, value, **kwargs)
         if path in self._override_devices:
             raise OverrideError(
                 "Cannot set point on device {} since global override is set".format(path))
@@ -469,10 +1034,27 @@ class PlatformDriverAgent(Agent):
 
     @RPC.export
     def scrape_all(self, path):
+        shard = self._remote_shard(path)
+        if shard is not None:
+            return self._call_shard(shard, 'scrape_all', path)
         return self.instances[path].scrape_all()
 
     @RPC.export
     def get_multiple_points(self, path, point_names, **kwargs):
+        """RPC method
+
+        Read multiple points of a device. Pass max_age to read only points not scraped or read within that many
+        seconds from the device.
+        :param path: device path
+        :type path: str
+        :param point_names: names of the points to read
+        :type point_names: list
+        :param kwargs: additional arguments for the device
+        :type kwargs: arguments pointer
+        """
+        shard = self._remote_shard(path)
+        if shard is not None:
+            return self._call_shard(shard, 'get_multiple_points', path, point_names, **kwargs)
         return self.instances[path].get_multiple_points(point_names, **kwargs)
 
     @RPC.export
@@ -487,12 +1069,149 @@ class PlatformDriverAgent(Agent):
         :param kwargs: additional arguments for the device
         :type kwargs: arguments pointer
         """
+        shard = self._remote_shard(path)
+        if shard is not None:
+            return self._call_shard(shard, 'set_multiple_points', path, point_names_values, **kwargs)
         if path in self._override_devices:
             raise OverrideError(
                 "Cannot set point on device {} since global override is set".format(path))
         else:
             return self.instances[path].set_multiple_points(point_names_values, **kwargs)
     
+    @RPC.export
+    def get_multiple_devices_points(self, device_points, **kwargs):
+        """RPC method
+
+        Read points from many devices in one call. Devices are read concurrently, at most
+        max_concurrent_bulk_requests at a time, and endpoint limits still apply to each device. Pass max_age to serve
+        recently scraped values from memory.
+        :param device_points: point names to read keyed by device path
+        :type device_points: dict
+        :param kwargs: additional arguments for the devices
+        :type kwargs: arguments pointer
+        :returns: Tuple of the (results, errors) of each device keyed by device path and the error of each device
+                  that could not be read
+        :rtype: (dict, dict)
+        """
+        return self._bulk_device_call('get_multiple_points', 'get_multiple_devices_points', device_points, kwargs)
+
+    @RPC.export
+    def set_multiple_devices_points(self, device_point_values, **kwargs):
+        """RPC method
+
+        Set points on many devices in one call. Devices are written concurrently, at most
+        max_concurrent_bulk_requests at a time, and endpoint limits still apply to each device. Devices under
+        global override are reported as errors while the other devices are still written.
+        :param device_point_values: list of points and corresponding values keyed by device path
+        :type device_point_values: dict
+        :param kwargs: additional arguments for the devices
+        :type kwargs: arguments pointer
+        :returns: Tuple of the result of each device keyed by device path and the error of each device that could
+                  not be written
+        :rtype: (dict, dict)
+        """
+        return self._bulk_device_call('set_multiple_points', 'set_multiple_devices_points', device_point_values,
+                                      kwargs)
+
+    def _bulk_device_call(self, method, bulk_method, requests, kwargs):
+        """
+        Call ``method`` of each device in ``requests`` on the bulk request pool. Devices run by another shard are
+        sent to that shard in one ``bulk_method`` call.
+        """
+        local, remote = {}, defaultdict(dict)
+        for path, args in requests.items():
+            shard = self._remote_shard(path)
+            if shard is None:
+                local[path] = args
+            else:
+                remote[shard][path] = args
+
+        greenlets = {path: self.bulk_pool.spawn(self._capture_call, self._device_call, method, path, args, kwargs)
+                     for path, args in local.items()}
+        shard_greenlets = {shard: self.bulk_pool.spawn(self._capture_call, self._call_shard, shard, bulk_method,
+                                                       shard_requests, **kwargs)
+                           for shard, shard_requests in remote.items()}
+        gevent.joinall(list(greenlets.values()) + list(shard_greenlets.values()))
+
+        results, errors = {}, {}
+        for path, greenlet in greenlets.items():
+            succeeded, value = greenlet.value
+            if succeeded:
+                results[path] = value
+            else:
+                errors[path] = value
+        for shard, greenlet in shard_greenlets.items():
+            succeeded, value = greenlet.value
+            if succeeded:
+                shard_results, shard_errors = value
+                results.update(shard_results)
+                errors.update(shard_errors)
+            else:
+                errors.update(dict.fromkeys(remote[shard], value))
+        return results, errors
+
+    @staticmethod
+    def _capture_call(func, *args, **kwargs):
+        try:
+            return True, func(*args, **kwargs)
+        except (Exception, gevent.Timeout) as e:
+            return False, repr(e)
+
+    def _device_call(self, method, path, args, kwargs):
+        driver = self.instances.get(path)
+        if driver is None:
+            raise DriverInterfaceError("No device {}".format(path))
+        if method.startswith('set') and path in self._override_devices:
+            raise OverrideError("Cannot set point on device {} since global override is set".format(path))
+        return getattr(driver, method)(args, **kwargs)
+
+    @RPC.export
+    def get_snapshot(self, device_patterns, point_patterns=None, page_size=1000, page_token=None):
+        """RPC method
+
+        Get the last scraped values of many devices from memory without reading the devices. Devices are returned in
+        path order, page_size at a time; pass the returned next_page_token to get the next page.
+        :param device_patterns: fnmatch style device path patterns, for example "campus/building1/*"
+        :type device_patterns: str or list
+        :param point_patterns: fnmatch style point name patterns. All points are returned when omitted.
+        :type point_patterns: list
+        :param page_size: maximum number of devices returned
+        :type page_size: int
+        :param page_token: next_page_token of the previous page
+        :type page_token: str
+        :returns: {"devices": {device_path: {point: [value, timestamp]}}, "next_page_token": str or None,
+                   "errors": {shard: error}}. Devices of the shards listed in errors are missing from the page; ask
+                   for the page again to include them.
+        :rtype: dict
+        """
+        if isinstance(device_patterns, str):
+            device_patterns = [device_patterns]
+        if isinstance(point_patterns, str):
+            point_patterns = [point_patterns]
+        page_size = max(1, int(page_size))
+
+        paths = self.device_index.match_any(device_patterns, after=page_token, limit=page_size + 1)
+        more = len(paths) > page_size
+        now = utils.get_aware_utc_now()
+        devices = {}
+        for path in paths[:page_size]:
+            snapshot = self.instances[path].value_cache.snapshot(point_patterns)
+            devices[path] = {point: [value, utils.format_timestamp(now - timedelta(seconds=age))]
+                             for point, (value, age) in snapshot.items()}
+
+        shard_pages, errors = self._gather_from_shards('get_snapshot', (device_patterns, point_patterns, page_size,
+                                                                        page_token))
+        for shard_page in shard_pages.values():
+            devices.update(shard_page["devices"])
+            errors.update(shard_page.get("errors", {}))
+            more = more or shard_page["next_page_token"] is not None
+        if len(devices) > page_size:
+            more = True
+            devices = {path: devices[path] for path in sorted(devices)[:page_size]}
+        return {"devices": devices,
+                "next_page_token": max(devices) if more and devices else None,
+                "errors": errors}
+
     @RPC.export
     def heart_beat(self):
         """RPC method
@@ -502,6 +1221,7 @@ class PlatformDriverAgent(Agent):
         _log.debug("sending heartbeat")
         for device in self.instances.values():
             device.heart_beat()
+        self._forward_to_shards('heart_beat')
             
     @RPC.export
     def revert_point(self, path, point_name, **kwargs):
@@ -516,6 +1236,9 @@ class PlatformDriverAgent(Agent):
         :param kwargs: additional arguments for the device
         :type kwargs: arguments pointer
         """
+        shard = self._remote_shard(path)
+        if shard is not None:
+            return self._call_shard(shard, 'revert_point', path, point_name, **kwargs)
         if path in self._override_devices:
             raise OverrideError(
                 "Cannot revert point on device {} since global override is set".format(path))
@@ -533,6 +1256,9 @@ class PlatformDriverAgent(Agent):
         :param kwargs: additional arguments for the device
         :type kwargs: arguments pointer
         """
+        shard = self._remote_shard(path)
+        if shard is not None:
+            return self._call_shard(shard, 'revert_device', path, **kwargs)
         if path in self._override_devices:
             raise OverrideError(
                 "Cannot revert device {} since global override is set".format(path))
@@ -558,8 +1284,20 @@ class PlatformDriverAgent(Agent):
         :type failsafe_revert: boolean
         :param staggered_revert: If this flag is set, reverting of devices will be staggered.
         :type staggered_revert: boolean
+        :return: Id of the revert job, whose progress is available from get_revert_job, or None if no device was
+                 reverted. With shards, the list of the revert job ids of every shard that reverted devices, each
+                 prefixed with the identity of its shard.
+        :rtype: str or list
         """
-        self._set_override_on(pattern, duration, failsafe_revert, staggered_revert)
+        job_id = self._set_override_on(pattern, duration, failsafe_revert, staggered_revert)
+        if not self._shard_identities or self._called_by_shard():
+            return job_id
+        job_ids = {self._shard_identities[self._shard_index]: job_id}
+        shard_job_ids, _ = self._gather_from_shards('set_override_on', (pattern, duration, failsafe_revert,
+                                                                         staggered_revert))
+        job_ids.update(shard_job_ids)
+        return [SHARD_JOB_SEPARATOR.join((identity, shard_job_id)) for identity, shard_job_id in job_ids.items()
+                if shard_job_id is not None]
 
     def _set_override_on(self, pattern, duration=0.0, failsafe_revert=True, staggered_revert=False,
                          from_config_store=False):
@@ -577,35 +1315,36 @@ class PlatformDriverAgent(Agent):
         :type staggered_revert: boolean
         :param from_config_store: Flag to indicate if this function is called from config store callback
         :type from_config_store: boolean
+        :return: Id of the revert job or None if no device was reverted.
         """
-        stagger_interval = 0.05  # sec
         # Add to override patterns set
         self._override_patterns.add(pattern)
-        i = 0
-        for name in self.instances.keys():
-            i += 1
-            if fnmatch.fnmatch(name, pattern):
-                # If revert to default state is needed
-                if failsafe_revert:
-                    if staggered_revert:
-                        self.core.spawn_later(i*stagger_interval, self.instances[name].revert_all())
-                    else:
-                        self.core.spawn(self.instances[name].revert_all())
-                # Set override
-                self._override_devices.add(name)
+        # Only devices under the literal prefix of the pattern are tested.
+        devices = self._override_devices.add_pattern(pattern, self.device_index.match(pattern))
+        job_id = None
+        # If revert to default state is needed
+        if failsafe_revert and devices:
+            stagger = self.revert_stagger_interval if staggered_revert else 0.0
+            reverts = [(name, self.instances[name].get_endpoint(), self.instances[name].revert_all)
+                       for name in sorted(devices)]
+            job_id = self.revert_engine.submit(reverts, stagger=stagger, pattern=pattern)
         # Set timer for interval of override condition
         config_update = self._update_override_interval(duration, pattern)
         if config_update and not from_config_store:
-            # Update config store
-            patterns = dict()
-            for pat in self._override_patterns:
-                if self._override_interval_events[pat] is None:
-                    patterns[pat] = str(0.0)
-                else:
-                    evt, end_time = self._override_interval_events[pat]
-                    patterns[pat] = utils.format_timestamp(end_time)
+            self._store_override_patterns()
+        return job_id
+
+    def _store_override_patterns(self):
+        """Save the override patterns and their end times to the config store."""
+        patterns = dict()
+        for pat in self._override_patterns:
+            if self._override_interval_events[pat] is None:
+                patterns[pat] = str(0.0)
+            else:
+                evt, end_time = self._override_interval_events[pat]
+                patterns[pat] = utils.format_timestamp(end_time)
 
-            self.vip.config.set("override_patterns", jsonapi.dumps(patterns))
+        self.vip.config.set("override_patterns", jsonapi.dumps(patterns))
 
     @RPC.export
     def set_override_off(self, pattern):
@@ -616,7 +1355,9 @@ class PlatformDriverAgent(Agent):
         :param pattern: Pattern on which override condition has to be removed.
         :type pattern: str
         """
-        return self._set_override_off(pattern)
+        result = self._set_override_off(pattern)
+        self._forward_to_shards('set_override_off', pattern)
+        return result
 
     # Get a list of all the devices with override condition.
     @RPC.export
@@ -625,7 +1366,10 @@ class PlatformDriverAgent(Agent):
 
         Get a list of all the devices with override condition.
         """
-        return list(self._override_devices)
+        devices = set(self._override_devices)
+        for shard_devices in self._forward_to_shards('get_override_devices'):
+            devices.update(shard_devices)
+        return list(devices)
 
     @RPC.export
     def clear_overrides(self):
@@ -641,6 +1385,32 @@ class PlatformDriverAgent(Agent):
         self._override_devices.clear()
         self._override_patterns.clear()
         self.vip.config.set("override_patterns", {})
+        self._forward_to_shards('clear_overrides')
+
+    @RPC.export
+    def get_revert_job(self, job_id):
+        """RPC method
+
+        Get the progress of a revert job started by set_override_on: the number of devices pending, running,
+        reverted, failed and timed out, and the outcome and any error of each device. Returns None for an unknown
+        job id.
+        :param job_id: id returned by set_override_on
+        :type job_id: str
+        """
+        identity, _, shard_job_id = job_id.rpartition(SHARD_JOB_SEPARATOR)
+        if identity and identity in self._shard_identities:
+            if identity != self._shard_identities[self._shard_index]:
+                return self._call_shard(identity, 'get_revert_job', shard_job_id)
+            job_id = shard_job_id
+        return self.revert_engine.get_job(job_id)
+
+    @RPC.export
+    def get_revert_jobs(self):
+        """RPC method
+
+        Get a summary of the progress of recent revert jobs.
+        """
+        return self.revert_engine.get_jobs()
 
     @RPC.export
     def get_override_patterns(self):
@@ -652,8 +1422,8 @@ class PlatformDriverAgent(Agent):
 
     def _set_override_off(self, pattern):
         """Turn off override condition on all devices matching the pattern. It removes the pattern from the override
-        patterns set, clears the list of overridden devices  and reevaluates the state of devices. It then cancels the
-        pending override event and removes pattern from the config store.
+        patterns set and releases the devices no other pattern covers. It then cancels the pending override event and
+        removes pattern from the config store.
         :param pattern: Override pattern to be removed.
         :type pattern: str
         """
@@ -662,21 +1432,8 @@ class PlatformDriverAgent(Agent):
             self._override_patterns.discard(pattern)
             # Cancel any pending override events
             self._cancel_override_events(pattern)
-            self._override_devices.clear()
-            patterns = dict()
-            # Build override devices list again
-            for pat in self._override_patterns:
-                for device in self.instances:
-                    if fnmatch.fnmatch(device, pat):
-                        self._override_devices.add(device)
-
-                if self._override_interval_events[pat] is None:
-                    patterns[pat] = str(0.0)
-                else:
-                    evt, end_time = self._override_interval_events[pat]
-                    patterns[pat] = utils.format_timestamp(end_time)
-
-            self.vip.config.set("override_patterns", jsonapi.dumps(patterns))
+            self._override_devices.remove_pattern(pattern)
+            self._store_override_patterns()
         else:
             _log.error("Override Pattern did not match!")
             raise OverrideError(
@@ -749,18 +1506,153 @@ class PlatformDriverAgent(Agent):
         :param state: 'add' or 'remove'
         :type state: str
         """
-        device = device.lower()
-
+        # Devices are kept under their path as configured, like the matches of set_override_on.
         if state == 'add':
             # If device falls under the existing overridden patterns, then add it to list of overridden devices.
-            for pattern in self._override_patterns:
-                if fnmatch.fnmatch(device, pattern):
-                    self._override_devices.add(device)
-                    return
+            self._override_devices.add_device(device)
         else:
             # If device is in list of overridden devices, remove it.
-            if device in self._override_devices:
-                self._override_devices.remove(device)
+            self._override_devices.remove_device(device)
+
+    @RPC.export
+    def get_scrape_statistics(self, path=None):
+        """RPC method
+
+        Get scrape overrun statistics: whether a scrape is in progress, how many scheduled scrapes were skipped
+        because the previous one had not finished, the longest such overrun in seconds and how many requests
+        shared an in progress scrape.
+        :param path: device path. If omitted statistics for all devices are returned keyed by device path.
+        :type path: str
+        """
+        if path is not None:
+            shard = self._remote_shard(path)
+            if shard is not None:
+                return self._call_shard(shard, 'get_scrape_statistics', path)
+            return self.instances[path].get_scrape_statistics()
+        return {topic: driver.get_scrape_statistics() for topic, driver in self.instances.items()}
+
+    @RPC.export
+    def get_metadata(self, path):
+        """RPC method
+
+        Get the metadata of a device and its version. Scrape publishes carry the version in the MetadataVersion
+        header so consumers can cache the metadata and fetch it again only when the version changes.
+        :param path: device path
+        :type path: str
+        :return: dictionary with "version" and "meta_data"
+        """
+        shard = self._remote_shard(path)
+        if shard is not None:
+            return self._call_shard(shard, 'get_metadata', path)
+        return self.instances[path].get_metadata()
+
+    @RPC.export
+    def refresh_subscriptions(self):
+        """RPC method
+
+        Refresh the list of topic prefixes with subscribers used by subscription aware publishing. Agents that
+        subscribe to device topics may call this so they receive publishes without waiting for the next refresh.
+        """
+        if self.subscription_cache is None:
+            return
+        try:
+            subscriptions = self.vip.pubsub.list('pubsub', '', subscribed=False).get(
+                timeout=SUBSCRIPTION_LIST_TIMEOUT)
+        except (Exception, gevent.Timeout) as e:
+            _log.warning("Failed to list subscriptions, keeping previous list: {}".format(e))
+            return
+        # Each entry is (bus, prefix, subscribed by this agent).
+        self.subscription_cache.update(entry[1] for entry in subscriptions)
+
+    @RPC.export
+    def get_subscription_statistics(self):
+        """RPC method
+
+        Get the subscribed prefixes known to subscription aware publishing, how often they were refreshed and how
+        many of the device topics checked have no subscribers. Returns None when the feature is disabled.
+        """
+        if self.subscription_cache is None:
+            return None
+        return self.subscription_cache.get_statistics()
+
+    @RPC.export
+    def get_endpoint_statistics(self):
+        """RPC method
+
+        Get usage and contention counters for the global open socket limit and for every endpoint: sessions
+        in use, acquisitions, how many had to wait, and total, mean and maximum wait time in seconds.
+        """
+        return get_lock_statistics()
+
+    @RPC.export
+    def get_scheduler_statistics(self):
+        """RPC method
+
+        Get statistics for the shared scrape scheduler: pending scrapes, scrapes dispatched, dispatch batches and
+        the mean and maximum lateness of dispatched scrapes in seconds.
+        """
+        return self.scrape_scheduler.get_statistics()
+
+    @RPC.export
+    def get_startup_statistics(self):
+        """RPC method
+
+        Get progress of the most recent batch of device starts: devices started, failed and waiting to start, and
+        the seconds from the start of the batch until all devices started, the first device published and all
+        started devices published.
+        """
+        return self.startup_progress.get_statistics()
+
+    @RPC.export
+    def get_interface_statistics(self):
+        """RPC method
+
+        Get the interfaces loaded by the platform driver. Each driver_type maps to the module or entry point it was
+        loaded from and the seconds taken to import it.
+        """
+        return interface_registry.get_statistics()
+
+    @RPC.export
+    def get_registry_statistics(self):
+        """RPC method
+
+        Get statistics for registry sharing: the number of distinct registries in use, the devices using them, the
+        registry rows shared rather than copied and the number of distinct point metadata entries.
+        """
+        return registry_cache.get_statistics()
+
+    @RPC.export
+    def get_publish_statistics(self):
+        """RPC method
+
+        Get statistics for the publish queue: messages waiting and the most ever waiting, publisher greenlets running,
+        messages queued, published, dropped because the queue was full, replaced by a newer value and failed, publish
+        retries and the mean and maximum seconds from queueing to publishing.
+        """
+        return self.publish_queue.get_statistics()
+
+    @RPC.export
+    def get_publish_buffer_statistics(self):
+        """RPC method
+
+        Get statistics for the publish buffer: messages buffered, the buffer capacity and fill level, messages
+        stored, replayed and discarded because the buffer was full, and the age in seconds of the oldest buffered
+        message. Returns None when publish buffering is disabled.
+        """
+        if self.publish_buffer is None:
+            return None
+        return self.publish_buffer.get_statistics()
+
+    @RPC.export
+    def get_batch_publish_statistics(self):
+        """RPC method
+
+        Get statistics for batched device publishes: open batches, batches and device results published and the
+        largest and mean number of devices per batch. Returns None when batch publishing is disabled.
+        """
+        if self.batch_publisher is None:
+            return None
+        return self.batch_publisher.get_statistics()
 
     @RPC.export
     def forward_bacnet_cov_value(self, source_address, point_name, point_values):
@@ -771,9 +1663,13 @@ class PlatformDriverAgent(Agent):
         :param point_name: name of the point in the COV notification
         :param point_values: dictionary of updated values sent by the device
         """
-        for driver in self.instances.values():
-            if driver.device_path == source_address:
-                driver.publish_cov_value(point_name, point_values)
+        shard = self._remote_shard(source_address)
+        if shard is not None:
+            self._call_shard(shard, 'forward_bacnet_cov_value', source_address, point_name, point_values)
+            return
+        driver = self.instances.get(source_address)
+        if driver is not None:
+            driver.publish_cov_value(point_name, point_values)
 
 
 def main(argv=sys.argv):
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import logging
+
+import gevent
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_BATCH_TOPIC = "driver_batch"
+
+
+class BatchPublisher:
+    """
+    Combines the "all" publishes of devices into one message per scrape group.
+
+    The first device of a group to finish a scrape opens a batch that is published ``window`` seconds
+    later, or sooner once ``max_devices`` devices have joined it. The batch is published to
+    "<topic>/<group>" with a message mapping each device path to the headers and message that device
+    would have published on its own "all" topic.
+
+    :param publish: Function called with (topic, message) to publish a batch.
+    :param window: Seconds to collect devices before publishing.
+    :param topic: Prefix of the batch topics.
+    :param per_device: Whether devices also publish to their own "all" topics.
+    :param max_devices: Number of devices that publishes a batch immediately.
+    :param spawn_later: Function used to schedule publishing of a batch.
+    """
+    def __init__(self, publish, window, topic=DEFAULT_BATCH_TOPIC, per_device=True, max_devices=500,
+                 spawn_later=gevent.spawn_later):
+        self._publish = publish
+        self.window = float(window)
+        self.topic = topic.strip('/')
+        self.per_device = per_device
+        self.max_devices = max_devices
+        self._spawn_later = spawn_later
+        self._batches = {}
+        self._timers = {}
+
+        self.published = 0
+        self.devices_published = 0
+        self.largest_batch = 0
+
+    def get_topic(self, group):
+        return "{}/{}".format(self.topic, group)
+
+    def add(self, group, device_path, headers, message):
+        """Add a device's scrape results to the open batch for its group."""
+        batch = self._batches.get(group)
+        if batch is None:
+            batch = self._batches[group] = {}
+            self._timers[group] = self._spawn_later(self.window, self.flush, group)
+        batch[device_path] = {"headers": headers, "message": message}
+        if len(batch) >= self.max_devices:
+            self.flush(group)
+
+    def flush(self, group):
+        """Publish the open batch for a group now."""
+        timer = self._timers.pop(group, None)
+        if timer is not None and timer is not gevent.getcurrent():
+            timer.kill(block=False)
+        batch = self._batches.pop(group, None)
+        if not batch:
+            return
+        self.published += 1
+        self.devices_published += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            self._publish(self.get_topic(group), batch)
+        except Exception as e:
+            _log.error("Failed to publish batch for group {}: {}".format(group, e))
+
+    def flush_all(self):
+        for group in list(self._batches):
+            self.flush(group)
+
+    def get_statistics(self):
+        return {"open_batches": len(self._batches),
+                "batches_published": self.published,
+                "devices_published": self.devices_published,
+                "largest_batch": self.largest_batch,
+                "mean_batch": self.devices_published / self.published if self.published else 0.0}
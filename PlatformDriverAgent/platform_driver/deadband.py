@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import logging
+from numbers import Number
+from time import monotonic
+
+from .payload import PAYLOAD_FORMAT_HEADER
+
+_log = logging.getLogger(__name__)
+
+# Header set on scrape publishes of devices using a deadband. False means only changed points are included.
+KEYFRAME_HEADER = "Keyframe"
+
+
+def parse_deadband(value):
+    """
+    Parse a deadband setting.
+
+    A number, or a string such as "0.5", is an absolute deadband. A string ending in "%" such as "2%" is
+    relative to the last published value. Empty values mean no deadband.
+
+    :return: (absolute, percent) with the unused one set to None, or None if there is no deadband.
+    :raises ValueError: if the value is not a valid deadband.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, Number):
+        return float(value), None
+    value = str(value).strip()
+    if not value:
+        return None
+    if value.endswith('%'):
+        return None, float(value[:-1])
+    return float(value), None
+
+
+class ChangeFilter:
+    """
+    Reduces each scrape to the points that changed since they were last published.
+
+    A numeric point with a deadband is published when it moves further than the deadband from the value last
+    published. Other points are published whenever their value changes. Every ``keyframe_scrapes`` scrapes or
+    ``keyframe_interval`` seconds, whichever comes first, all points are published so consumers can resynchronize.
+
+    :param deadbands: Deadband for each point as returned by :py:func:`parse_deadband`.
+    :param default_deadband: Deadband for points not in ``deadbands``.
+    :param keyframe_scrapes: Publish all points every this many scrapes. 0 disables.
+    :param keyframe_interval: Publish all points at least this often in seconds. 0 disables.
+    """
+    def __init__(self, deadbands=None, default_deadband=None, keyframe_scrapes=0, keyframe_interval=0.0,
+                 clock=monotonic):
+        self.deadbands = deadbands or {}
+        self.default_deadband = default_deadband
+        self.keyframe_scrapes = int(keyframe_scrapes)
+        self.keyframe_interval = float(keyframe_interval)
+        self._clock = clock
+        self._last = {}
+        self._scrapes_since_keyframe = 0
+        self._last_keyframe = None
+
+        self.scrapes = 0
+        self.keyframes = 0
+        self.points_scraped = 0
+        self.points_published = 0
+
+    def reset(self):
+        """Publish all points on the next scrape."""
+        self._last.clear()
+        self._last_keyframe = None
+
+    def _keyframe_due(self, now):
+        if self._last_keyframe is None:
+            return True
+        if self.keyframe_scrapes > 0 and self._scrapes_since_keyframe >= self.keyframe_scrapes:
+            return True
+        return self.keyframe_interval > 0.0 and now - self._last_keyframe >= self.keyframe_interval
+
+    def _changed(self, point, value):
+        try:
+            last = self._last[point]
+        except KeyError:
+            return True
+        deadband = self.deadbands.get(point, self.default_deadband)
+        if (deadband is None or isinstance(value, bool) or isinstance(last, bool) or
+                not isinstance(value, Number) or not isinstance(last, Number)):
+            return value != last
+        absolute, percent = deadband
+        if absolute is not None:
+            return abs(value - last) > absolute
+        return abs(value - last) > abs(last) * percent / 100.0
+
+    def filter(self, results):
+        """
+        Return (points to publish, whether this is a keyframe) for the results of a scrape.
+        """
+        now = self._clock()
+        self.scrapes += 1
+        self.points_scraped += len(results)
+
+        if self._keyframe_due(now):
+            self._last = dict(results)
+            self._last_keyframe = now
+            self._scrapes_since_keyframe = 1
+            self.keyframes += 1
+            self.points_published += len(results)
+            return results, True
+
+        self._scrapes_since_keyframe += 1
+        changed = {point: value for point, value in results.items() if self._changed(point, value)}
+        self._last.update(changed)
+        self.points_published += len(changed)
+        return changed, False
+
+    def filter_changes(self, values):
+        """
+        Return the points of a partial update, such as COV notifications, that changed since they were last
+        published. Partial updates never make a keyframe and do not count as scrapes.
+        """
+        changed = {point: value for point, value in values.items() if self._changed(point, value)}
+        self._last.update(changed)
+        return changed
+
+    def get_statistics(self):
+        return {"scrapes": self.scrapes,
+                "keyframes": self.keyframes,
+                "points_scraped": self.points_scraped,
+                "points_published": self.points_published}
+
+
+def _is_all_message(message):
+    return isinstance(message, list) and len(message) == 2 and isinstance(message[0], dict)
+
+
+def merge_changes(waiting, new):
+    """
+    Combine a waiting publish with a newer one for the same topics, for the "latest" publish queue policy.
+
+    A newer message holding every point replaces the waiting one. A newer "all" message holding only the changed
+    points is merged into the waiting one, so points that changed only in the waiting message are still
+    published. The merged message is a keyframe if the waiting message was.
+
+    :param waiting: (headers, message) waiting in the queue.
+    :param new: (headers, message) being queued.
+    :return: The (headers, message) to queue, or None if the messages cannot be merged.
+    """
+    headers, message = new
+    if headers.get(KEYFRAME_HEADER) is not False:
+        return new
+    waiting_headers, waiting_message = waiting
+    if PAYLOAD_FORMAT_HEADER in headers or PAYLOAD_FORMAT_HEADER in waiting_headers:
+        # Encoded values cannot be merged without the device metadata.
+        return None
+    waiting_all, new_all = _is_all_message(waiting_message), _is_all_message(message)
+    if not waiting_all and not new_all:
+        # A point topic, where the newer value replaces the older one.
+        return new
+    if waiting_all != new_all:
+        return None
+    results = dict(waiting_message[0])
+    results.update(message[0])
+    meta_data = dict(waiting_message[1])
+    meta_data.update(message[1])
+    headers = dict(headers)
+    headers[KEYFRAME_HEADER] = waiting_headers.get(KEYFRAME_HEADER, True)
+    return headers, [results, meta_data]
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import bisect
+import re
+from fnmatch import fnmatchcase
+
+_WILDCARD = re.compile(r'[*?\[]')
+
+
+class DeviceIndex:
+    """
+    Sorted index of device paths for matching fnmatch style patterns.
+
+    The literal part of a pattern before its first wildcard is looked up by binary search, so a pattern such as
+    ``campus/building1/*`` only tests the devices under ``campus/building1/`` instead of every device.
+    """
+    def __init__(self, paths=()):
+        self._paths = sorted(set(paths))
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, path):
+        index = bisect.bisect_left(self._paths, path)
+        return index < len(self._paths) and self._paths[index] == path
+
+    def add(self, path):
+        index = bisect.bisect_left(self._paths, path)
+        if index == len(self._paths) or self._paths[index] != path:
+            self._paths.insert(index, path)
+
+    def remove(self, path):
+        index = bisect.bisect_left(self._paths, path)
+        if index < len(self._paths) and self._paths[index] == path:
+            del self._paths[index]
+
+    def match(self, pattern, after=None, limit=None):
+        """
+        Return up to ``limit`` sorted device paths matching ``pattern``. With ``after`` only paths sorting after it
+        are returned, which lets callers page through the matches.
+        """
+        wildcard = _WILDCARD.search(pattern)
+        if wildcard is None:
+            return [pattern] if pattern in self and (after is None or pattern > after) else []
+        prefix = pattern[:wildcard.start()]
+        paths = self._paths
+        index = bisect.bisect_left(paths, prefix)
+        if after is not None:
+            index = max(index, bisect.bisect_right(paths, after))
+        matches = []
+        while index < len(paths) and paths[index].startswith(prefix):
+            if fnmatchcase(paths[index], pattern):
+                matches.append(paths[index])
+                if limit is not None and len(matches) >= limit:
+                    break
+            index += 1
+        return matches
+
+    def match_any(self, patterns, after=None, limit=None):
+        """Return up to ``limit`` sorted device paths matching any of ``patterns``."""
+        matches = set()
+        for pattern in patterns:
+            matches.update(self.match(pattern, after, limit))
+        matches = sorted(matches)
+        return matches if limit is None else matches[:limit]
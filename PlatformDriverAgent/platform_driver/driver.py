@@ -36,47 +36,118 @@
 # under Contract DE-AC05-76RL01830
 # }}}
 
-from volttron.platform.vip.agent import BasicAgent, Core
 from volttron.platform.agent import utils
 import logging
-import random
 import gevent
 import traceback
+from gevent.event import AsyncResult
 from volttron.platform.messaging import headers as headers_mod
 from volttron.platform.messaging.topics import (DRIVER_TOPIC_BASE,
                                                 DRIVER_TOPIC_ALL,
                                                 DEVICES_VALUE,
                                                 DEVICES_PATH)
 
-from volttron.platform.vip.agent.errors import VIPError, Again
-from .driver_locks import publish_lock
+from .driver_locks import configure_endpoint_limit, add_endpoint_device, remove_endpoint_device
+from .interface_registry import interface_registry
+from .registry_cache import registry_cache, metadata_version
+from .deadband import ChangeFilter, parse_deadband, KEYFRAME_HEADER
+from .payload import ColumnarEncoder, FORMAT_JSON, PAYLOAD_FORMATS, PAYLOAD_FORMAT_HEADER
+from .value_cache import ValueCache
 import datetime
+from time import monotonic
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
 
 
-class DriverAgent(BasicAgent):
+# Header identifying the version of the device metadata that applies to a publish.
+METADATA_VERSION_HEADER = "MetadataVersion"
+# Devices publish their metadata to this topic followed by the device path.
+METADATA_TOPIC_PREFIX = "driver_metadata"
+
+
+class DeviceCore:
+    """
+    A view of the platform driver's core handed to a device's interface.
+
+    Scheduling and spawning are delegated to the parent core, but the resulting events and greenlets
+    are remembered so they can be cancelled when the device is stopped.
+    """
+    def __init__(self, core):
+        self._core = core
+        self._events = []
+        self._greenlets = []
+
+    def __getattr__(self, name):
+        return getattr(self._core, name)
+
+    def schedule(self, deadline, func, *args, **kwargs):
+        self._events = [e for e in self._events if not (getattr(e, 'finished', False) or getattr(e, 'canceled', False))]
+        event = self._core.schedule(deadline, func, *args, **kwargs)
+        self._events.append(event)
+        return event
+
+    def _track(self, greenlet):
+        self._greenlets = [g for g in self._greenlets if not g.dead]
+        self._greenlets.append(greenlet)
+        return greenlet
+
+    def spawn(self, func, *args, **kwargs):
+        return self._track(self._core.spawn(func, *args, **kwargs))
+
+    def spawn_later(self, seconds, func, *args, **kwargs):
+        return self._track(self._core.spawn_later(seconds, func, *args, **kwargs))
+
+    def periodic(self, period, func, *args, **kwargs):
+        return self._track(self._core.periodic(period, func, *args, **kwargs))
+
+    def stop(self):
+        for event in self._events:
+            event.cancel()
+        for greenlet in self._greenlets:
+            greenlet.kill(block=False)
+        self._events = []
+        self._greenlets = []
+
+
+class DriverAgent:
+    """
+    Scrapes and publishes a single device.
+
+    A device is a plain object rather than an agent: it uses the platform driver's vip connection and core,
+    and its scrapes are dispatched by the platform driver's shared scheduler.
+    """
     def __init__(self, parent, config, time_slot, driver_scrape_interval, device_path,
                  group, group_offset_interval,
                  default_publish_depth_first_all=True,
                  default_publish_breadth_first_all=True,
                  default_publish_depth_first=True,
                  default_publish_breadth_first=True,
-                 **kwargs):
-        super(DriverAgent, self).__init__(**kwargs)
+                 default_include_metadata=True):
         self.heart_beat_value = 0
         self.device_name = ''
-        #Use the parent's vip connection
+        #Use the parent's vip connection and core
         self.parent = parent
         self.vip = parent.vip
+        self.core = DeviceCore(parent.core)
+        self.stopped = False
+        self.registry_key = None
+        self.endpoint = None
         self.config = config
         self.device_path = device_path
+        self.interface = None
+        self.point_topics = {}
+        self.change_filter = None
+        self.meta_data = {}
+        self.meta_data_version = None
+        self.payload_encoder = None
+        self.value_cache = ValueCache()
 
         self.update_publish_types(default_publish_depth_first_all ,
                                  default_publish_breadth_first_all,
                                  default_publish_depth_first,
-                                 default_publish_breadth_first)
+                                 default_publish_breadth_first,
+                                 default_include_metadata)
 
 
         try:
@@ -90,19 +161,68 @@ class DriverAgent(BasicAgent):
         self.interval = interval
         self.periodic_read_event = None
 
+        try:
+            cov_coalesce_window = float(config.get("cov_coalesce_window", 0.0))
+            if cov_coalesce_window < 0.0:
+                raise ValueError
+        except (TypeError, ValueError):
+            _log.warning("Invalid cov_coalesce_window {}. COV values will be published immediately.".format(
+                config.get("cov_coalesce_window")))
+            cov_coalesce_window = 0.0
+
+        self.cov_coalesce_window = cov_coalesce_window
+        self._pending_cov = {}
+        self._cov_flush = None
+        self.cov_received = 0
+        self.cov_publishes = 0
+
+        self._scrape_in_flight = None
+        self._scrape_started = None
+        # Value cache write generation when the scrape in progress started.
+        self._scrape_generation = None
+        self.scrape_overruns = 0
+        self.max_scrape_overrun = 0.0
+        self.coalesced_requests = 0
+
         self.update_scrape_schedule(time_slot, driver_scrape_interval, group, group_offset_interval)
 
     def update_publish_types(self, publish_depth_first_all,
                                    publish_breadth_first_all,
                                    publish_depth_first,
-                                   publish_breadth_first):
+                                   publish_breadth_first,
+                                   include_metadata=True):
         """Setup which publish types happen for a scrape.
            Values passed in are overridden by settings in the specific device configuration."""
         self.publish_depth_first_all = bool(self.config.get("publish_depth_first_all", publish_depth_first_all))
         self.publish_breadth_first_all = bool(self.config.get("publish_breadth_first_all", publish_breadth_first_all))
         self.publish_depth_first = bool(self.config.get("publish_depth_first", publish_depth_first))
         self.publish_breadth_first = bool(self.config.get("publish_breadth_first", publish_breadth_first))
+        previously_included = getattr(self, "include_metadata", True)
+        self.include_metadata = bool(self.config.get("include_metadata", include_metadata))
+        self.build_point_topics()
+        if self.change_filter is not None:
+            # Send everything on the next scrape for consumers of newly enabled topics.
+            self.change_filter.reset()
+        if previously_included and not self.include_metadata and self.interface is not None:
+            self.publish_metadata()
+
+    def build_point_topics(self):
+        """
+        Build the table of depth first and breadth first topics for each point so they are not rebuilt on every
+        publish. The table is only kept while per point publishes are enabled.
+        """
+        self.point_topics = {}
+        if self.interface is None or not (self.publish_depth_first or self.publish_breadth_first):
+            return
+        for point in self.interface.get_register_names():
+            self.point_topics[point] = self.get_paths_for_point(point)
 
+    def get_point_topics(self, point):
+        """Return the depth first and breadth first topics for a point."""
+        topics = self.point_topics.get(point)
+        if topics is None:
+            topics = self.point_topics[point] = self.get_paths_for_point(point)
+        return topics
 
     def update_scrape_schedule(self, time_slot, driver_scrape_interval, group, group_offset_interval):
         self.time_slot_offset = (time_slot * driver_scrape_interval) + (group * group_offset_interval)
@@ -126,7 +246,8 @@ class DriverAgent(BasicAgent):
 
         next_periodic_read = self.find_starting_datetime(utils.get_aware_utc_now())
 
-        self.periodic_read_event = self.core.schedule(next_periodic_read, self.periodic_read, next_periodic_read)
+        self.periodic_read_event = self.parent.scrape_scheduler.schedule(next_periodic_read, self.periodic_read,
+                                                                         next_periodic_read)
 
 
 
@@ -149,28 +270,65 @@ class DriverAgent(BasicAgent):
 
     def get_interface(self, driver_type, config_dict, config_string):
         """Returns an instance of the interface"""
-        module_name = "platform_driver.interfaces." + driver_type
-        module = __import__(module_name,globals(),locals(),[], 0)
-        interfaces = module.interfaces
-        sub_module = getattr(interfaces, driver_type)
-        klass = getattr(sub_module, "Interface")
+        klass = interface_registry.get_interface_class(driver_type)
         interface = klass(vip=self.vip, core=self.core, device_path=self.device_path)
         interface.configure(config_dict, config_string)
         return interface
 
-    @Core.receiver('onstart')
-    def starting(self, sender, **kwargs):
+    def start(self):
         self.setup_device()
 
-        # interval = self.config.get("interval", 60)
-        # self.core.periodic(interval, self.periodic_read, wait=None)
+        if self.stopped:
+            # Removed while the interface was being configured. stop() ran before setup_device acquired
+            # the registry and endpoint, so release them here.
+            self.core.stop()
+            self._release_shared()
+            return
 
         next_periodic_read = self.find_starting_datetime(utils.get_aware_utc_now())
 
-        self.periodic_read_event = self.core.schedule(next_periodic_read, self.periodic_read, next_periodic_read)
+        self.periodic_read_event = self.parent.scrape_scheduler.schedule(next_periodic_read, self.periodic_read,
+                                                                         next_periodic_read)
 
         self.all_path_depth, self.all_path_breadth = self.get_paths_for_point(DRIVER_TOPIC_ALL)
 
+        if not self.include_metadata:
+            self.publish_metadata()
+
+    def publish_metadata(self):
+        """
+        Publish the device metadata to driver_metadata/<device path>. Used when scrape publishes only carry the
+        metadata version.
+        """
+        utcnow_string = utils.format_timestamp(utils.get_aware_utc_now())
+        headers = {
+            headers_mod.DATE: utcnow_string,
+            headers_mod.TIMESTAMP: utcnow_string,
+            METADATA_VERSION_HEADER: self.meta_data_version
+        }
+        self._publish_wrapper(METADATA_TOPIC_PREFIX + '/' + self.device_path,
+                              headers=headers,
+                              message=self.meta_data)
+
+    def get_metadata(self):
+        return {"version": self.meta_data_version,
+                "meta_data": self.meta_data}
+
+    def stop(self):
+        """Stop scraping the device and cancel anything its interface scheduled."""
+        self.stopped = True
+        if self.periodic_read_event is not None:
+            self.periodic_read_event.cancel()
+            self.periodic_read_event = None
+        self.core.stop()
+        self._release_shared()
+
+    def _release_shared(self):
+        """Release the shared registry and endpoint held by the device."""
+        registry_cache.release(self.registry_key)
+        self.registry_key = None
+        remove_endpoint_device(self.endpoint)
+        self.endpoint = None
 
     def setup_device(self):
 
@@ -181,10 +339,23 @@ class DriverAgent(BasicAgent):
 
         self.heart_beat_point = config.get("heart_beat_point")
 
-
+        # Identical registries are parsed once and shared between devices.
+        registry_cache.release(self.registry_key)
+        self.registry_key, registry_config = registry_cache.acquire(registry_config)
 
         self.interface = self.get_interface(driver_type, driver_config, registry_config)
-        self.meta_data = {}
+        meta_data = {}
+
+        endpoint_limits = config.get("endpoint_limits")
+        endpoint = self.interface.get_endpoint()
+        if endpoint_limits and endpoint is not None:
+            try:
+                configure_endpoint_limit(endpoint, source="device", **endpoint_limits)
+            except (TypeError, ValueError) as e:
+                _log.error("Invalid endpoint_limits for {}: {}".format(self.device_path, e))
+        remove_endpoint_device(self.endpoint)
+        add_endpoint_device(endpoint)
+        self.endpoint = endpoint
 
         for point in self.interface.get_register_names():
             register = self.interface.get_register_by_name(point)
@@ -198,9 +369,14 @@ class DriverAgent(BasicAgent):
                 elif register.python_type is str:
                     ts_type = 'string'
 
-            self.meta_data[point] = {'units': register.get_units(),
-                                     'type': ts_type,
-                                     'tz': config.get('timezone', '')}
+            meta_data[point] = {'units': register.get_units(),
+                                'type': ts_type,
+                                'tz': config.get('timezone', '')}
+
+        self.meta_data = registry_cache.share_meta_data(self.registry_key, meta_data)
+        self.meta_data_version = metadata_version(self.meta_data)
+        self.change_filter = self.create_change_filter(config, registry_config)
+        self.payload_encoder = self.create_payload_encoder(config)
 
         self.base_topic = DEVICES_VALUE(campus='',
                                         building='',
@@ -216,11 +392,14 @@ class DriverAgent(BasicAgent):
                                         path=self.device_path,
                                         point='')
 
+        self.build_point_topics()
+
         # self.parent.device_startup_callback(self.device_name, self)
 
 
     def periodic_read(self, now):
-        #we not use self.core.schedule to prevent drift.
+        # The next scrape is queued on the platform driver's shared scheduler
+        # from the scheduled time rather than the current time to prevent drift.
         next_scrape_time = now + datetime.timedelta(seconds=self.interval)
         # Sanity check now.
         # This is specifically for when this is running in a VM that gets
@@ -228,20 +407,31 @@ class DriverAgent(BasicAgent):
         # If we don't make this check a resumed VM will publish one event
         # per minute of
         # time the VM was suspended for.
-        test_now = utils.get_aware_utc_now()
+        clock = self.parent.scrape_scheduler.clock
+        test_now = clock.now()
         if test_now - next_scrape_time > datetime.timedelta(seconds=self.interval):
             next_scrape_time = self.find_starting_datetime(test_now)
 
         _log.debug("{} next scrape scheduled: {}".format(self.device_path, next_scrape_time))
 
-        self.periodic_read_event = self.core.schedule(next_scrape_time, self.periodic_read, next_scrape_time)
+        self.periodic_read_event = self.parent.scrape_scheduler.schedule(next_scrape_time, self.periodic_read,
+                                                                         next_scrape_time)
+
+        if self._scrape_in_flight is not None:
+            overrun = monotonic() - self._scrape_started
+            self.scrape_overruns += 1
+            self.max_scrape_overrun = max(self.max_scrape_overrun, overrun)
+            _log.warning("Skipping scrape of {}: previous scrape still running after {:.3f} seconds".format(
+                self.device_name, overrun))
+            return
 
         _log.debug("scraping device: " + self.device_name)
 
         self.parent.scrape_starting(self.device_name)
 
+        scrape_start = monotonic()
         try:
-            results = self.interface.scrape_all()
+            results = self._single_flight_scrape()
             register_names = self.interface.get_register_names_view()
             for point in (register_names - results.keys()):
                 depth_first_topic = self.base_topic(point=point)
@@ -250,71 +440,181 @@ class DriverAgent(BasicAgent):
             tb = traceback.format_exc()
             _log.error('Failed to scrape ' + self.device_name + ':\n' + tb)
             return
+        finally:
+            self.parent.record_scrape_duration(self.device_path, monotonic() - scrape_start)
 
         # XXX: Does a warning need to be printed?
         if not results:
             return
 
-        utcnow = utils.get_aware_utc_now()
-        utcnow_string = utils.format_timestamp(utcnow)
-        sync_timestamp = utils.format_timestamp(now - datetime.timedelta(seconds=self.time_slot_offset))
-
-        headers = {
-            headers_mod.DATE: utcnow_string,
-            headers_mod.TIMESTAMP: utcnow_string,
-            headers_mod.SYNC_TIMESTAMP: sync_timestamp
-        }
+        # Devices scraped in the same tick for the same slot share the formatted timestamps.
+        headers = dict(clock.headers(now - datetime.timedelta(seconds=self.time_slot_offset)))
+        headers[METADATA_VERSION_HEADER] = self.meta_data_version
+
+        meta_data = self.meta_data
+        if self.change_filter is not None:
+            results, keyframe = self.change_filter.filter(results)
+            headers[KEYFRAME_HEADER] = keyframe
+            if not keyframe and self.include_metadata:
+                meta_data = {point: self.meta_data[point] for point in results}
+            if not results:
+                self.parent.scrape_ending(self.device_name)
+                return
+        if not self.include_metadata:
+            meta_data = {}
 
         if self.publish_depth_first or self.publish_breadth_first:
             for point, value in results.items():
-                depth_first_topic, breadth_first_topic = self.get_paths_for_point(point)
-                message = [value, self.meta_data[point]]
-
-                if self.publish_depth_first:
-                    self._publish_wrapper(depth_first_topic,
-                                          headers=headers,
-                                          message=message)
-
-                if self.publish_breadth_first:
-                    self._publish_wrapper(breadth_first_topic,
+                topics = self.get_publish_topics(point)
+                if topics:
+                    self._publish_wrapper(topics,
                                           headers=headers,
-                                          message=message)
-
-        message = [results, self.meta_data]
-        if self.publish_depth_first_all:
-            self._publish_wrapper(self.all_path_depth,
-                                  headers=headers,
-                                  message=message)
-
-        if self.publish_breadth_first_all:
-            self._publish_wrapper(self.all_path_breadth,
+                                          message=[value, meta_data.get(point, {})])
+
+        message = [results, meta_data]
+        if self.payload_encoder is not None:
+            payload_format, payload = self.payload_encoder.encode(results)
+            # The point publishes above share the original headers.
+            headers = dict(headers)
+            headers[PAYLOAD_FORMAT_HEADER] = payload_format
+            message = [payload, meta_data]
+
+        publish_all = True
+        batch_publisher = self.parent.batch_publisher
+        if batch_publisher is not None:
+            batch_publisher.add(self.group, self.device_path, headers, message)
+            publish_all = batch_publisher.per_device
+
+        if publish_all and (self.publish_depth_first_all or self.publish_breadth_first_all):
+            self._publish_wrapper(self.get_publish_topics(),
                                   headers=headers,
                                   message=message)
 
         self.parent.scrape_ending(self.device_name)
 
+    def get_publish_topics(self, point=None):
+        """
+        Return the enabled depth first and breadth first topics for a point, or for the "all" publish when no point
+        is given. Every topic receives the same message so it is queued once for all of them; the message bus
+        still encodes it for each topic. With subscription aware publishing, topics without subscribers are left
+        out.
+        """
+        if point is None:
+            depth_first, breadth_first = self.all_path_depth, self.all_path_breadth
+            publish_depth_first, publish_breadth_first = self.publish_depth_first_all, self.publish_breadth_first_all
+        else:
+            depth_first, breadth_first = self.get_point_topics(point)
+            publish_depth_first, publish_breadth_first = self.publish_depth_first, self.publish_breadth_first
+        topics = []
+        if publish_depth_first:
+            topics.append(depth_first)
+        if publish_breadth_first:
+            topics.append(breadth_first)
+        subscriptions = self.parent.subscription_cache
+        if subscriptions is not None:
+            topics = [topic for topic in topics if subscriptions.has_subscribers(topic)]
+        return topics
+
+    def _single_flight_scrape(self):
+        """
+        Scrape the device. Callers that arrive while a scrape is already in progress wait for
+        and share its result instead of issuing another scrape to the device.
+        """
+        in_flight = self._scrape_in_flight
+        if in_flight is not None:
+            self.coalesced_requests += 1
+            return in_flight.get()
+
+        in_flight = self._scrape_in_flight = AsyncResult()
+        self._scrape_started = monotonic()
+        generation = self._scrape_generation = self.value_cache.generation()
+        try:
+            results = self.interface.scrape_all()
+        except BaseException as e:
+            in_flight.set_exception(e)
+            raise
+        else:
+            self.value_cache.update(results, generation)
+            in_flight.set(results)
+            return results
+        finally:
+            self._scrape_in_flight = None
+
+    def get_scrape_statistics(self):
+        stats = {"scrape_in_progress": self._scrape_in_flight is not None,
+                 "overruns": self.scrape_overruns,
+                 "max_overrun": self.max_scrape_overrun,
+                 "coalesced_requests": self.coalesced_requests,
+                 "cov_received": self.cov_received,
+                 "cov_publishes": self.cov_publishes,
+                 "value_cache": self.value_cache.get_statistics()}
+        if self.change_filter is not None:
+            stats["change_filter"] = self.change_filter.get_statistics()
+        return stats
+
+    def create_payload_encoder(self, config):
+        """
+        Create the encoder for "all" publishes from the payload_format device setting. Returns None for the standard
+        JSON format.
+        """
+        payload_format = config.get("payload_format", FORMAT_JSON)
+        if payload_format not in PAYLOAD_FORMATS:
+            _log.error("Invalid payload_format {} for {}, must be one of {}".format(
+                payload_format, self.device_path, ", ".join(PAYLOAD_FORMATS)))
+            return None
+        if payload_format == FORMAT_JSON:
+            return None
+        try:
+            return ColumnarEncoder(self.meta_data, self.meta_data_version, config.get("payload_compress_above", 0))
+        except (TypeError, ValueError) as e:
+            _log.error("Invalid payload_compress_above for {}: {}".format(self.device_path, e))
+            return None
+
+    def create_change_filter(self, config, registry_config):
+        """
+        Create the change filter for the device if a deadband is set in the device configuration or in the
+        "Deadband" column of the registry. Returns None when every scrape should publish all points.
+        """
+        deadbands = {}
+        if isinstance(registry_config, list):
+            register_names = self.interface.get_register_names_view()
+            for row in registry_config:
+                if not isinstance(row, dict):
+                    continue
+                row = {str(k).lower(): v for k, v in row.items()}
+                point = row.get("volttron point name", row.get("point name"))
+                if point not in register_names:
+                    continue
+                try:
+                    deadband = parse_deadband(row.get("deadband"))
+                except ValueError:
+                    _log.error("Invalid deadband {} for {} on {}".format(row.get("deadband"), point,
+                                                                         self.device_path))
+                    continue
+                if deadband is not None:
+                    deadbands[point] = deadband
+
+        try:
+            default_deadband = parse_deadband(config.get("deadband"))
+        except ValueError:
+            _log.error("Invalid deadband {} for {}".format(config.get("deadband"), self.device_path))
+            default_deadband = None
+
+        if not deadbands and default_deadband is None:
+            return None
+
+        try:
+            return ChangeFilter(deadbands, default_deadband,
+                                keyframe_scrapes=config.get("keyframe_scrapes", 10),
+                                keyframe_interval=config.get("keyframe_interval", 0.0))
+        except (TypeError, ValueError) as e:
+            _log.error("Invalid keyframe settings for {}, publishing all points: {}".format(self.device_path, e))
+            return None
+
     def _publish_wrapper(self, topic, headers, message):
-        while True:
-            try:
-                with publish_lock():
-                    _log.debug("publishing: " + topic)
-                    self.vip.pubsub.publish('pubsub',
-                                            topic,
-                                            headers=headers,
-                                            message=message).get(timeout=10.0)
-
-                    _log.debug("finish publishing: " + topic)
-            except gevent.Timeout:
-                _log.warning("Did not receive confirmation of publish to "+topic)
-                break
-            except Again:
-                _log.warning("publish delayed: " + topic + " pubsub is busy")
-                gevent.sleep(random.random())
-            except VIPError as ex:
-                _log.warning("driver failed to publish " + topic + ": " + str(ex))
-                break
-            else:
-                break
+        # Publishing is done by the platform driver's publisher pool so a slow message bus does not delay scrapes.
+        # topic may be a list of topics that all receive the same message.
+        self.parent.publish_queue.put(topic, headers, message)
 
     def heart_beat(self):
         if self.heart_beat_point is None:
@@ -337,68 +637,154 @@ class DriverAgent(BasicAgent):
 
         return depth_first, breadth_first
 
-    def get_point(self, point_name, **kwargs):
-        return self.interface.get_point(point_name, **kwargs)
+    def _max_age(self, max_age):
+        """The oldest cached value a read accepts, falling back to the interface's default."""
+        if max_age is None:
+            return self.interface.get_default_max_age()
+        return float(max_age)
+
+    def get_point(self, point_name, max_age=None, **kwargs):
+        """
+        Read a point. A value scraped or read no more than ``max_age`` seconds ago is returned without
+        reading the device.
+        """
+        max_age = self._max_age(max_age)
+        if max_age is not None and not kwargs:
+            found, value = self.value_cache.get(point_name, max_age)
+            if found:
+                return value
+        in_flight = self._scrape_in_flight
+        if in_flight is not None and not kwargs:
+            generation = self._scrape_generation
+            try:
+                results = in_flight.get()
+            except (Exception, gevent.Timeout):
+                results = {}
+            # A scrape that started before the point was last written may hold the old value.
+            if point_name in results and not self.value_cache.written_since(point_name, generation):
+                self.coalesced_requests += 1
+                return results[point_name]
+        generation = self.value_cache.generation()
+        value = self.interface.get_point(point_name, **kwargs)
+        if not kwargs:
+            self.value_cache.set(point_name, value, generation)
+        return value
 
     def set_point(self, point_name, value, **kwargs):
-        return self.interface.set_point(point_name, value, **kwargs)
+        try:
+            return self.interface.set_point(point_name, value, **kwargs)
+        finally:
+            self.value_cache.invalidate(point_name)
 
     def scrape_all(self):
-        return self.interface.scrape_all()
+        return self._single_flight_scrape()
 
-    def get_multiple_points(self, point_names, **kwargs):
-        return self.interface.get_multiple_points(self.device_name,
-                                                  point_names,
-                                                  **kwargs)
+    def get_multiple_points(self, point_names, max_age=None, **kwargs):
+        """
+        Read several points. Points scraped or read no more than ``max_age`` seconds ago are served from the
+        cache and only the rest are read from the device.
+        """
+        max_age = self._max_age(max_age)
+        if max_age is None or kwargs:
+            return self.interface.get_multiple_points(self.device_name, point_names, **kwargs)
+        fresh, stale = self.value_cache.get_many(point_names, max_age)
+        results, errors = {}, {}
+        generation = self.value_cache.generation()
+        if stale:
+            results, errors = self.interface.get_multiple_points(self.device_name, stale)
+        prefix = self.device_name + '/'
+        for point in stale:
+            if prefix + point in results:
+                self.value_cache.set(point, results[prefix + point], generation)
+        for point, value in fresh.items():
+            results[prefix + point] = value
+        return results, errors
 
     def set_multiple_points(self, point_names_values, **kwargs):
-        return self.interface.set_multiple_points(self.device_name,
-                                                  point_names_values,
-                                                  **kwargs)
+        try:
+            return self.interface.set_multiple_points(self.device_name,
+                                                      point_names_values,
+                                                      **kwargs)
+        finally:
+            for point_name_value in point_names_values:
+                self.value_cache.invalidate(point_name_value[0])
+
+    def get_endpoint(self):
+        """Return the endpoint the device is reached through, or None."""
+        return self.interface.get_endpoint() if self.interface is not None else None
 
     def revert_point(self, point_name, **kwargs):
-        self.interface.revert_point(point_name, **kwargs)
+        try:
+            self.interface.revert_point(point_name, **kwargs)
+        finally:
+            self.value_cache.invalidate(point_name)
 
     def revert_all(self, **kwargs):
-        self.interface.revert_all(**kwargs)
+        try:
+            self.interface.revert_all(**kwargs)
+        finally:
+            self.value_cache.invalidate()
 
     def publish_cov_value(self, point_name, point_values):
         """
-        Called in the platform driver agent to publish a cov from a point
+        Called in the platform driver agent to publish a cov from a point.
+
+        Without a cov_coalesce_window each value is published as it arrives. With a window COV values arriving
+        within it are merged, keeping the latest value of each point, and published together when the window closes.
         :param point_name: point which sent COV notifications
         :param point_values: COV point values
         """
+        if not point_values:
+            return
+        if self.cov_coalesce_window <= 0.0:
+            for value in point_values.values():
+                self.cov_received += 1
+                self._publish_cov_results({point_name: value})
+            return
+        for value in point_values.values():
+            self._pending_cov[point_name] = value
+            self.cov_received += 1
+        if self._cov_flush is None:
+            self._cov_flush = self.core.spawn_later(self.cov_coalesce_window, self.flush_cov_values)
+
+    def flush_cov_values(self):
+        """
+        Publish pending COV values: one publish per changed point to its point topics and a single sparse "all"
+        publish holding every changed point.
+        """
+        self._cov_flush = None
+        results, self._pending_cov = self._pending_cov, {}
+        self._publish_cov_results(results)
+
+    def _publish_cov_results(self, results):
+        if not results or self.stopped:
+            return
+        self.value_cache.update(results)
+        if self.change_filter is not None:
+            # COV values pass the same deadbands as scraped values.
+            results = self.change_filter.filter_changes(results)
+            if not results:
+                return
+        self.cov_publishes += 1
         utcnow = utils.get_aware_utc_now()
         utcnow_string = utils.format_timestamp(utcnow)
         headers = {
             headers_mod.DATE: utcnow_string,
             headers_mod.TIMESTAMP: utcnow_string,
+            METADATA_VERSION_HEADER: self.meta_data_version
         }
-        for point, value in point_values.items():
-            results = {point_name: value}
-            meta = {point_name: self.meta_data[point_name]}
-            all_message = [results, meta]
-            individual_point_message = [value, self.meta_data[point_name]]
-
-            depth_first_topic, breadth_first_topic = self.get_paths_for_point(
-                point_name)
+        if self.change_filter is not None:
+            headers[KEYFRAME_HEADER] = False
 
-            if self.publish_depth_first:
-                self._publish_wrapper(depth_first_topic,
-                                      headers=headers,
-                                      message=individual_point_message)
-            #
-            if self.publish_breadth_first:
-                self._publish_wrapper(breadth_first_topic,
-                                      headers=headers,
-                                      message=individual_point_message)
-
-            if self.publish_depth_first_all:
-                self._publish_wrapper(self.all_path_depth,
+        if self.publish_depth_first or self.publish_breadth_first:
+            for point_name, value in results.items():
+                point_meta = self.meta_data[point_name] if self.include_metadata else {}
+                self._publish_wrapper(self.get_publish_topics(point_name),
                                       headers=headers,
-                                      message=all_message)
+                                      message=[value, point_meta])
 
-            if self.publish_breadth_first_all:
-                self._publish_wrapper(self.all_path_breadth,
-                                      headers=headers,
-                                      message=all_message)
+        if self.publish_depth_first_all or self.publish_breadth_first_all:
+            meta = {point: self.meta_data[point] for point in results} if self.include_metadata else {}
+            self._publish_wrapper(self.get_publish_topics(),
+                                  headers=headers,
+                                  message=[results, meta])
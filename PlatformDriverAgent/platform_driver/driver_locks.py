@@ -36,8 +36,124 @@
 # under Contract DE-AC05-76RL01830
 # }}}
 
-from gevent.lock import BoundedSemaphore, DummySemaphore
+import gevent
+from collections import deque
+from gevent.event import Event
 from contextlib import contextmanager
+from time import monotonic
+
+
+class EndpointLimiter:
+    """
+    Limits the number of concurrent sessions to, and the request rate of, a single endpoint.
+
+    Concurrency is limited by counting the sessions in use and the rate with a token bucket holding
+    up to ``burst`` tokens that refill at ``rate`` tokens per second. A limit below 1 (or a rate of 0)
+    means unlimited. Limits may be changed while sessions are open; sessions already open count
+    against the new limit. Wait times are recorded so contention can be reported.
+    """
+    def __init__(self, max_connections=0, rate=0.0, burst=None, source=None):
+        self._waiters = deque()
+        self.in_use = 0
+        self.tokens = None
+        self.update(max_connections, rate, burst, source)
+        self.last_refill = monotonic()
+        # Devices configured to use the endpoint.
+        self.devices = 0
+        # (max_connections, rate, burst) from a device configuration, kept while the main configuration's
+        # limits take precedence.
+        self.device_limits = None
+
+        self.acquisitions = 0
+        self.contended = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def update(self, max_connections=0, rate=0.0, burst=None, source=None):
+        """Change the limits in place, keeping open sessions and statistics."""
+        self.max_connections = int(max_connections or 0)
+        self.rate = float(rate or 0.0)
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self.tokens = self.burst if self.tokens is None else min(self.tokens, self.burst)
+        self.source = source
+        self._wake()
+
+    def _full(self):
+        return 0 < self.max_connections <= self.in_use
+
+    def _wake(self):
+        """Wake as many waiting sessions as there are free sessions."""
+        free = len(self._waiters) if self.max_connections < 1 else self.max_connections - self.in_use
+        while self._waiters and free > 0:
+            self._waiters.popleft().set()
+            free -= 1
+
+    def _wait_for_session(self):
+        waiter = Event()
+        self._waiters.append(waiter)
+        try:
+            waiter.wait()
+        except BaseException:
+            if waiter.is_set():
+                # Pass the wake up on to the next waiting session.
+                self._wake()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def _take_token(self):
+        """Take a token from the bucket. Returns True if the caller had to wait for one."""
+        if self.rate <= 0.0:
+            return False
+        waited = False
+        while True:
+            now = monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return waited
+            waited = True
+            gevent.sleep((1.0 - self.tokens) / self.rate)
+
+    def acquire(self):
+        start = monotonic()
+        contended = False
+        while self._full():
+            contended = True
+            self._wait_for_session()
+        self.in_use += 1
+        try:
+            contended = self._take_token() or contended
+        except BaseException:
+            self.release()
+            raise
+        wait = monotonic() - start
+
+        self.acquisitions += 1
+        if contended:
+            self.contended += 1
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+    def release(self):
+        self.in_use -= 1
+        self._wake()
+
+    def idle(self):
+        return not self.in_use and not self._waiters
+
+    def get_statistics(self):
+        return {"max_connections": self.max_connections,
+                "rate": self.rate,
+                "in_use": self.in_use,
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "total_wait": self.total_wait,
+                "max_wait": self.max_wait,
+                "mean_wait": self.total_wait / self.acquisitions if self.acquisitions else 0.0}
+
 
 _socket_lock = None
 
@@ -45,10 +161,7 @@ def configure_socket_lock(max_connections=0):
     global _socket_lock
     if _socket_lock is not None:
         raise RuntimeError("socket_lock already configured!")
-    if max_connections < 1:
-        _socket_lock = DummySemaphore()
-    else:
-        _socket_lock = BoundedSemaphore(max_connections)
+    _socket_lock = EndpointLimiter(max_connections)
 
 @contextmanager        
 def socket_lock():
@@ -60,25 +173,96 @@ def socket_lock():
         yield 
     finally:
         _socket_lock.release()
-        
-_publish_lock = None
 
-def configure_publish_lock(max_connections=0):
-    global _publish_lock
-    if _publish_lock is not None:
-        raise RuntimeError("socket_lock already configured!")
-    if max_connections < 1:
-        _publish_lock = DummySemaphore()
-    else:
-        _publish_lock = BoundedSemaphore(max_connections)
 
-@contextmanager        
-def publish_lock():
-    global _publish_lock
-    if _publish_lock is None:
-        raise RuntimeError("socket_lock not configured!")
-    _publish_lock.acquire()
-    try:        
-        yield 
+_endpoint_limiters = {}
+
+def configure_endpoint_limit(endpoint, max_connections=0, rate=0.0, burst=None, source="main"):
+    """
+    Set the concurrency and rate limits for an endpoint such as "10.0.0.5:502", a serial port or a proxy
+    identity. Limits set from a device configuration (source "device") never replace limits set in the
+    main configuration, but apply once the main configuration no longer limits the endpoint. An existing
+    limiter is updated in place so open sessions and statistics are kept.
+    """
+    current = _endpoint_limiters.get(endpoint)
+    if current is None:
+        current = _endpoint_limiters[endpoint] = EndpointLimiter(max_connections, rate, burst, source=source)
+    elif source != "device" or current.source != "main":
+        current.update(max_connections, rate, burst, source=source)
+    if source == "device":
+        current.device_limits = (max_connections, rate, burst)
+
+def clear_endpoint_limits(source="main"):
+    """
+    Remove the limits set from the given source. Endpoints whose main limits are removed go back to the
+    limits a device configuration set for them. Endpoints no device uses are forgotten.
+    """
+    for endpoint, limiter in list(_endpoint_limiters.items()):
+        if source == "device":
+            limiter.device_limits = None
+        if limiter.source != source:
+            continue
+        if limiter.device_limits is not None:
+            limiter.update(*limiter.device_limits, source="device")
+        else:
+            limiter.update()
+        _discard_if_unused(endpoint, limiter)
+
+def add_endpoint_device(endpoint):
+    """Record that a device uses an endpoint so its limiter and statistics are kept while it runs."""
+    if endpoint is None:
+        return
+    limiter = _endpoint_limiters.get(endpoint)
+    if limiter is None:
+        limiter = _endpoint_limiters[endpoint] = EndpointLimiter()
+    limiter.devices += 1
+
+def remove_endpoint_device(endpoint):
+    """
+    Record that a device stopped using an endpoint. The limiter is removed once no device uses the
+    endpoint unless its limits come from the main configuration.
+    """
+    limiter = _endpoint_limiters.get(endpoint)
+    if limiter is None:
+        return
+    limiter.devices -= 1
+    _discard_if_unused(endpoint, limiter)
+
+def _discard_if_unused(endpoint, limiter):
+    if limiter.source != "main" and limiter.devices <= 0 and limiter.idle() and \
+            _endpoint_limiters.get(endpoint) is limiter:
+        del _endpoint_limiters[endpoint]
+
+@contextmanager
+def endpoint_lock(endpoint):
+    """
+    Hold one session to an endpoint for the duration of the block. Endpoints without
+    configured limits are unlimited but their usage is still recorded while a device uses them.
+    """
+    if endpoint is None:
+        yield
+        return
+    limiter = _endpoint_limiters.get(endpoint)
+    if limiter is None:
+        limiter = _endpoint_limiters[endpoint] = EndpointLimiter()
+    limiter.acquire()
+    try:
+        yield
     finally:
-        _publish_lock.release()
+        limiter.release()
+        _discard_if_unused(endpoint, limiter)
+
+@contextmanager
+def connection_lock(endpoint):
+    """
+    Hold a session to an endpoint and one of the process wide open socket permits.
+    The endpoint permit is taken first so a stalled endpoint cannot tie up the global permits
+    while it waits for its own.
+    """
+    with endpoint_lock(endpoint):
+        with socket_lock():
+            yield
+
+def get_lock_statistics():
+    return {"socket_lock": _socket_lock.get_statistics() if _socket_lock is not None else None,
+            "endpoints": {endpoint: limiter.get_statistics() for endpoint, limiter in _endpoint_limiters.items()}}
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import importlib
+import logging
+from time import monotonic
+
+try:
+    from importlib.metadata import entry_points
+except ImportError:
+    entry_points = None
+
+_log = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "volttron.platform_driver.interfaces"
+BUILTIN_PACKAGE = "platform_driver.interfaces"
+
+
+class InterfaceRegistry:
+    """
+    Resolves a driver_type to its Interface class.
+
+    Interface modules are only imported the first time a device of that type is configured, and each
+    driver_type is resolved once per process. Interfaces may be provided by other packages through the
+    "volttron.platform_driver.interfaces" entry point group; these take precedence over the interfaces
+    that ship with the platform driver. The time taken to load each interface is recorded.
+    """
+    def __init__(self, entry_point_group=ENTRY_POINT_GROUP, package=BUILTIN_PACKAGE):
+        self.entry_point_group = entry_point_group
+        self.package = package
+        self._classes = {}
+        self._load_times = {}
+        self._sources = {}
+        self._entry_points = None
+
+    def _find_entry_points(self):
+        if self._entry_points is None:
+            self._entry_points = {}
+            if entry_points is not None:
+                try:
+                    found = entry_points()
+                    if hasattr(found, "select"):
+                        found = found.select(group=self.entry_point_group)
+                    else:
+                        found = found.get(self.entry_point_group, [])
+                    self._entry_points = {ep.name: ep for ep in found}
+                except Exception as e:
+                    _log.error("Failed to read interface entry points: {}".format(e))
+        return self._entry_points
+
+    def register(self, driver_type, klass):
+        """Register an Interface class directly."""
+        self._classes[driver_type] = klass
+        self._sources[driver_type] = "registered"
+
+    def get_interface_class(self, driver_type):
+        """
+        Return the Interface class for a driver_type, importing it on first use.
+
+        :raises ImportError: if no interface exists for the driver_type.
+        """
+        klass = self._classes.get(driver_type)
+        if klass is not None:
+            return klass
+
+        start = monotonic()
+        entry_point = self._find_entry_points().get(driver_type)
+        if entry_point is not None:
+            klass = entry_point.load()
+            source = getattr(entry_point, "value", entry_point.name)
+        else:
+            module_name = "{}.{}".format(self.package, driver_type)
+            module = importlib.import_module(module_name)
+            try:
+                klass = module.Interface
+            except AttributeError:
+                raise ImportError("{} does not define an Interface class".format(module_name))
+            source = module_name
+        elapsed = monotonic() - start
+
+        self._classes[driver_type] = klass
+        self._load_times[driver_type] = elapsed
+        self._sources[driver_type] = source
+        _log.info("Loaded {} interface from {} in {:.3f} seconds".format(driver_type, source, elapsed))
+        return klass
+
+    def get_statistics(self):
+        """Return the source and load time in seconds of each interface loaded so far."""
+        return {driver_type: {"source": self._sources[driver_type],
+                              "load_time": self._load_times.get(driver_type)}
+                for driver_type in self._classes}
+
+
+interface_registry = InterfaceRegistry()
@@ -36,7 +36,6 @@
 # under Contract DE-AC05-76RL01830
 # }}}
 
-from datetime import datetime, timedelta
 import logging
 
 from platform_driver.interfaces import BaseInterface, BaseRegister, BasicRevert
@@ -76,7 +75,6 @@ class IEEE2030_5Register(BaseRegister):
         self.IEEE2030_5_field_name = IEEE2030_5_field_name
         self.data_type = data_type
         self._value = 'value not set'
-        self._timestamp = datetime.now()
         # Cast the initial value to the correct data type
         if default_value is None:
             self.set_value(self.data_type(0))
@@ -91,18 +89,14 @@ class IEEE2030_5Register(BaseRegister):
         return self._value
 
     def set_value(self, x):
-        """Cast the point value to the correct data type, set the register value, update the cache timestamp."""
+        """Cast the point value to the correct data type and set the register value."""
         try:
             self._value = self.data_type(x)
         except ValueError:
             _log.critical("{} value of {} cannot be cast to {}".format(self.point_name, x, self.data_type))
             self._value = x
-        self._timestamp = datetime.now()
         return self._value
 
-    def is_stale(self):
-        return datetime.now() > self._timestamp + timedelta(seconds=DEFAULT_CACHE_EXPIRATION_SECS)
-
 
 class Interface(BasicRevert, BaseInterface):
     """
@@ -165,16 +159,15 @@ class Interface(BasicRevert, BaseInterface):
         return point_map
 
     def get_point(self, point_name, **kwargs):
-        """Get the point value, fetching it from IEEE2030_5Agent if not already cached."""
+        """Get the point value, fetching it from IEEE2030_5Agent."""
         register = self.get_register_by_name(point_name)
-        if register.is_stale():
-            # Refresh the cached value from IEEE2030_5Agent
-            point_value = register.set_value(self.call_agent_rpc('get_point', point_name=point_name))
-        else:
-            point_value = register.value
+        point_value = register.set_value(self.call_agent_rpc('get_point', point_name=point_name))
         _log.debug('Getting {} point value = {}'.format(point_name, point_value))
         return point_value
 
+    def get_default_max_age(self):
+        return self.cache_expiration_secs
+
     def get_register_value(self, point_name):
         return self.get_register_by_name(point_name).value
 
@@ -283,6 +283,27 @@ class BaseInterface(object, metaclass=abc.ABCMeta):
         """
         pass
         
+    def get_endpoint(self):
+        """
+        Get the key of the endpoint this device is reached through, for example "10.0.0.5:502",
+        a serial port or a proxy identity. Devices sharing an endpoint share its concurrency
+        and rate limits.
+
+        :return: Endpoint key or None if the interface does not limit its connections.
+        :rtype: str
+        """
+        return None
+
+    def get_default_max_age(self):
+        """
+        Get the age in seconds of the oldest cached value a read may return when the caller does not
+        give a max_age. Interfaces whose reads are expensive may accept recently scraped values.
+
+        :return: Maximum age in seconds or None to read the device every time.
+        :rtype: float
+        """
+        return None
+
     def get_register_by_name(self, name):
         """
         Get a register by it's point name.
@@ -632,6 +653,28 @@ class BasicRevert(object, metaclass=abc.ABCMeta):
         :return: Actual point value set.
         """
     
+    def _set_points(self, point_values):
+        """
+        Set several points at once. Used by :py:meth:`BasicRevert.revert_all`.
+
+        The default calls :py:meth:`BasicRevert._set_point` for each point.
+        Interfaces whose protocol can write several points in one request
+        should override this method to batch the writes.
+
+        :param point_values: Point names to the values to set them to.
+        :type point_values: dict
+        :return: Point names to the exception raised for each point that
+                 could not be set.
+        :rtype: dict
+        """
+        errors = {}
+        for point_name, value in point_values.items():
+            try:
+                self._set_point(point_name, value)
+            except Exception as e:
+                errors[point_name] = e
+        return errors
+
     @abc.abstractmethod    
     def _scrape_all(self):
         """
@@ -651,21 +694,20 @@ class BasicRevert(object, metaclass=abc.ABCMeta):
         """
         Implementation of :py:meth:`BaseInterface.revert_all`
 
-        Calls :py:meth:`BasicRevert._set_point` with `point_name`
-        and the value to revert the point to for every writable
-        point on a device.
+        Calls :py:meth:`BasicRevert._set_points` with the value to
+        revert to for every writable point on a device.
 
         Currently \*\*kwargs is ignored.
         """
         """Revert entire device to it's default state"""
-        points = self._tracker.get_all_revert_values()
-        for point_name, value in points.items():
-            if not isinstance(value, DriverInterfaceError):
-                try:
-                    self._set_point(point_name, value)
-                    self._tracker.clear_dirty_point(point_name)
-                except Exception as e:
-                    _log.warning("Error while reverting point {}: {}".format(point_name, str(e)))
+        points = {point_name: value for point_name, value in self._tracker.get_all_revert_values().items()
+                  if not isinstance(value, DriverInterfaceError)}
+        errors = self._set_points(points) if points else {}
+        for point_name in points:
+            if point_name in errors:
+                _log.warning("Error while reverting point {}: {}".format(point_name, str(errors[point_name])))
+            else:
+                self._tracker.clear_dirty_point(point_name)
 
     def revert_point(self, point_name, **kwargs):
         """
@@ -41,6 +41,7 @@ import logging
 from datetime import datetime, timedelta
 
 from platform_driver.driver_exceptions import DriverConfigError
+from platform_driver.driver_locks import endpoint_lock
 from platform_driver.interfaces import BaseInterface, BaseRegister
 from volttron.platform.vip.agent import errors
 from volttron.platform.jsonrpc import RemoteError
@@ -95,6 +96,9 @@ class Interface(BaseInterface):
         for point_name in self.cov_points:
             self.establish_cov_subscription(point_name, self.cov_lifetime, True)
 
+    def get_endpoint(self):
+        return self.proxy_address
+
     def schedule_ping(self):
         if self.scheduled_ping is None:
             now = datetime.now()
@@ -126,9 +130,11 @@ class Interface(BaseInterface):
         register = self.get_register_by_name(point_name)
         property_name = "priorityArray" if get_priority_array else register.property
         register_index = None if get_priority_array else register.index
-        result = self.vip.rpc.call(self.proxy_address, 'read_property',
-                                   self.target_address, register.object_type,
-                                   register.instance_number, property_name, register_index).get(timeout=self.timeout)
+        with endpoint_lock(self.proxy_address):
+            result = self.vip.rpc.call(self.proxy_address, 'read_property',
+                                       self.target_address, register.object_type,
+                                       register.instance_number, property_name,
+                                       register_index).get(timeout=self.timeout)
         return result
 
     def set_point(self, point_name, value, priority=None):
@@ -147,7 +153,8 @@ class Interface(BaseInterface):
                 register.property,
                 priority if priority is not None else register.priority,
                 register.index]
-        result = self.vip.rpc.call(self.proxy_address, 'write_property', *args).get(timeout=self.timeout)
+        with endpoint_lock(self.proxy_address):
+            result = self.vip.rpc.call(self.proxy_address, 'write_property', *args).get(timeout=self.timeout)
         return result
 
     def scrape_all(self):
@@ -164,9 +171,10 @@ class Interface(BaseInterface):
 
         while True:
             try:
-                result = self.vip.rpc.call(self.proxy_address, 'read_properties',
-                                           self.target_address, point_map,
-                                           self.max_per_request, self.use_read_multiple).get(timeout=self.timeout)
+                with endpoint_lock(self.proxy_address):
+                    result = self.vip.rpc.call(self.proxy_address, 'read_properties',
+                                               self.target_address, point_map,
+                                               self.max_per_request, self.use_read_multiple).get(timeout=self.timeout)
             except RemoteError as e:
                 if "segmentationNotSupported" in e.message:
                     if self.max_per_request <= 1:
@@ -32,7 +32,6 @@
 # United States Government or any agency thereof.
 # }}}
 
-from datetime import datetime, timedelta
 import logging
 
 from . import BaseInterface, BaseRegister, BasicRevert
@@ -68,7 +67,6 @@ class DNP3Register(BaseRegister):
         self.dnp3_name = dnp3_name
         self.scaling = scaling
         self._value = 'value not set'
-        self._timestamp = datetime.now()
         self.data_type = data_type
         self.set_value(self.data_type(0))           # Cast the initial value to the correct data type
 
@@ -77,7 +75,7 @@ class DNP3Register(BaseRegister):
         return self._value
 
     def set_value(self, x):
-        """Cast the point value to the correct data type, set the register value, update the cache timestamp."""
+        """Cast the point value to the correct data type and set the register value."""
         if x is None:
             self._value = None
         else:
@@ -86,13 +84,8 @@ class DNP3Register(BaseRegister):
             except (ValueError, TypeError):
                 _log.critical("{} value of {} cannot be cast to {}".format(self.point_name, x, self.data_type))
                 self._value = x
-            self._timestamp = datetime.now()
         return self._value
 
-    def is_stale(self):
-        """Whether it is time to refresh the register's cached value."""
-        return datetime.now() > self._timestamp + timedelta(seconds=DEFAULT_CACHE_EXPIRATION_SECS)
-
 
 class Interface(BasicRevert, BaseInterface):
     """
@@ -160,17 +153,16 @@ class Interface(BasicRevert, BaseInterface):
         """
             Get a point value by (VOLTTRON) point name.
 
-            Fetch it from the DNP3Agent if it's not already fresh in the cache.
+            Fetch it from the DNP3Agent. Recently scraped values are served by the platform driver's value cache.
         """
         register = self.get_register_by_name(point_name)
-        if register.is_stale():
-            # Refresh the cached value from DNP3Agent
-            point_value = register.set_value(self.call_agent_rpc('get_point', point_name=point_name))
-        else:
-            point_value = register.value
+        point_value = register.set_value(self.call_agent_rpc('get_point', point_name=point_name))
         _log.debug('Getting {} point value = {}'.format(point_name, point_value))
         return point_value
 
+    def get_default_max_age(self):
+        return self.cache_expiration_secs
+
     def get_register_value(self, point_name):
         return self.get_register_by_name(point_name).value
 
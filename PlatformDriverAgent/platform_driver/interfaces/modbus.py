@@ -49,13 +49,13 @@ from pymodbus.constants import Defaults
 
 from contextlib import contextmanager, closing
 
-from platform_driver.driver_locks import socket_lock
+from platform_driver.driver_locks import connection_lock
 from platform_driver.interfaces import BaseInterface, BaseRegister, BasicRevert, DriverInterfaceError
 from volttron.platform.agent import utils
 
 @contextmanager
 def modbus_client(address, port):
-    with socket_lock():
+    with connection_lock("{}:{}".format(address, port)):
         with closing(SyncModbusClient(address, port)) as client:
             yield client
 
@@ -199,6 +199,9 @@ class Interface(BasicRevert, BaseInterface):
         self.ip_address = config_dict["device_address"]
         self.port = config_dict.get("port", Defaults.Port)
         self.parse_config(registry_config_str) 
+
+    def get_endpoint(self):
+        return "{}:{}".format(self.ip_address, self.port)
         
     def build_ranges_map(self):
         self.register_ranges = {('byte', True): [],
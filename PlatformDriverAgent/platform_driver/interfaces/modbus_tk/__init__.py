@@ -38,6 +38,7 @@
 
 from gevent import monkey
 from volttron.platform.agent import utils
+from platform_driver.driver_locks import connection_lock
 from platform_driver.interfaces import BaseRegister, BaseInterface, BasicRevert
 from platform_driver.interfaces.modbus_tk import helpers
 from platform_driver.interfaces.modbus_tk.maps import Map
@@ -188,6 +189,7 @@ class Interface(BasicRevert, BaseInterface):
         super(Interface, self).__init__(**kwargs)
         self.name_map = dict()
         self.modbus_client = None
+        self.endpoint = None
 
     def insert_register(self, register):
         """
@@ -318,6 +320,7 @@ class Interface(BasicRevert, BaseInterface):
                                                  write_single_values=write_single_values)
 
         # Set modbus client transport based on device configure
+        self.endpoint = "{}:{}".format(device_address, port) if port else device_address
         if port:
             self.modbus_client.set_transport_tcp(
                 hostname=device_address,
@@ -345,6 +348,9 @@ class Interface(BasicRevert, BaseInterface):
                 self.set_default(register.point_name, register.default_value)
 
 
+    def get_endpoint(self):
+        return self.endpoint
+
     def get_point(self, point_name):
         """
             Get the value of a point from a device and return it
@@ -353,7 +359,8 @@ class Interface(BasicRevert, BaseInterface):
 
         :type point_name: str
         """
-        return self.get_register_by_name(point_name).get_state(self.modbus_client)
+        with connection_lock(self.endpoint):
+            return self.get_register_by_name(point_name).get_state(self.modbus_client)
 
     def _set_point(self, point_name, value):
         """
@@ -365,10 +372,37 @@ class Interface(BasicRevert, BaseInterface):
         :type point_name: str
         :type value: same type as register type
         """
-        return self.get_register_by_name(point_name).set_state(self.modbus_client, value)
+        with connection_lock(self.endpoint):
+            return self.get_register_by_name(point_name).set_state(self.modbus_client, value)
+
+    def _set_points(self, point_values):
+        """
+            Set several points with a single write_all, which combines writes to contiguous registers into one
+            request where the device supports multiple register writes
+
+        :param point_values: register point names to setting values
+
+        :type point_values: dict
+        """
+        errors = {}
+        queued = []
+        with connection_lock(self.endpoint):
+            for point_name, value in point_values.items():
+                try:
+                    setattr(self.modbus_client, self.get_register_by_name(point_name).name, value)
+                    queued.append(point_name)
+                except Exception as e:
+                    errors[point_name] = e
+            if queued:
+                try:
+                    self.modbus_client.write_all()
+                except Exception as e:
+                    errors.update(dict.fromkeys(queued, e))
+        return errors
 
     def _scrape_all(self):
         """Get a dictionary mapping point name to values of all defined registers
         """
-        return dict((self.name_map[field.name], value.decode('utf-8') if isinstance(value, bytes) else value) for
-                    field, value, timestamp in self.modbus_client.dump_all())
+        with connection_lock(self.endpoint):
+            return dict((self.name_map[field.name], value.decode('utf-8') if isinstance(value, bytes) else value)
+                        for field, value, timestamp in self.modbus_client.dump_all())
@@ -40,8 +40,11 @@ __docformat__ = 'reStructuredText'
 
 import logging
 import grequests
+from gevent.pool import Group
+from urllib.parse import urlparse
 from xml.dom.minidom import parseString
 
+from platform_driver.driver_locks import connection_lock
 from platform_driver.interfaces import BaseInterface, BaseRegister, BasicRevert
 
 #Logging is completely configured by now.
@@ -92,15 +95,26 @@ class Interface(BasicRevert, BaseInterface):
         super(Interface, self).__init__(**kwargs)
         self.username = None
         self.password = None
+        self.endpoint = None
 
     def configure(self, config_dict, registry_config):
         self.username = config_dict.get("username")
         self.password = config_dict.get("password")
-        self.parse_config(registry_config, config_dict.get("url", ""))
+        url = config_dict.get("url", "")
+        self.endpoint = urlparse(url).netloc or url
+        self.parse_config(registry_config, url)
+
+    def get_endpoint(self):
+        return self.endpoint
+
+    def _send(self, async_request):
+        """Send one request while holding one connection permit for the endpoint."""
+        with connection_lock(self.endpoint):
+            async_request.send()
+        return async_request.response
 
     def _process_request(self, async_request, register):
-        async_result = grequests.map([async_request])
-        async_result = async_result[0]
+        async_result = self._send(async_request)
         async_result.raise_for_status()
         result = register.parse_result(async_result.text)
         return result
@@ -133,7 +147,8 @@ class Interface(BasicRevert, BaseInterface):
             async_requests.append(register.get_value_async_result(username=self.username,
                                                                  password=self.password))
 
-        async_results = grequests.map(async_requests)
+        # Requests are sent concurrently, but each holds its own permit so max_connections is respected.
+        async_results = Group().map(self._send, async_requests)
 
         for register, result in zip(all_registers, async_results):
             try:
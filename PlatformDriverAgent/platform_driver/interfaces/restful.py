@@ -38,7 +38,9 @@
 
 import logging
 import requests
+from urllib.parse import urlparse
 
+from platform_driver.driver_locks import connection_lock
 from platform_driver.interfaces import BaseInterface, BaseRegister, BasicRevert
 
 _log = logging.getLogger(__name__)
@@ -62,13 +64,18 @@ class Interface(BasicRevert, BaseInterface):
 
     def configure(self, config_dict, registry_config_str):
         self.device_address = config_dict['device_address']
+        self.endpoint = urlparse(self.device_address).netloc or self.device_address
         self.parse_config(registry_config_str)
 
+    def get_endpoint(self):
+        return self.endpoint
+
     def get_point(self, point_name, **kwargs):
         register = self.get_register_by_name(point_name)
         point_address = '/'.join([self.device_address, register.path])
 
-        r = requests.get(point_address)
+        with connection_lock(self.endpoint):
+            r = requests.get(point_address)
         if r.status_code != HTTP_STATUS_OK:
             _log.error('could not get point, device returned code {}'.format(r.status_code))
 
@@ -81,7 +88,8 @@ class Interface(BasicRevert, BaseInterface):
         if register.read_only:
             raise IOError("Trying to write to a point configured read only: " + point_name)
 
-        r = requests.post(point_address, value)
+        with connection_lock(self.endpoint):
+            r = requests.post(point_address, value)
         if r.status_code != HTTP_STATUS_OK:
             _log.error('could not set point, device returned code {}'.format(r.status_code))
 
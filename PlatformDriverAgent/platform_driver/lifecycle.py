@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import logging
+from collections import OrderedDict
+from time import monotonic
+
+_log = logging.getLogger(__name__)
+
+
+class DeviceChangeQueue:
+    """
+    Collects device configuration changes so they can be applied in batches.
+
+    Only the latest change to each device is kept. Changes are returned in the order the devices were
+    last changed, so applying the same set of changes always assigns the same time slots.
+    """
+    def __init__(self):
+        self._changes = OrderedDict()
+
+    def add(self, topic, action, contents=None):
+        self._changes.pop(topic, None)
+        self._changes[topic] = (action, contents)
+
+    def drain(self):
+        """Return all pending changes as (topic, action, contents) tuples and empty the queue."""
+        changes = [(topic, action, contents) for topic, (action, contents) in self._changes.items()]
+        self._changes.clear()
+        return changes
+
+    def __len__(self):
+        return len(self._changes)
+
+    def __contains__(self, topic):
+        return topic in self._changes
+
+
+class StartupProgress:
+    """
+    Tracks how far a batch of device starts has progressed and how long the devices took to
+    start and to publish for the first time.
+
+    Devices queued while earlier devices are still starting join the same batch, so a startup
+    delivered by the config store in several pieces is reported as a whole.
+    """
+    def __init__(self, clock=monotonic, report_fraction=0.1):
+        self._clock = clock
+        self.report_fraction = report_fraction
+        self.batches = 0
+        self._reset()
+
+    def _reset(self):
+        self.batch_started = None
+        self.total = 0
+        self.started = 0
+        self.failed = 0
+        self.skipped = 0
+        self.published = 0
+        self.time_to_started = None
+        self.time_to_first_publish = None
+        self.time_to_all_published = None
+        self._unstarted = set()
+        self._waiting = set()
+        self._next_report = 0
+
+    def begin(self, topics):
+        """
+        Track the start of devices. A new batch is started when no device of the current batch is
+        still waiting to start, otherwise the devices are added to the current batch.
+        """
+        if not self._unstarted:
+            self._reset()
+            self.batches += 1
+            self.batch_started = self._clock()
+        topics = set(topics) - self._unstarted
+        self._unstarted.update(topics)
+        self._waiting.update(topics)
+        self.total += len(topics)
+        self._next_report = self.total - len(self._unstarted) + self._report_step()
+
+    def _report_step(self):
+        return max(1, int(self.total * self.report_fraction))
+
+    def _elapsed(self):
+        return self._clock() - self.batch_started
+
+    def device_started(self, topic, success=True):
+        if topic not in self._unstarted:
+            return
+        self._unstarted.discard(topic)
+        if success:
+            self.started += 1
+        else:
+            self.failed += 1
+            self._waiting.discard(topic)
+        self._progress()
+        self._check_all_published()
+
+    def device_skipped(self, topic):
+        """Stop waiting on a device that was removed or is run by another shard."""
+        if topic in self._unstarted:
+            self._unstarted.discard(topic)
+            self.skipped += 1
+            self._progress()
+        if topic in self._waiting:
+            self._waiting.discard(topic)
+            self._check_all_published()
+
+    def _progress(self):
+        done = self.total - len(self._unstarted)
+        if done >= self._next_report or done == self.total:
+            self._next_report = done + self._report_step()
+            _log.info("Started {} of {} devices ({} failed) in {:.3f} seconds".format(
+                self.started, self.total, self.failed, self._elapsed()))
+        if done == self.total and self.time_to_started is None:
+            self.time_to_started = self._elapsed()
+
+    def device_published(self, topic):
+        if topic not in self._waiting:
+            return
+        self._waiting.discard(topic)
+        self.published += 1
+        if self.time_to_first_publish is None:
+            self.time_to_first_publish = self._elapsed()
+            _log.info("First device publish {:.3f} seconds after startup began".format(self.time_to_first_publish))
+        self._check_all_published()
+
+    def _check_all_published(self):
+        if self._waiting or self.batch_started is None or self.time_to_all_published is not None:
+            return
+        self.time_to_all_published = self._elapsed()
+        _log.info("All {} started devices published {:.3f} seconds after startup began".format(
+            self.published, self.time_to_all_published))
+
+    def get_statistics(self):
+        return {"batches": self.batches,
+                "devices": self.total,
+                "started": self.started,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "published": self.published,
+                "pending": len(self._unstarted),
+                "time_to_started": self.time_to_started,
+                "time_to_first_publish": self.time_to_first_publish,
+                "time_to_all_published": self.time_to_all_published}
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import re
+from collections import Counter
+from fnmatch import translate
+
+
+class OverrideIndex:
+    """
+    Global override patterns and the devices each one covers.
+
+    Patterns are compiled once. A device is overridden while at least one pattern covers it, tracked with a
+    reference count per device, so adding or removing a pattern only touches the devices that pattern covers
+    instead of rebuilding the whole overridden set.
+    """
+    def __init__(self):
+        self._compiled = {}
+        self._covered = {}
+        self._counts = Counter()
+
+    def __contains__(self, device):
+        return self._counts[device] > 0
+
+    def __iter__(self):
+        return iter(self._counts)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add_pattern(self, pattern, devices):
+        """
+        Add ``pattern`` covering ``devices``, the device paths that match it. Returns the matching devices.
+        Adding a pattern again has no further effect.
+        """
+        devices = set(devices)
+        if pattern in self._compiled:
+            return devices
+        self._compiled[pattern] = re.compile(translate(pattern)).match
+        self._covered[pattern] = devices
+        self._counts.update(devices)
+        return devices
+
+    def remove_pattern(self, pattern):
+        """Remove ``pattern``. Returns the devices no other pattern covers, which are no longer overridden."""
+        self._compiled.pop(pattern, None)
+        released = []
+        for device in self._covered.pop(pattern, ()):
+            self._counts[device] -= 1
+            if self._counts[device] <= 0:
+                del self._counts[device]
+                released.append(device)
+        return released
+
+    def add_device(self, device):
+        """Check a new device against every pattern. Returns True if the device is overridden."""
+        for pattern, match in self._compiled.items():
+            covered = self._covered[pattern]
+            if device not in covered and match(device):
+                covered.add(device)
+                self._counts[device] += 1
+        return self._counts[device] > 0
+
+    def remove_device(self, device):
+        for devices in self._covered.values():
+            devices.discard(device)
+        self._counts.pop(device, None)
+
+    def clear(self):
+        self._compiled.clear()
+        self._covered.clear()
+        self._counts.clear()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import base64
+import logging
+import zlib
+
+from volttron.platform import jsonapi
+
+_log = logging.getLogger(__name__)
+
+FORMAT_JSON = "json"
+FORMAT_COLUMNAR = "columnar"
+FORMAT_COLUMNAR_ZLIB = "columnar+zlib"
+PAYLOAD_FORMATS = (FORMAT_JSON, FORMAT_COLUMNAR)
+
+# Header naming the format of the values in an "all" publish.
+PAYLOAD_FORMAT_HEADER = "PayloadFormat"
+
+COLUMN_TYPES = ("float", "integer", "boolean", "string")
+
+
+def _column_layout(meta_data):
+    """Group points into typed columns, keeping the order of the metadata within each column."""
+    layout = {column: [] for column in COLUMN_TYPES}
+    for point, point_meta in meta_data.items():
+        column = point_meta.get('type') if isinstance(point_meta, dict) else None
+        layout[column if column in layout else "string"].append(point)
+    return {column: points for column, points in layout.items() if points}
+
+
+class ColumnarEncoder:
+    """
+    Encodes the values of an "all" publish as typed columns.
+
+    Points are grouped by their metadata type and each column lists values in the order the points appear in
+    the device metadata, so point names are not repeated in every publish. Consumers rebuild the values with
+    :py:func:`decode_values` using the metadata with the matching version. Points missing from a publish, for
+    example points that failed to scrape or did not change, are null in their column and their positions are
+    listed under "missing", so they can be told apart from points whose value is null.
+
+    Encoded columns larger than ``compress_above`` bytes are compressed with zlib and base64 encoded.
+
+    :param meta_data: Device metadata in registry order.
+    :param version: Metadata version the layout was built from.
+    :param compress_above: Compress payloads larger than this many bytes. 0 disables compression.
+    """
+    def __init__(self, meta_data, version, compress_above=0):
+        self.version = version
+        self.compress_above = int(compress_above)
+        self.layout = _column_layout(meta_data)
+
+    def encode(self, results):
+        """Return (format, payload) for a dictionary of point values."""
+        body = {"columns": {column: [results.get(point) for point in points]
+                            for column, points in self.layout.items()}}
+        missing = {column: [index for index, point in enumerate(points) if point not in results]
+                   for column, points in self.layout.items()}
+        missing = {column: indexes for column, indexes in missing.items() if indexes}
+        if missing:
+            body["missing"] = missing
+        if self.compress_above > 0:
+            encoded = jsonapi.dumps(body)
+            if len(encoded) > self.compress_above:
+                data = base64.b64encode(zlib.compress(encoded.encode('utf-8'))).decode('ascii')
+                return FORMAT_COLUMNAR_ZLIB, {"version": self.version, "data": data}
+        return FORMAT_COLUMNAR, dict(body, version=self.version)
+
+
+def decode_values(payload_format, payload, meta_data):
+    """
+    Rebuild the {point: value} dictionary of an "all" publish.
+
+    :param payload_format: Value of the PayloadFormat header, or None for the standard format.
+    :param payload: First element of the published message.
+    :param meta_data: Device metadata with the version given in the payload, in the order it was published.
+    :return: Dictionary of point values. Points missing from the publish are left out.
+    """
+    if payload_format in (None, FORMAT_JSON):
+        return payload
+    if payload_format == FORMAT_COLUMNAR_ZLIB:
+        payload = jsonapi.loads(zlib.decompress(base64.b64decode(payload["data"])).decode('utf-8'))
+    elif payload_format != FORMAT_COLUMNAR:
+        raise ValueError("Unknown payload format {}".format(payload_format))
+    columns = payload["columns"]
+    missing = payload.get("missing", {})
+
+    results = {}
+    for column, points in _column_layout(meta_data).items():
+        skip = set(missing.get(column, ()))
+        for index, (point, value) in enumerate(zip(points, columns.get(column, []))):
+            if index not in skip:
+                results[point] = value
+    return results
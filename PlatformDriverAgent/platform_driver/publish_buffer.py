@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import logging
+import sqlite3
+from time import time
+
+import gevent
+from gevent.event import Event
+
+from volttron.platform import jsonapi
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_PUBLISH_BUFFER_FILE = "publish_buffer.sqlite"
+
+# Header added to messages published from the buffer.
+REPLAYED_HEADER = "Replayed"
+
+
+class PublishBuffer:
+    """
+    Keeps messages that could not be published in an sqlite database and publishes them again once the
+    message bus is reachable.
+
+    Messages keep their original headers, including the SyncTimeStamp of the scrape. At most ``max_messages``
+    are kept; when the buffer is full the oldest message is discarded. Replay runs in its own greenlet at no
+    more than ``replay_rate`` messages per second and only while ``is_idle()`` is true, so live publishes always
+    go first. A failed replay stops replay for ``retry_interval`` seconds.
+
+    :param path: Path of the sqlite database.
+    :param publish: Function called with (topic, headers, message) to replay a message.
+    :param max_messages: Maximum number of messages kept.
+    :param replay_rate: Maximum messages replayed per second.
+    :param is_idle: Function returning whether live publishing is idle. Defaults to always idle.
+    :param retry_interval: Seconds to wait after a failed replay.
+    """
+    def __init__(self, path, publish, max_messages, replay_rate=50.0, is_idle=None, retry_interval=5.0):
+        self.path = path
+        self._publish = publish
+        self.max_messages = max(1, int(max_messages))
+        self.replay_rate = float(replay_rate)
+        self._is_idle = is_idle or (lambda: True)
+        self.retry_interval = retry_interval
+        self._stored_event = Event()
+        self._greenlet = None
+
+        self.stored = 0
+        self.replayed = 0
+        self.discarded = 0
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS outbox "
+                                 "(id INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL, "
+                                 "headers TEXT NOT NULL, message TEXT NOT NULL, stored REAL NOT NULL)")
+        self._connection.commit()
+        self._count = self._connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        if self._count:
+            _log.info("{} unpublished messages found in {}".format(self._count, path))
+            self._stored_event.set()
+
+    def __len__(self):
+        return self._count
+
+    def start(self):
+        if self._greenlet is None:
+            self._greenlet = gevent.spawn(self._replay_loop)
+
+    def stop(self):
+        if self._greenlet is not None:
+            self._greenlet.kill()
+            self._greenlet = None
+        self._connection.close()
+
+    def store(self, topic, headers, message):
+        """Keep a message that could not be published."""
+        record = (topic, jsonapi.dumps(headers), jsonapi.dumps(message), time())
+        with self._connection:
+            if self._count >= self.max_messages:
+                excess = self._count - self.max_messages + 1
+                self._connection.execute("DELETE FROM outbox WHERE id IN "
+                                         "(SELECT id FROM outbox ORDER BY id LIMIT ?)", (excess,))
+                self._count -= excess
+                self.discarded += excess
+            self._connection.execute("INSERT INTO outbox (topic, headers, message, stored) VALUES (?, ?, ?, ?)",
+                                     record)
+        self._count += 1
+        self.stored += 1
+        self._stored_event.set()
+
+    def _oldest(self):
+        return self._connection.execute("SELECT id, topic, headers, message, stored FROM outbox "
+                                        "ORDER BY id LIMIT 1").fetchone()
+
+    def replay_one(self):
+        """
+        Publish the oldest buffered message. Returns True if a message was published, False if the buffer is
+        empty or the publish failed.
+        """
+        row = self._oldest()
+        if row is None:
+            self._count = 0
+            return False
+        row_id, topic, headers, message, _ = row
+        headers = jsonapi.loads(headers)
+        headers[REPLAYED_HEADER] = True
+        try:
+            self._publish(topic, headers, jsonapi.loads(message))
+        except (Exception, gevent.Timeout) as e:
+            _log.warning("Replay of buffered publish to {} failed: {}".format(topic, e))
+            return False
+        with self._connection:
+            self._connection.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+        self._count -= 1
+        self.replayed += 1
+        return True
+
+    def _replay_loop(self):
+        interval = 1.0 / self.replay_rate if self.replay_rate > 0 else 0.0
+        while True:
+            if not self._count:
+                self._stored_event.clear()
+                self._stored_event.wait()
+                continue
+            if not self._is_idle():
+                gevent.sleep(max(interval, 0.1))
+                continue
+            if self.replay_one():
+                gevent.sleep(interval)
+            elif self._count:
+                gevent.sleep(self.retry_interval)
+
+    def get_statistics(self):
+        """Return buffer fill level, counters and the age in seconds of the oldest buffered message."""
+        row = self._oldest() if self._count else None
+        return {"messages": self._count,
+                "max_messages": self.max_messages,
+                "fill": self._count / self.max_messages,
+                "stored": self.stored,
+                "replayed": self.replayed,
+                "discarded": self.discarded,
+                "replay_lag": time() - row[4] if row is not None else 0.0}
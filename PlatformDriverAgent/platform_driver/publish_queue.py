@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import logging
+import random
+from collections import OrderedDict
+from itertools import count
+from time import monotonic
+
+import gevent
+from gevent.pool import Group
+
+_log = logging.getLogger(__name__)
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_LATEST = "latest"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_LATEST)
+
+
+class PublishQueue:
+    """
+    Decouples scraping from publishing.
+
+    Devices put messages on a bounded queue and return to scraping straight away. A pool of publisher
+    greenlets, started as needed up to ``workers``, takes messages off the queue and publishes them.
+    Publishes that fail with one of ``retry_on`` are retried with exponential backoff and jitter.
+
+    When the queue is full the oldest message is dropped. With the "latest" overflow policy a message for
+    a topic that is still waiting in the queue also replaces the waiting message, so a slow message bus
+    delivers the latest value of each device rather than a backlog of stale ones. If ``collapse`` is given
+    it decides how the waiting and the new message are combined, for example to merge messages that only
+    hold the points that changed.
+
+    A message may be queued for several topics at once, such as the depth first and breadth first
+    variants of the same publish. It takes one place in the queue and is handed to ``publish`` once for
+    every topic. The message is not encoded here: the message bus still encodes it separately for each
+    topic.
+
+    :param publish: Function called with (topic, headers, message) to publish one message.
+    :param on_failure: Optional function called with (topic, headers, message) for each publish that failed, for
+                       example to keep it for later delivery.
+    :param collapse: Optional function called with the waiting and the new (headers, message) for the same topics
+                     under the "latest" policy. Returns the (headers, message) to queue in place of the waiting
+                     message, or None to queue the new message after it.
+    :param workers: Maximum number of publishes in progress at once.
+    :param max_size: Maximum number of messages waiting to be published.
+    :param overflow: "drop_oldest" or "latest".
+    :param retry_on: Exceptions that mean the publish should be retried.
+    :param max_retries: Attempts after the first before a message is given up and handed to ``on_failure``.
+                        None or a negative value retries until the publish succeeds.
+    :param backoff: Delay in seconds before the first retry; doubled for each later retry.
+    :param max_backoff: Longest delay between retries.
+    """
+    def __init__(self, publish, workers=10, max_size=10000, overflow=OVERFLOW_DROP_OLDEST, retry_on=(),
+                 max_retries=5, backoff=0.1, max_backoff=5.0, on_failure=None, collapse=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("overflow must be one of {}".format(", ".join(OVERFLOW_POLICIES)))
+        self._publish = publish
+        self.on_failure = on_failure
+        self._collapse = collapse
+        self.workers = max(1, int(workers))
+        self.max_size = max(1, int(max_size))
+        self.overflow = overflow
+        self.retry_on = tuple(retry_on)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._queue = OrderedDict()
+        # Key of the newest waiting message for each set of topics, used by the "latest" policy.
+        self._latest = {}
+        self._counter = count()
+        # Running publisher greenlets. Each removes itself when it exits.
+        self._group = Group()
+
+        self.max_depth = 0
+        self.enqueued = 0
+        self.published = 0
+        self.dropped = 0
+        self.collapsed = 0
+        self.failed = 0
+        self.retries = 0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def is_idle(self):
+        """Return True when no messages are waiting or being published."""
+        return not self._queue and not len(self._group)
+
+    def put(self, topics, headers, message):
+        """
+        Queue a message for publishing to a topic or a list of topics. Never blocks.
+        """
+        topics = (topics,) if isinstance(topics, str) else tuple(topics)
+        if not topics:
+            return
+        self.enqueued += 1
+        self._add((topics, headers, message, monotonic()))
+
+    def take_over(self, other):
+        """
+        Move the messages waiting in another queue to this one, for example when the queue is replaced with one
+        using new settings. Messages the other queue is already publishing are finished by its publishers.
+        """
+        items = list(other._queue.values())
+        other._queue.clear()
+        other._latest.clear()
+        for item in items:
+            self._add(item)
+
+    def _add(self, item):
+        topics, headers, message, queued = item
+        if self.overflow == OVERFLOW_LATEST and topics in self._latest:
+            waiting_key = self._latest[topics]
+            collapsed = (headers, message)
+            if self._collapse is not None:
+                _, waiting_headers, waiting_message, _ = self._queue[waiting_key]
+                collapsed = self._collapse((waiting_headers, waiting_message), (headers, message))
+            if collapsed is not None:
+                self._queue[waiting_key] = (topics,) + tuple(collapsed) + (queued,)
+                self.collapsed += 1
+                return
+
+        if len(self._queue) >= self.max_size:
+            dropped_topics = self._pop()[0]
+            self.dropped += 1
+            _log.warning("Publish queue full, dropped message for " + ", ".join(dropped_topics))
+
+        key = next(self._counter)
+        self._queue[key] = item
+        if self.overflow == OVERFLOW_LATEST:
+            self._latest[topics] = key
+        self.max_depth = max(self.max_depth, len(self._queue))
+        if len(self._group) < self.workers:
+            self._group.spawn(self._worker)
+
+    def stop(self):
+        """
+        Stop publishing. Messages still waiting are not published; they are counted as failed and handed to
+        ``on_failure`` so they can be kept for later delivery.
+        """
+        items = list(self._queue.values())
+        self._queue.clear()
+        self._latest.clear()
+        self._group.kill(block=False)
+        if items:
+            _log.warning("Publish queue stopped with {} messages waiting".format(len(items)))
+        for topics, headers, message, _ in items:
+            for topic in topics:
+                self._publish_failed(topic, headers, message)
+
+    def _pop(self):
+        """Remove and return the oldest waiting message."""
+        key, item = self._queue.popitem(last=False)
+        if self._latest.get(item[0]) == key:
+            del self._latest[item[0]]
+        return item
+
+    def _worker(self):
+        try:
+            while self._queue:
+                topics, headers, message, queued = self._pop()
+                for topic in topics:
+                    if self._publish_with_retries(topic, headers, message):
+                        latency = monotonic() - queued
+                        self.published += 1
+                        self.total_latency += latency
+                        self.max_latency = max(self.max_latency, latency)
+        finally:
+            # The group only drops finished greenlets on the next hub cycle. Leave now so a message queued in
+            # the meantime starts a new publisher.
+            self._group.discard(gevent.getcurrent())
+
+    def _publish_with_retries(self, topic, headers, message):
+        attempt = 0
+        while True:
+            try:
+                self._publish(topic, headers, message)
+                return True
+            except self.retry_on as e:
+                if self.max_retries is not None and 0 <= self.max_retries <= attempt:
+                    _log.warning("Giving up publish to {} after {} retries: {}".format(topic, attempt, e))
+                    self._publish_failed(topic, headers, message)
+                    return False
+                delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+                self.retries += 1
+                attempt += 1
+                gevent.sleep(random.uniform(delay / 2.0, delay))
+            except (Exception, gevent.Timeout) as e:
+                _log.warning("driver failed to publish {}: {}".format(topic, e))
+                self._publish_failed(topic, headers, message)
+                return False
+
+    def _publish_failed(self, topic, headers, message):
+        self.failed += 1
+        if self.on_failure is not None:
+            try:
+                self.on_failure(topic, headers, message)
+            except Exception as e:
+                _log.error("Failed to keep unpublished message for {}: {}".format(topic, e))
+
+    def get_statistics(self):
+        return {"depth": len(self._queue),
+                "max_depth": self.max_depth,
+                "workers": len(self._group),
+                "enqueued": self.enqueued,
+                "published": self.published,
+                "dropped": self.dropped,
+                "collapsed": self.collapsed,
+                "failed": self.failed,
+                "retries": self.retries,
+                "max_latency": self.max_latency,
+                "mean_latency": self.total_latency / self.published if self.published else 0.0}
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import hashlib
+import logging
+import sys
+
+from volttron.platform import jsonapi
+
+_log = logging.getLogger(__name__)
+
+
+def _intern_value(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, dict):
+        return {_intern_value(k): _intern_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_intern_value(v) for v in value]
+    return value
+
+
+def metadata_version(meta_data):
+    """
+    Return a short hash identifying the content of a device's metadata.
+
+    The order of the points is part of the version because columnar payloads list values in that order.
+    """
+    content = jsonapi.dumps([[point, point_meta] for point, point_meta in meta_data.items()], sort_keys=True)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+
+class _SharedRegistry:
+    __slots__ = ('rows', 'references', 'meta_data', 'point_keys')
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.references = 0
+        self.meta_data = {}
+        # Shared point metadata referenced by this registry's metadata.
+        self.point_keys = set()
+
+
+class RegistryCache:
+    """
+    Shares parsed registry configurations and device metadata between devices.
+
+    Devices that reference the same registry content receive the same parsed rows, with strings
+    interned, instead of a copy each. Because interfaces build their registers from these rows, point
+    names, units and other strings are shared between devices too. Registers themselves and anything
+    else that depends on the device's driver_config stay per device.
+
+    Shared rows and metadata must be treated as read only. Shared point metadata is kept while a registry using it
+    is in use.
+    """
+    def __init__(self):
+        self._registries = {}
+        # Point metadata key to [point metadata, number of registries using it].
+        self._point_meta_data = {}
+
+    @staticmethod
+    def content_key(registry_config):
+        """Return a hash of the registry content, or None if it cannot be shared."""
+        if not isinstance(registry_config, (list, dict)):
+            return None
+        try:
+            content = jsonapi.dumps(registry_config, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def acquire(self, registry_config):
+        """
+        Return (key, shared registry config) for a device's registry configuration. The key must be passed to
+        release when the device stops. Registry configurations that cannot be shared are returned unchanged with a
+        key of None.
+        """
+        key = self.content_key(registry_config)
+        if key is None:
+            return None, registry_config
+        shared = self._registries.get(key)
+        if shared is None:
+            shared = self._registries[key] = _SharedRegistry(_intern_value(registry_config))
+        shared.references += 1
+        return key, shared.rows
+
+    def release(self, key):
+        shared = self._registries.get(key)
+        if shared is None:
+            return
+        shared.references -= 1
+        if shared.references <= 0:
+            del self._registries[key]
+            for point_key in shared.point_keys:
+                entry = self._point_meta_data[point_key]
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._point_meta_data[point_key]
+
+    def share_meta_data(self, key, meta_data):
+        """
+        Return a metadata dictionary equal to ``meta_data`` that is shared with other devices. The per point
+        dictionaries are shared between all devices and the whole dictionary is shared between devices using the
+        registry identified by ``key``. Metadata of devices whose registry is not shared reuses existing point
+        metadata but is not added to the shared table, since nothing would release it.
+        """
+        shared = self._registries.get(key)
+        points = []
+        for point, point_meta in meta_data.items():
+            point_key = tuple(sorted(point_meta.items()))
+            entry = self._point_meta_data.get(point_key)
+            if shared is not None and point_key not in shared.point_keys:
+                if entry is None:
+                    entry = self._point_meta_data[point_key] = [point_meta, 0]
+                entry[1] += 1
+                shared.point_keys.add(point_key)
+            points.append((sys.intern(point), entry[0] if entry is not None else point_meta))
+
+        if shared is None:
+            return dict(points)
+
+        meta_key = tuple((point, id(point_meta)) for point, point_meta in points)
+        shared_meta_data = shared.meta_data.get(meta_key)
+        if shared_meta_data is None:
+            shared_meta_data = shared.meta_data[meta_key] = dict(points)
+        return shared_meta_data
+
+    def get_statistics(self):
+        """Return the number of shared registries, the devices using them and the row copies avoided."""
+        devices = sum(shared.references for shared in self._registries.values())
+        rows_saved = sum((shared.references - 1) * len(shared.rows) for shared in self._registries.values())
+        return {"registries": len(self._registries),
+                "devices": devices,
+                "rows_saved": rows_saved,
+                "point_meta_data": len(self._point_meta_data)}
+
+
+registry_cache = RegistryCache()
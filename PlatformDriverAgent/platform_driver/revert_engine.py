@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import itertools
+import logging
+from collections import OrderedDict, deque
+from time import monotonic, time
+
+import gevent
+from gevent.lock import BoundedSemaphore, DummySemaphore
+from gevent.pool import Group
+
+_log = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+REVERTED = "reverted"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+
+
+class RevertJob:
+    """Progress and per device outcome of reverting a group of devices."""
+    def __init__(self, job_id, devices, pattern=None):
+        self.job_id = job_id
+        self.pattern = pattern
+        self.started = time()
+        self.finished = None
+        self.outcomes = OrderedDict((device, PENDING) for device in devices)
+        self.errors = {}
+        self._remaining = len(self.outcomes)
+        if not self._remaining:
+            self.finished = self.started
+
+    def set_outcome(self, device, outcome, error=None):
+        self.outcomes[device] = outcome
+        if error is not None:
+            self.errors[device] = error
+        if outcome not in (PENDING, RUNNING):
+            self._remaining -= 1
+            if not self._remaining:
+                self.finished = time()
+
+    def get_status(self, include_devices=True):
+        counts = {outcome: 0 for outcome in (PENDING, RUNNING, REVERTED, FAILED, TIMED_OUT)}
+        for outcome in self.outcomes.values():
+            counts[outcome] += 1
+        status = {"job_id": self.job_id,
+                  "pattern": self.pattern,
+                  "total": len(self.outcomes),
+                  "done": self.finished is not None,
+                  "started": self.started,
+                  "finished": self.finished}
+        status.update(counts)
+        if include_devices:
+            status["devices"] = dict(self.outcomes)
+            status["errors"] = dict(self.errors)
+        return status
+
+
+class RevertEngine:
+    """
+    Reverts groups of devices in the background.
+
+    Device reverts wait in a queue served by up to ``concurrency`` worker greenlets, started as needed, so at most
+    ``concurrency`` run at once. At most ``per_endpoint`` run at once on one endpoint, and each is abandoned after
+    ``timeout`` seconds. A staggered job is fed into the queue by one greenlet. Devices are ordered round robin
+    across endpoints so a staggered job spreads its load over all endpoints. Every submission is a job whose
+    progress can be queried by id; the most recent ``max_jobs`` jobs are kept.
+
+    :param concurrency: Maximum device reverts running at once. 0 for no limit.
+    :param timeout: Seconds before a device revert is abandoned. 0 for no timeout.
+    :param per_endpoint: Maximum device reverts running at once on one endpoint. 0 for no limit.
+    :param max_jobs: Number of jobs kept for querying.
+    """
+    def __init__(self, concurrency=20, timeout=30.0, per_endpoint=0, max_jobs=100):
+        self.concurrency = int(concurrency)
+        self.timeout = float(timeout)
+        self.per_endpoint = int(per_endpoint)
+        self.max_jobs = max(1, int(max_jobs))
+        self._endpoint_semaphores = {}
+        # (job, device, endpoint, revert) waiting for a worker.
+        self._queue = deque()
+        self._workers = Group()
+        # Greenlets feeding staggered jobs into the queue.
+        self._feeders = Group()
+        self._ids = itertools.count(1)
+        self.jobs = OrderedDict()
+
+    def submit(self, reverts, stagger=0.0, pattern=None):
+        """
+        Start reverting devices.
+
+        :param reverts: (device, endpoint, revert function) for each device
+        :param stagger: Seconds between the start of consecutive device reverts.
+        :param pattern: Override pattern that caused the revert, for reporting.
+        :return: The job id.
+        """
+        reverts = self._interleave(reverts)
+        job_id = str(next(self._ids))
+        job = self.jobs[job_id] = RevertJob(job_id, [device for device, _, _ in reverts], pattern)
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+
+        items = [(job, device, endpoint, revert) for device, endpoint, revert in reverts]
+        if stagger > 0.0 and len(items) > 1:
+            self._feeders.spawn(self._feed, items, stagger)
+        else:
+            for item in items:
+                self._put(item)
+        _log.info("Revert job {} started for {} devices".format(job_id, len(reverts)))
+        return job_id
+
+    def get_job(self, job_id):
+        job = self.jobs.get(job_id)
+        return job.get_status() if job is not None else None
+
+    def get_jobs(self):
+        return [job.get_status(include_devices=False) for job in self.jobs.values()]
+
+    def stop(self):
+        self._feeders.kill(block=False)
+        self._workers.kill(block=False)
+        self._queue.clear()
+
+    def _feed(self, items, stagger):
+        start = monotonic()
+        for index, item in enumerate(items):
+            delay = start + index * stagger - monotonic()
+            if delay > 0.0:
+                gevent.sleep(delay)
+            self._put(item)
+
+    def _put(self, item):
+        self._queue.append(item)
+        if self.concurrency < 1 or len(self._workers) < self.concurrency:
+            self._workers.spawn(self._worker)
+
+    def _worker(self):
+        try:
+            while self._queue:
+                try:
+                    self._revert(*self._queue.popleft())
+                except gevent.Timeout:
+                    # Raised by the revert itself; _revert has already reported the device as failed.
+                    pass
+        finally:
+            # Leave now so a revert queued before the group notices this worker finished starts a new one.
+            self._workers.discard(gevent.getcurrent())
+
+    @staticmethod
+    def _interleave(reverts):
+        by_endpoint = OrderedDict()
+        for revert in reverts:
+            by_endpoint.setdefault(revert[1], []).append(revert)
+        return [revert for batch in itertools.zip_longest(*by_endpoint.values())
+                for revert in batch if revert is not None]
+
+    def _endpoint_semaphore(self, endpoint):
+        if self.per_endpoint < 1 or endpoint is None:
+            return DummySemaphore()
+        semaphore = self._endpoint_semaphores.get(endpoint)
+        if semaphore is None:
+            semaphore = self._endpoint_semaphores[endpoint] = BoundedSemaphore(self.per_endpoint)
+        return semaphore
+
+    def _revert(self, job, device, endpoint, revert):
+        with self._endpoint_semaphore(endpoint):
+            job.set_outcome(device, RUNNING)
+            try:
+                with gevent.Timeout(self.timeout if self.timeout > 0.0 else None) as timeout:
+                    revert()
+            except gevent.Timeout as e:
+                if e is not timeout:
+                    # Not the revert timeout, for example the caller's own timeout.
+                    job.set_outcome(device, FAILED, repr(e))
+                    raise
+                _log.error("Revert of {} timed out after {} seconds".format(device, self.timeout))
+                job.set_outcome(device, TIMED_OUT, "timed out after {} seconds".format(self.timeout))
+            except Exception as e:
+                _log.error("Revert of {} failed: {}".format(device, e))
+                job.set_outcome(device, FAILED, repr(e))
+            else:
+                job.set_outcome(device, REVERTED)
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import heapq
+import itertools
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from time import monotonic, time
+
+import gevent
+from gevent.event import Event
+from gevent.pool import Group
+
+_log = logging.getLogger(__name__)
+
+
+class ScheduledScrape:
+    """
+    Handle for a scrape queued on a :py:class:`ScrapeScheduler`.
+
+    Mirrors the ``cancel`` method of the events returned by ``core.schedule``
+    so drivers can treat both the same way.
+    """
+    __slots__ = ('deadline', 'callback', 'args', 'cancelled', '_scheduler')
+
+    def __init__(self, deadline, callback, args, scheduler=None):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        # The scheduler whose heap still holds this entry.
+        self._scheduler = scheduler
+
+    def cancel(self):
+        if self.cancelled:
+            return
+        self.cancelled = True
+        if self._scheduler is not None:
+            self._scheduler._cancelled += 1
+
+
+class TickClock:
+    """
+    Timestamps and publish headers shared by every scrape within the same tick.
+
+    Devices dispatched together would otherwise each read and format the current time. The clock reads it at most
+    once every ``resolution`` seconds and caches formatted scheduled times, so devices scheduled for the same slot
+    share one header template. Scheduled times are formatted exactly; only the publish time is rounded to the tick.
+
+    :param resolution: Seconds the current time is reused for. 0 reads the time on every call.
+    :param formatter: Function used to format timestamps. Defaults to ``datetime.isoformat``.
+    :param date_headers: Header names set to the current time.
+    :param sync_header: Header name set to the scheduled time.
+    :param cache_size: Maximum number of formatted scheduled times kept.
+    """
+    def __init__(self, resolution=0.1, formatter=None, date_headers=("Date", "TimeStamp"),
+                 sync_header="SynchronizedTimeStamp", cache_size=1024):
+        self.resolution = float(resolution)
+        self._format = formatter or datetime.isoformat
+        self._date_headers = tuple(date_headers)
+        self._sync_header = sync_header
+        self._cache_size = cache_size
+        self._tick = None
+        self._now = None
+        self._now_string = None
+        self._formatted = {}
+        self._headers = {}
+
+        self.ticks = 0
+        self.shared_headers = 0
+
+    def now(self):
+        """Return the current time, read at most once per tick."""
+        tick = monotonic()
+        if self._tick is None or tick - self._tick >= self.resolution:
+            self._tick = tick
+            self._now = datetime.now(timezone.utc)
+            self._now_string = self._format(self._now)
+            self._headers = {}
+            self.ticks += 1
+        return self._now
+
+    def now_string(self):
+        """Return the formatted current time."""
+        self.now()
+        return self._now_string
+
+    def format(self, timestamp):
+        """Return the formatted ``timestamp``, formatting each distinct time once."""
+        formatted = self._formatted.get(timestamp)
+        if formatted is None:
+            if len(self._formatted) >= self._cache_size:
+                self._formatted.clear()
+            formatted = self._formatted[timestamp] = self._format(timestamp)
+        return formatted
+
+    def headers(self, sync_time):
+        """
+        Return the header template for a scrape scheduled at ``sync_time``. The template is shared by every
+        scrape of the slot within the tick and must be copied before headers are added to it.
+        """
+        self.now()
+        template = self._headers.get(sync_time)
+        if template is None:
+            template = dict.fromkeys(self._date_headers, self._now_string)
+            template[self._sync_header] = self.format(sync_time)
+            self._headers[sync_time] = template
+        else:
+            self.shared_headers += 1
+        return template
+
+    def get_statistics(self):
+        return {"resolution": self.resolution,
+                "ticks": self.ticks,
+                "shared_headers": self.shared_headers}
+
+
+class ScrapeScheduler:
+    """
+    A single timer heap shared by every device of the platform driver.
+
+    Instead of each device holding its own timer event in the gevent hub the
+    platform driver keeps all pending scrapes in one heap keyed by deadline.
+    One greenlet sleeps until the earliest deadline, pops every scrape that is
+    due and hands them to a set of worker greenlets that run them in turn.
+    Workers are kept between deadlines so no greenlet has to be created when
+    scrapes are due. While scrapes are waiting a spare worker is kept ready, so
+    a scrape blocked on its device does not hold up the others; the number of
+    workers follows the number of scrapes blocked at the same time.
+
+    The scheduler owns the :py:class:`TickClock` devices use to timestamp their publishes.
+
+    :param spawn: Function used to start the scheduler greenlet.
+    :param clock: Clock shared by the scheduled devices.
+    """
+    def __init__(self, spawn=gevent.spawn, clock=None):
+        self._spawn = spawn
+        self.clock = clock if clock is not None else TickClock()
+        self._heap = []
+        # Cancelled entries still in the heap. They are removed lazily when they reach the top.
+        self._cancelled = 0
+        self._counter = itertools.count()
+        self._wakeup = Event()
+        self._greenlet = None
+        # Scrapes that are due and waiting for a worker.
+        self._due = deque()
+        self._work = Event()
+        self._workers = Group()
+        # Workers that are waiting for scrapes or have not started yet.
+        self._available = 0
+
+        self.dispatched = 0
+        self.batches = 0
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    @staticmethod
+    def now():
+        return datetime.now(timezone.utc)
+
+    def start(self):
+        if self._greenlet is None:
+            self._greenlet = self._spawn(self._run)
+
+    def stop(self):
+        if self._greenlet is not None:
+            self._greenlet.kill()
+            self._greenlet = None
+        self._workers.kill()
+        self._due.clear()
+        self._available = 0
+        for _, _, entry in self._heap:
+            entry._scheduler = None
+        self._heap.clear()
+        self._cancelled = 0
+
+    def schedule(self, deadline, callback, *args):
+        """
+        Queue ``callback(*args)`` to run at ``deadline``.
+
+        :param deadline: Timezone aware time to run the callback.
+        :type deadline: datetime
+        :return: Handle that may be used to cancel the scrape.
+        :rtype: :py:class:`ScheduledScrape`
+        """
+        entry = ScheduledScrape(deadline, callback, args, self)
+        key = deadline.timestamp()
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (key, next(self._counter), entry))
+        self.start()
+        if earliest is None or key < earliest:
+            self._wakeup.set()
+        return entry
+
+    def pop_due(self, now):
+        """
+        Remove and return every live scrape whose deadline is at or before ``now``.
+        """
+        due = []
+        timestamp = now.timestamp()
+        while self._heap and self._heap[0][0] <= timestamp:
+            entry = self._pop()
+            if not entry.cancelled:
+                due.append(entry)
+        return due
+
+    def _pop(self):
+        _, _, entry = heapq.heappop(self._heap)
+        entry._scheduler = None
+        if entry.cancelled:
+            self._cancelled -= 1
+        return entry
+
+    def next_timeout(self, now):
+        """
+        Seconds until the next pending scrape, or None if nothing is queued.
+        """
+        while self._heap and self._heap[0][2].cancelled:
+            self._pop()
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - now.timestamp(), 0.0)
+
+    def get_statistics(self):
+        return {"pending": len(self),
+                "dispatched": self.dispatched,
+                "batches": self.batches,
+                "max_lateness": self.max_lateness,
+                "mean_lateness": self.total_lateness / self.dispatched if self.dispatched else 0.0,
+                "clock": self.clock.get_statistics()}
+
+    def _dispatch(self, entries, now):
+        self.batches += 1
+        self._due.extend(entries)
+        if not self._available:
+            self._add_worker()
+        self._work.set()
+
+    def _add_worker(self):
+        self._available += 1
+        self._workers.spawn(self._worker)
+
+    def _worker(self):
+        try:
+            while True:
+                while self._due:
+                    entry = self._due.popleft()
+                    if entry.cancelled:
+                        continue
+                    self._available -= 1
+                    if self._due and not self._available:
+                        # Ready to take over if this scrape blocks.
+                        self._add_worker()
+                    try:
+                        self._call(entry)
+                    finally:
+                        self._available += 1
+                if self._available > 1:
+                    # Another worker is already waiting.
+                    self._available -= 1
+                    return
+                self._work.clear()
+                self._work.wait()
+        finally:
+            self._workers.discard(gevent.getcurrent())
+
+    def _call(self, entry):
+        lateness = time() - entry.deadline.timestamp()
+        self.dispatched += 1
+        self.total_lateness += lateness
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+        try:
+            entry.callback(*entry.args)
+        except Exception:
+            _log.exception("Unhandled error in scheduled scrape")
+
+    def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = self.now()
+            due = self.pop_due(now)
+            if due:
+                self._dispatch(due, now)
+            self._wakeup.wait(self.next_timeout(self.now()))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import zlib
+
+SHARD_BY_HASH = "hash"
+SHARD_BY_GROUP = "group"
+SHARD_METHODS = (SHARD_BY_HASH, SHARD_BY_GROUP)
+
+
+def shard_for_device(device_topic, group, shard_count, shard_by=SHARD_BY_HASH):
+    """
+    Return the index of the shard that owns a device.
+
+    The result only depends on the arguments so every platform driver process sharing a
+    configuration agrees on the owner of each device. Topics are hashed with CRC32 rather
+    than ``hash`` because string hashing is randomized per process.
+
+    :param device_topic: Device topic, for example "campus/building/device".
+    :param group: Scrape group from the device configuration.
+    :param shard_count: Number of platform driver processes.
+    :param shard_by: "hash" to spread devices by topic or "group" to keep each group together.
+    :return: Shard index in ``range(shard_count)``.
+    :rtype: int
+    """
+    if shard_count <= 1:
+        return 0
+    if shard_by == SHARD_BY_GROUP:
+        return int(group) % shard_count
+    return zlib.crc32(device_topic.lower().encode('utf-8')) % shard_count
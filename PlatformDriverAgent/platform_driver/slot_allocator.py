@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import logging
+import math
+
+_log = logging.getLogger(__name__)
+
+
+class _Placement:
+    __slots__ = ('interval', 'group', 'slot', 'duration', 'planned_duration', 'buckets')
+
+    def __init__(self, interval, group, duration):
+        self.interval = interval
+        self.group = group
+        self.slot = 0
+        self.duration = duration
+        self.planned_duration = duration
+        self.buckets = []
+
+
+class SlotAllocator:
+    """
+    Hands out scrape time slots based on how long each device takes to scrape.
+
+    The scrape interval is divided into buckets and the allocator keeps a count of
+    the scrapes expected to be in flight in each bucket. A new device is placed in
+    the slot whose buckets are least loaded, so slow devices are spread out instead
+    of bunching up with each other. Measured durations are smoothed and a device
+    is moved when its duration drifts far from the one it was placed with.
+
+    Slots are in units of ``driver_scrape_interval`` and are turned into offsets
+    by :py:meth:`DriverAgent.update_scrape_schedule` exactly as fixed slots are.
+
+    :param driver_scrape_interval: Seconds between consecutive slots.
+    :param group_offset_interval: Seconds added to the offset per group.
+    :param smoothing: Weight of a new measurement in the smoothed duration.
+    :param replan_threshold: Relative change in duration that triggers a move.
+    """
+    MAX_BUCKETS = 3600
+
+    def __init__(self, driver_scrape_interval, group_offset_interval=0.0, smoothing=0.3, replan_threshold=0.5):
+        self.driver_scrape_interval = driver_scrape_interval
+        self.group_offset_interval = group_offset_interval
+        self.smoothing = smoothing
+        self.replan_threshold = replan_threshold
+        self._devices = {}
+        self._horizon = 0
+        self._bucket_width = 1.0
+        self._load = []
+
+    def __contains__(self, name):
+        return name in self._devices
+
+    def get_slot(self, name):
+        return self._devices[name].slot
+
+    def get_duration(self, name):
+        return self._devices[name].duration
+
+    def add(self, name, interval, group=0):
+        """
+        Place a device and return its time slot. A device that is already placed
+        is removed first.
+        """
+        duration = self._default_duration()
+        if name in self._devices:
+            duration = self._devices[name].duration
+            self.remove(name)
+        placement = _Placement(interval, group, duration)
+        if interval > self._horizon:
+            self._resize(interval)
+        self._place(placement)
+        self._devices[name] = placement
+        return placement.slot
+
+    def remove(self, name):
+        placement = self._devices.pop(name, None)
+        if placement is not None:
+            self._release(placement)
+
+    def record_duration(self, name, duration):
+        """
+        Record how long a scrape of the device took.
+
+        :return: The device's new slot if it was moved, otherwise None.
+        """
+        placement = self._devices.get(name)
+        if placement is None:
+            return None
+        placement.duration += self.smoothing * (duration - placement.duration)
+
+        change = abs(placement.duration - placement.planned_duration)
+        if change < self._bucket_width or change < self.replan_threshold * placement.planned_duration:
+            return None
+
+        old_slot = placement.slot
+        self._release(placement)
+        self._place(placement)
+        if placement.slot == old_slot:
+            return None
+        _log.debug("Moving {} from time slot {} to {} (scrape duration {:.3f}s)".format(
+            name, old_slot, placement.slot, placement.duration))
+        return placement.slot
+
+    def update_intervals(self, driver_scrape_interval, group_offset_interval):
+        """
+        Change the slot spacing and re-place every device.
+
+        :return: Mapping of device names to their new slots.
+        :rtype: dict
+        """
+        self.driver_scrape_interval = driver_scrape_interval
+        self.group_offset_interval = group_offset_interval
+        return self.replan()
+
+    def replan(self):
+        """
+        Re-place every device from scratch, slowest first.
+
+        :return: Mapping of device names to their new slots.
+        :rtype: dict
+        """
+        self._resize(self._horizon, keep_placements=False)
+        order = sorted(self._devices.items(), key=lambda item: (-item[1].duration, item[0]))
+        for _, placement in order:
+            self._place(placement)
+        return {name: placement.slot for name, placement in self._devices.items()}
+
+    def get_load(self):
+        """Expected number of in flight scrapes in each bucket of the interval."""
+        return list(self._load)
+
+    def _default_duration(self):
+        return self.driver_scrape_interval if self.driver_scrape_interval > 0 else self._bucket_width
+
+    def _offset(self, slot, placement):
+        offset = slot * self.driver_scrape_interval + placement.group * self.group_offset_interval
+        return offset % placement.interval
+
+    def _buckets(self, placement, offset):
+        bucket_count = len(self._load)
+        span = max(1, int(math.ceil(placement.duration / self._bucket_width)))
+        buckets = []
+        start = offset
+        while start < self._horizon:
+            first = int(start / self._bucket_width)
+            buckets.extend(b % bucket_count for b in range(first, first + span))
+            start += placement.interval
+        return buckets
+
+    def _candidate_slots(self, interval):
+        if self.driver_scrape_interval <= 0:
+            return range(1)
+        slot_count = max(1, int(math.ceil(interval / self.driver_scrape_interval)))
+        step = max(1, int(math.ceil(slot_count / self.MAX_BUCKETS)))
+        return range(0, slot_count, step)
+
+    def _place(self, placement):
+        best = None
+        for slot in self._candidate_slots(placement.interval):
+            buckets = self._buckets(placement, self._offset(slot, placement))
+            loads = [self._load[b] for b in buckets]
+            cost = (max(loads), sum(loads))
+            if best is None or cost < best[0]:
+                best = (cost, slot, buckets)
+                if cost[0] == 0:
+                    break
+        _, placement.slot, placement.buckets = best
+        placement.planned_duration = placement.duration
+        for b in placement.buckets:
+            self._load[b] += 1
+
+    def _release(self, placement):
+        for b in placement.buckets:
+            self._load[b] -= 1
+        placement.buckets = []
+
+    def _resize(self, horizon, keep_placements=True):
+        self._horizon = horizon
+        self._bucket_width = max(self.driver_scrape_interval, float(horizon) / self.MAX_BUCKETS)
+        self._load = [0] * max(1, int(math.ceil(horizon / self._bucket_width)))
+        for placement in self._devices.values():
+            if not keep_placements:
+                placement.buckets = []
+                continue
+            placement.buckets = self._buckets(placement, self._offset(placement.slot, placement))
+            for b in placement.buckets:
+                self._load[b] += 1
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import logging
+
+_log = logging.getLogger(__name__)
+
+
+class SubscriptionCache:
+    """
+    Remembers which topic prefixes have subscribers on the message bus.
+
+    Message bus subscriptions are prefix matches, so a topic has a subscriber if any subscribed prefix is
+    the start of it. Until the first update every topic is treated as subscribed so nothing is lost while
+    the subscription list is unknown. The answer for each topic is cached until the next update.
+    """
+    def __init__(self):
+        self._prefixes = None
+        self._topics = {}
+        self.updates = 0
+
+    def update(self, prefixes):
+        """Replace the known subscriptions with a new list of subscribed prefixes."""
+        prefixes = set(prefixes)
+        if prefixes != self._prefixes:
+            self._prefixes = prefixes
+            self._topics.clear()
+        self.updates += 1
+
+    def has_subscribers(self, topic):
+        subscribed = self._topics.get(topic)
+        if subscribed is None:
+            if self._prefixes is None:
+                return True
+            subscribed = self._topics[topic] = any(topic.startswith(prefix) for prefix in self._prefixes)
+        return subscribed
+
+    def get_statistics(self):
+        cached = len(self._topics)
+        skipped = sum(1 for subscribed in self._topics.values() if not subscribed)
+        return {"prefixes": sorted(self._prefixes) if self._prefixes is not None else None,
+                "updates": self.updates,
+                "topics_checked": cached,
+                "topics_without_subscribers": skipped}
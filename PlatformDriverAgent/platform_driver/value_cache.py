@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+from fnmatch import fnmatchcase
+from time import monotonic
+
+
+class ValueCache:
+    """
+    The latest known value of each point of a device and when it was read.
+
+    Scrapes and single point reads refresh the cache. Readers pass the oldest value in seconds they will accept;
+    anything older, or never read, is a miss and must be read from the device. Hits and misses are counted.
+
+    Writes invalidate a point once they return and advance the write generation. A read records
+    :py:meth:`generation` before it starts and passes it with its values, so a read that was already in progress
+    when a point was written cannot put back the value the write replaced.
+    """
+    def __init__(self):
+        self._values = {}
+        self._generation = 0
+        # Generation of the last write to each point and of the last write to every point.
+        self._written = {}
+        self._all_written = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def generation(self):
+        """Return the write generation to pass with the values of a read that starts now."""
+        return self._generation
+
+    def written_since(self, point, generation):
+        """Return True when the point was written after ``generation``."""
+        return generation is not None and (self._all_written > generation or
+                                           self._written.get(point, 0) > generation)
+
+    def update(self, values, generation=None):
+        """
+        Record values read from the device at the same moment, such as a scrape. Points written after
+        ``generation`` are skipped.
+        """
+        now = monotonic()
+        for point, value in values.items():
+            if not self.written_since(point, generation):
+                self._values[point] = (value, now)
+
+    def set(self, point, value, generation=None):
+        if not self.written_since(point, generation):
+            self._values[point] = (value, monotonic())
+
+    def invalidate(self, point=None):
+        """Forget the value of a point, or of every point when no point is given, after writing to it."""
+        self._generation += 1
+        if point is None:
+            self._values.clear()
+            self._written.clear()
+            self._all_written = self._generation
+        else:
+            self._values.pop(point, None)
+            self._written[point] = self._generation
+
+    def get(self, point, max_age):
+        """
+        Return (True, value) when the point was read no more than ``max_age`` seconds ago, otherwise (False, None).
+        """
+        entry = self._values.get(point)
+        if entry is not None and monotonic() - entry[1] <= max_age:
+            self.hits += 1
+            return True, entry[0]
+        self.misses += 1
+        return False, None
+
+    def get_many(self, points, max_age):
+        """Return the fresh values of ``points`` and the list of points that must be read from the device."""
+        fresh, stale = {}, []
+        for point in points:
+            found, value = self.get(point, max_age)
+            if found:
+                fresh[point] = value
+            else:
+                stale.append(point)
+        return fresh, stale
+
+    def snapshot(self, point_patterns=None):
+        """
+        Return {point: (value, age)} for every cached point, or for the points matching any of the fnmatch style
+        ``point_patterns``. Ages are in seconds. Lookups are not counted as hits or misses.
+        """
+        now = monotonic()
+        return {point: (value, now - read_time) for point, (value, read_time) in self._values.items()
+                if point_patterns is None or any(fnmatchcase(point, pattern) for pattern in point_patterns)}
+
+    def get_statistics(self):
+        lookups = self.hits + self.misses
+        return {"points": len(self._values),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
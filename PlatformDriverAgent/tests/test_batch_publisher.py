@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import pytest
+
+from platform_driver.batch_publisher import BatchPublisher
+
+
+class FakeTimer:
+    def __init__(self, seconds, func, *args):
+        self.seconds = seconds
+        self.func = func
+        self.args = args
+        self.killed = False
+
+    def fire(self):
+        self.func(*self.args)
+
+    def kill(self, block=True):
+        self.killed = True
+
+
+class Recorder:
+    def __init__(self):
+        self.timers = []
+        self.published = []
+
+    def spawn_later(self, seconds, func, *args):
+        timer = FakeTimer(seconds, func, *args)
+        self.timers.append(timer)
+        return timer
+
+    def publish(self, topic, message):
+        self.published.append((topic, message))
+
+
+@pytest.mark.driver_unit
+def test_add_should_publish_one_batch_per_group_after_window():
+    recorder = Recorder()
+    publisher = BatchPublisher(recorder.publish, 0.5, spawn_later=recorder.spawn_later)
+
+    publisher.add(0, "campus/device1", {"Date": "1"}, [{"a": 1}, {}])
+    publisher.add(0, "campus/device2", {"Date": "2"}, [{"a": 2}, {}])
+    publisher.add(1, "campus/device3", {"Date": "3"}, [{"a": 3}, {}])
+
+    assert len(recorder.timers) == 2
+    assert recorder.timers[0].seconds == 0.5
+    recorder.timers[0].fire()
+
+    assert recorder.published == [("driver_batch/0",
+                                   {"campus/device1": {"headers": {"Date": "1"}, "message": [{"a": 1}, {}]},
+                                    "campus/device2": {"headers": {"Date": "2"}, "message": [{"a": 2}, {}]}})]
+    assert publisher.get_statistics()["open_batches"] == 1
+
+
+@pytest.mark.driver_unit
+def test_add_should_publish_full_batch_immediately():
+    recorder = Recorder()
+    publisher = BatchPublisher(recorder.publish, 5.0, topic="batch/", max_devices=2,
+                               spawn_later=recorder.spawn_later)
+
+    publisher.add(3, "device1", {}, [{}, {}])
+    publisher.add(3, "device2", {}, [{}, {}])
+
+    assert [topic for topic, _ in recorder.published] == ["batch/3"]
+    assert recorder.timers[0].killed
+    stats = publisher.get_statistics()
+    assert stats["batches_published"] == 1
+    assert stats["largest_batch"] == 2
+
+
+@pytest.mark.driver_unit
+def test_flush_all_should_publish_open_batches():
+    recorder = Recorder()
+    publisher = BatchPublisher(recorder.publish, 5.0, spawn_later=recorder.spawn_later)
+    publisher.add(0, "device1", {}, [{}, {}])
+    publisher.add(1, "device2", {}, [{}, {}])
+
+    publisher.flush_all()
+    publisher.flush_all()
+
+    assert len(recorder.published) == 2
+    assert publisher.get_statistics()["devices_published"] == 2
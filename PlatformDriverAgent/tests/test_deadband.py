@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import gevent
+import pytest
+
+from platform_driver.deadband import ChangeFilter, parse_deadband, merge_changes, KEYFRAME_HEADER
+from platform_driver.payload import PAYLOAD_FORMAT_HEADER
+from platform_driver.publish_queue import PublishQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.driver_unit
+@pytest.mark.parametrize("value, expected", [(None, None),
+                                             ("", None),
+                                             (0, (0.0, None)),
+                                             (0.5, (0.5, None)),
+                                             ("1.5", (1.5, None)),
+                                             (" 2% ", (None, 2.0))])
+def test_parse_deadband(value, expected):
+    assert parse_deadband(value) == expected
+
+
+@pytest.mark.driver_unit
+def test_parse_deadband_should_raise_on_invalid_value():
+    with pytest.raises(ValueError):
+        parse_deadband("high")
+
+
+@pytest.mark.driver_unit
+def test_filter_should_publish_points_outside_deadband():
+    change_filter = ChangeFilter({"temp": (0.5, None), "power": (None, 10.0)})
+
+    assert change_filter.filter({"temp": 70.0, "power": 100.0, "mode": "auto"}) == \
+        ({"temp": 70.0, "power": 100.0, "mode": "auto"}, True)
+    assert change_filter.filter({"temp": 70.4, "power": 109.0, "mode": "auto"}) == ({}, False)
+    # Drift is measured from the last published value.
+    assert change_filter.filter({"temp": 70.6, "power": 111.0, "mode": "off"}) == \
+        ({"temp": 70.6, "power": 111.0, "mode": "off"}, False)
+
+
+@pytest.mark.driver_unit
+def test_filter_should_publish_keyframes_by_count_and_time():
+    clock = FakeClock()
+    change_filter = ChangeFilter(default_deadband=(1.0, None), keyframe_scrapes=3, keyframe_interval=60.0,
+                                 clock=clock)
+    results = {"a": 1, "b": True}
+
+    keyframes = [change_filter.filter(results)[1] for _ in range(7)]
+    assert keyframes == [True, False, False, True, False, False, True]
+
+    clock.now = 60.0
+    assert change_filter.filter(results) == (results, True)
+    stats = change_filter.get_statistics()
+    assert (stats["scrapes"], stats["keyframes"]) == (8, 4)
+    assert (stats["points_scraped"], stats["points_published"]) == (16, 8)
+
+
+@pytest.mark.driver_unit
+def test_filter_changes_should_apply_deadbands_without_keyframes():
+    change_filter = ChangeFilter(default_deadband=(0.5, None), keyframe_scrapes=1)
+    change_filter.filter({"a": 1.0, "b": 2.0})
+
+    assert change_filter.filter_changes({"a": 1.2}) == {}
+    assert change_filter.filter_changes({"a": 1.6, "c": "on"}) == {"a": 1.6, "c": "on"}
+    # Drift is measured from the value the partial update published.
+    assert change_filter.filter({"a": 1.7, "b": 2.0}) == ({"a": 1.7, "b": 2.0}, True)
+    assert change_filter.get_statistics()["scrapes"] == 2
+
+
+@pytest.mark.driver_unit
+def test_reset_should_force_keyframe():
+    change_filter = ChangeFilter()
+    change_filter.filter({"a": 1})
+
+    change_filter.reset()
+
+    assert change_filter.filter({"a": 1}) == ({"a": 1}, True)
+
+
+@pytest.mark.driver_unit
+def test_latest_policy_should_merge_waiting_changes():
+    published = []
+    queue = PublishQueue(lambda topic, headers, message: published.append((topic, headers, message)),
+                         overflow="latest", collapse=merge_changes)
+    change_filter = ChangeFilter(default_deadband=(0.0, None), keyframe_scrapes=10)
+    meta = {"a": {"units": "F"}, "b": {"units": "F"}, "c": {"units": "F"}}
+
+    for scrape in ({"a": 1, "b": 1, "c": 1}, {"a": 2, "b": 1, "c": 1}, {"a": 2, "b": 2, "c": 1}):
+        results, keyframe = change_filter.filter(scrape)
+        queue.put("devices/dev/all", {KEYFRAME_HEADER: keyframe}, [results, {p: meta[p] for p in results}])
+        # The message bus is too slow to publish before the next scrape.
+        results, keyframe = change_filter.filter(dict(scrape, c=scrape["c"] + 10))
+        queue.put("devices/dev/all", {KEYFRAME_HEADER: keyframe}, [results, {p: meta[p] for p in results}])
+    gevent.sleep(0)
+
+    assert len(published) == 1
+    _, headers, (results, meta_data) = published[0]
+    assert headers[KEYFRAME_HEADER] is True
+    assert results == {"a": 2, "b": 2, "c": 11}
+    assert meta_data == meta
+
+
+@pytest.mark.driver_unit
+def test_merge_changes_should_merge_only_sparse_messages():
+    keyframe = ({KEYFRAME_HEADER: True}, [{"a": 1, "b": 1}, {}])
+    sparse = ({KEYFRAME_HEADER: False}, [{"b": 2}, {}])
+    later = ({KEYFRAME_HEADER: False}, [{"a": 3}, {}])
+
+    assert merge_changes(keyframe, sparse) == ({KEYFRAME_HEADER: True}, [{"a": 1, "b": 2}, {}])
+    assert merge_changes(sparse, later) == ({KEYFRAME_HEADER: False}, [{"a": 3, "b": 2}, {}])
+    assert merge_changes(sparse, keyframe) is keyframe
+    # Point topics keep the newer value.
+    point = ({KEYFRAME_HEADER: False}, [4, {}])
+    assert merge_changes(({KEYFRAME_HEADER: False}, [3, {}]), point) is point
+    # Encoded payloads are queued separately.
+    encoded = ({KEYFRAME_HEADER: False, PAYLOAD_FORMAT_HEADER: "columnar"}, [{"version": "1", "columns": {}}, {}])
+    assert merge_changes(sparse, encoded) is None
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import pytest
+
+from platform_driver.device_index import DeviceIndex
+
+PATHS = ["campus/building1/ahu1", "campus/building1/vav1", "campus/building1/vav2",
+         "campus/building10/vav1", "campus/building2/vav1"]
+
+
+@pytest.mark.driver_unit
+@pytest.mark.parametrize("pattern, expected", [("campus/building1/*", PATHS[:3]),
+                                               ("campus/building1*/vav1", [PATHS[1], PATHS[3]]),
+                                               ("*/vav2", [PATHS[2]]),
+                                               ("campus/building2/vav1", [PATHS[4]]),
+                                               ("campus/building3/*", [])])
+def test_match_should_return_sorted_matching_paths(pattern, expected):
+    index = DeviceIndex(reversed(PATHS))
+
+    assert index.match(pattern) == expected
+
+
+@pytest.mark.driver_unit
+def test_match_any_should_page_through_matches():
+    index = DeviceIndex(PATHS)
+    patterns = ["campus/building1/vav*", "campus/building2/*"]
+
+    first = index.match_any(patterns, limit=2)
+    second = index.match_any(patterns, after=first[-1], limit=2)
+
+    assert first == [PATHS[1], PATHS[2]]
+    assert second == [PATHS[4]]
+
+
+@pytest.mark.driver_unit
+def test_add_and_remove_should_keep_index_sorted():
+    index = DeviceIndex()
+    for path in PATHS[::-1]:
+        index.add(path)
+    index.add(PATHS[0])
+    index.remove(PATHS[1])
+    index.remove("missing")
+
+    assert len(index) == 4
+    assert PATHS[1] not in index
+    assert index.match("*") == [PATHS[0]] + PATHS[2:]
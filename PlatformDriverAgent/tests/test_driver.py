@@ -39,7 +39,9 @@
 import logging
 import contextlib
 from datetime import datetime, date, time
-from mock import create_autospec
+from time import monotonic
+from gevent.event import AsyncResult
+from mock import create_autospec, MagicMock
 
 import pytest
 import pytz
@@ -48,14 +50,14 @@ from platform_driver import agent
 from platform_driver.agent import DriverAgent
 from platform_driver.interfaces import BaseInterface
 from platform_driver.interfaces.fakedriver import Interface as FakeInterface
-from volttrontesting.utils.utils import AgentMock
-from volttron.platform.vip.agent import Agent
+from platform_driver.deadband import ChangeFilter
+from platform_driver.subscriptions import SubscriptionCache
+from platform_driver.scheduler import ScrapeScheduler, ScheduledScrape, TickClock
+from platform_driver.registry_cache import registry_cache
 from volttron.platform.messaging.utils import Topic
-from volttron.platform.vip.agent.core import ScheduledEvent
 
 
 agent._log = logging.getLogger("test_logger")
-DriverAgent.__bases__ = (AgentMock.imitate(Agent, Agent()),)
 
 
 @pytest.mark.driver_unit
@@ -82,12 +84,12 @@ def test_update_publish_types_should_only_set_depth_first_to_true():
                           (1, 4, 2, 3, 10, 2)])
 def test_update_scrape_schedule_should_set_periodic_event(time_slot, driver_scrape_interval, group, group_offset_interval,
                                                           expected_time_slot_offset, expected_group):
-    with get_driver_agent(has_periodic_read_event=True, has_core_schedule=True) as driver_agent:
+    with get_driver_agent(has_periodic_read_event=True, has_scheduler=True) as driver_agent:
         driver_agent.update_scrape_schedule(time_slot, driver_scrape_interval, group, group_offset_interval)
 
         assert driver_agent.group == expected_group
         assert driver_agent.time_slot_offset == expected_time_slot_offset
-        assert isinstance(driver_agent.periodic_read_event, ScheduledEvent)
+        assert isinstance(driver_agent.periodic_read_event, ScheduledScrape)
 
 
 @pytest.mark.driver_unit
@@ -147,17 +149,16 @@ def test_get_interface_should_return_fakedriver_interface():
 
 
 @pytest.mark.driver_unit
-def test_starting_should_succeed():
-    sender = "somesender"
+def test_start_should_succeed():
     expected_path_depth = "devices/path/to/my/device/all"
     expected_path_breadth = "devices/all/device/my/to/path"
 
-    with get_driver_agent(has_core_schedule=True) as driver_agent:
-        driver_agent.starting(sender)
+    with get_driver_agent(has_scheduler=True) as driver_agent:
+        driver_agent.start()
 
         assert driver_agent.all_path_depth == expected_path_depth
         assert driver_agent.all_path_breadth == expected_path_breadth
-        assert isinstance(driver_agent.periodic_read_event, ScheduledEvent)
+        assert isinstance(driver_agent.periodic_read_event, ScheduledScrape)
 
 
 @pytest.mark.driver_unit
@@ -172,21 +173,175 @@ def test_setup_device_should_succeed():
         assert driver_agent.base_topic == expected_base_topic
         assert driver_agent.device_name == expected_device_name
         assert driver_agent.meta_data == expected_meta_data
+        assert len(driver_agent.meta_data_version) == 16
+        assert driver_agent.point_topics == {"PowerState": ("devices/path/to/my/device/PowerState",
+                                                            "devices/PowerState/device/my/to/path")}
+
+
+@pytest.mark.driver_unit
+def test_setup_device_should_create_change_filter_from_registry_deadband():
+    with get_driver_agent() as driver_agent:
+        driver_agent.config["registry_config"][0]["Deadband"] = "2%"
+        driver_agent.config["keyframe_scrapes"] = 5
+
+        driver_agent.setup_device()
+
+        assert driver_agent.change_filter.deadbands == {"PowerState": (None, 2.0)}
+        assert driver_agent.change_filter.keyframe_scrapes == 5
+
+
+@pytest.mark.driver_unit
+def test_periodic_read_should_publish_only_changed_points():
+    now = pytz.UTC.localize(datetime.utcnow())
+
+    with get_driver_agent(has_scheduler=True, meta_data={"foo": "bar", "baz": "qux"},
+                          has_base_topic=True, mock_publish_wrapper=True,
+                          interface_scrape_all={"foo": 1, "baz": 2}) as driver_agent:
+        driver_agent.change_filter = ChangeFilter(default_deadband=(0.5, None))
+        driver_agent.periodic_read(now)
+        driver_agent.interface.scrape_all.return_value = {"foo": 1.2, "baz": 3}
+        driver_agent._publish_wrapper.reset_mock()
+
+        driver_agent.periodic_read(now)
+
+        driver_agent._publish_wrapper.assert_called_once()
+        kwargs = driver_agent._publish_wrapper.call_args[1]
+        assert kwargs["message"] == [3, "qux"]
+        assert kwargs["headers"]["Keyframe"] is False
+
+
+@pytest.mark.driver_unit
+def test_periodic_read_should_send_metadata_version_instead_of_metadata():
+    now = pytz.UTC.localize(datetime.utcnow())
+
+    with get_driver_agent(has_scheduler=True, meta_data={"foo": "bar"},
+                          has_base_topic=True, mock_publish_wrapper=True,
+                          interface_scrape_all={"foo": 1}) as driver_agent:
+        driver_agent.include_metadata = False
+        driver_agent.meta_data_version = "abc"
+
+        driver_agent.periodic_read(now)
+
+        kwargs = driver_agent._publish_wrapper.call_args[1]
+        assert kwargs["message"] == [1, {}]
+        assert kwargs["headers"]["MetadataVersion"] == "abc"
+
+
+@pytest.mark.driver_unit
+def test_update_publish_types_should_publish_metadata_when_excluded():
+    with get_driver_agent(mock_publish_wrapper=True) as driver_agent:
+        driver_agent.setup_device()
+
+        driver_agent.update_publish_types(False, False, True, False, include_metadata=False)
+
+        kwargs = driver_agent._publish_wrapper.call_args[1]
+        assert driver_agent._publish_wrapper.call_args[0][0] == "driver_metadata/path/to/my/device"
+        assert kwargs["message"] is driver_agent.meta_data
+        assert kwargs["headers"]["MetadataVersion"] == driver_agent.meta_data_version
+
+
+@pytest.mark.driver_unit
+def test_periodic_read_should_publish_columnar_all_payload():
+    now = pytz.UTC.localize(datetime.utcnow())
+
+    with get_driver_agent(has_scheduler=True, has_base_topic=True, mock_publish_wrapper=True) as driver_agent:
+        driver_agent.config["payload_format"] = "columnar"
+        driver_agent.setup_device()
+        driver_agent.publish_depth_first = False
+        driver_agent.publish_depth_first_all = True
+        driver_agent.all_path_depth, driver_agent.all_path_breadth = "depth/all", "breadth/all"
+
+        driver_agent.periodic_read(now)
+
+        kwargs = driver_agent._publish_wrapper.call_args[1]
+        assert kwargs["headers"]["PayloadFormat"] == "columnar"
+        assert kwargs["message"][0] == {"version": driver_agent.meta_data_version,
+                                        "columns": {"integer": [0]}}
+
+
+@pytest.mark.driver_unit
+def test_update_publish_types_should_drop_point_topics_without_point_publishes():
+    with get_driver_agent() as driver_agent:
+        driver_agent.setup_device()
+        del driver_agent.config["publish_depth_first"]
+
+        driver_agent.update_publish_types(False, False, False, False)
+
+        assert driver_agent.point_topics == {}
+        assert driver_agent.get_point_topics("PowerState") == driver_agent.get_paths_for_point("PowerState")
 
 
 @pytest.mark.driver_unit
 def test_periodic_read_should_succeed():
     now = pytz.UTC.localize(datetime.utcnow())
 
-    with get_driver_agent(has_core_schedule=True, meta_data={"foo": "bar"},
+    with get_driver_agent(has_scheduler=True, meta_data={"foo": "bar"},
                           has_base_topic=True, mock_publish_wrapper=True,
                           interface_scrape_all={"foo": "bar"}) as driver_agent:
         driver_agent.periodic_read(now)
 
         driver_agent.parent.scrape_starting.assert_called_once()
         driver_agent.parent.scrape_ending.assert_called_once()
+        driver_agent.parent.record_scrape_duration.assert_called_once()
         driver_agent._publish_wrapper.assert_called_once()
-        assert isinstance(driver_agent.periodic_read_event, ScheduledEvent)
+        assert isinstance(driver_agent.periodic_read_event, ScheduledScrape)
+
+
+@pytest.mark.driver_unit
+def test_periodic_read_should_add_results_to_batch():
+    now = pytz.UTC.localize(datetime.utcnow())
+
+    with get_driver_agent(has_scheduler=True, meta_data={"foo": "bar"},
+                          has_base_topic=True, mock_publish_wrapper=True,
+                          interface_scrape_all={"foo": "bar"}) as driver_agent:
+        driver_agent.parent.batch_publisher = MagicMock(per_device=False)
+        driver_agent.publish_depth_first_all = True
+
+        driver_agent.periodic_read(now)
+
+        args = driver_agent.parent.batch_publisher.add.call_args[0]
+        assert args[:2] == (42, "path/to/my/device")
+        assert args[3] == [{"foo": "bar"}, {"foo": "bar"}]
+        # Only the per point publish remains.
+        driver_agent._publish_wrapper.assert_called_once()
+
+
+@pytest.mark.driver_unit
+def test_periodic_read_should_queue_each_message_once_for_all_topic_variants():
+    now = pytz.UTC.localize(datetime.utcnow())
+
+    with get_driver_agent(has_scheduler=True, meta_data={"foo": "bar"},
+                          has_base_topic=True, mock_publish_wrapper=True,
+                          interface_scrape_all={"foo": 1}) as driver_agent:
+        for publish_type in ("publish_depth_first_all", "publish_breadth_first_all",
+                             "publish_depth_first", "publish_breadth_first"):
+            del driver_agent.config[publish_type]
+        driver_agent.update_publish_types(True, True, True, True)
+        driver_agent.all_path_depth, driver_agent.all_path_breadth = "depth/all", "breadth/all"
+
+        driver_agent.periodic_read(now)
+
+        calls = driver_agent._publish_wrapper.call_args_list
+        assert len(calls) == 2
+        assert calls[0][0][0] == list(driver_agent.get_paths_for_point("foo"))
+        assert calls[1][0][0] == ["depth/all", "breadth/all"]
+        assert calls[1][1]["message"] == [{"foo": 1}, {"foo": "bar"}]
+
+
+@pytest.mark.driver_unit
+def test_periodic_read_should_skip_topics_without_subscribers():
+    now = pytz.UTC.localize(datetime.utcnow())
+
+    with get_driver_agent(has_scheduler=True, meta_data={"foo": "bar"},
+                          has_base_topic=True, mock_publish_wrapper=True,
+                          interface_scrape_all={"foo": 1}) as driver_agent:
+        driver_agent.parent.subscription_cache = SubscriptionCache()
+        driver_agent.parent.subscription_cache.update(["analysis"])
+
+        driver_agent.periodic_read(now)
+
+        driver_agent._publish_wrapper.assert_not_called()
+        driver_agent.parent.scrape_ending.assert_called_once()
 
 
 @pytest.mark.driver_unit
@@ -194,7 +349,7 @@ def test_periodic_read_should_succeed():
 def test_periodic_read_should_return_none_on_scrape_response(scrape_all_response):
     now = pytz.UTC.localize(datetime.utcnow())
 
-    with get_driver_agent(has_core_schedule=True, meta_data={"foo": "bar"},
+    with get_driver_agent(has_scheduler=True, meta_data={"foo": "bar"},
                           mock_publish_wrapper=True, interface_scrape_all=scrape_all_response) as driver_agent:
         result = driver_agent.periodic_read(now)
 
@@ -202,7 +357,98 @@ def test_periodic_read_should_return_none_on_scrape_response(scrape_all_response
         driver_agent.parent.scrape_starting.assert_called_once()
         driver_agent.parent.scrape_ending.assert_not_called()
         driver_agent._publish_wrapper.assert_not_called()
-        assert isinstance(driver_agent.periodic_read_event, ScheduledEvent)
+        assert isinstance(driver_agent.periodic_read_event, ScheduledScrape)
+
+
+@pytest.mark.driver_unit
+def test_periodic_read_should_skip_scrape_while_previous_scrape_in_progress():
+    now = pytz.UTC.localize(datetime.utcnow())
+
+    with get_driver_agent(has_scheduler=True, meta_data={"foo": "bar"},
+                          mock_publish_wrapper=True, interface_scrape_all={"foo": "bar"}) as driver_agent:
+        driver_agent._scrape_in_flight = AsyncResult()
+        driver_agent._scrape_started = monotonic()
+
+        driver_agent.periodic_read(now)
+
+        assert driver_agent.scrape_overruns == 1
+        driver_agent.parent.scrape_starting.assert_not_called()
+        driver_agent.interface.scrape_all.assert_not_called()
+        assert isinstance(driver_agent.periodic_read_event, ScheduledScrape)
+
+
+@pytest.mark.driver_unit
+def test_get_point_should_share_scrape_in_progress():
+    in_flight = AsyncResult()
+    in_flight.set({"pointname": 42})
+
+    with get_driver_agent() as driver_agent:
+        driver_agent._scrape_in_flight = in_flight
+
+        assert driver_agent.get_point("pointname") == 42
+        driver_agent.interface.get_point.assert_not_called()
+        assert driver_agent.coalesced_requests == 1
+
+
+@pytest.mark.driver_unit
+def test_get_point_should_not_share_scrape_started_before_a_write():
+    in_flight = AsyncResult()
+    in_flight.set({"pointname": 42})
+
+    with get_driver_agent() as driver_agent:
+        driver_agent._scrape_in_flight = in_flight
+        driver_agent._scrape_generation = driver_agent.value_cache.generation()
+        driver_agent.set_point("pointname", 43)
+        driver_agent.interface.get_point.return_value = 43
+
+        assert driver_agent.get_point("pointname") == 43
+        driver_agent.interface.get_point.assert_called_once_with("pointname")
+        assert driver_agent.coalesced_requests == 0
+
+
+@pytest.mark.driver_unit
+def test_scrape_should_not_cache_values_written_while_in_progress():
+    with get_driver_agent() as driver_agent:
+        def scrape_all():
+            driver_agent.set_point("a", 5)
+            return {"a": 1, "b": 2}
+        driver_agent.interface.scrape_all.side_effect = scrape_all
+
+        assert driver_agent.scrape_all() == {"a": 1, "b": 2}
+        assert driver_agent.value_cache.get("a", 60.0) == (False, None)
+        assert driver_agent.value_cache.get("b", 60.0) == (True, 2)
+
+
+@pytest.mark.driver_unit
+def test_stop_should_cancel_scrapes_and_interface_events():
+    with get_driver_agent(has_periodic_read_event=True) as driver_agent:
+        periodic_read_event = driver_agent.periodic_read_event
+        interface_event = driver_agent.core.schedule(datetime.now(), print)
+
+        driver_agent.stop()
+
+        assert driver_agent.stopped
+        assert driver_agent.periodic_read_event is None
+        periodic_read_event.cancel.assert_called_once()
+        interface_event.cancel.assert_called_once()
+
+
+@pytest.mark.driver_unit
+def test_start_should_release_registry_when_stopped_during_setup():
+    with get_driver_agent() as driver_agent:
+        key, _ = registry_cache.acquire([{"Point Name": "StoppedDuringSetup"}])
+
+        def setup_device():
+            # stop() runs while the interface is being configured.
+            driver_agent.stop()
+            driver_agent.registry_key = key
+
+        driver_agent.setup_device = setup_device
+        driver_agent.start()
+
+        assert driver_agent.registry_key is None
+        assert driver_agent.periodic_read_event is None
+        assert registry_cache.get_statistics()["registries"] == 0
 
 
 @pytest.mark.driver_unit
@@ -245,6 +491,24 @@ def test_get_point_should_succeed():
         driver_agent.interface.get_point.assert_called_once()
 
 
+@pytest.mark.driver_unit
+def test_get_point_should_serve_fresh_scrape_values_from_cache():
+    with get_driver_agent() as driver_agent:
+        driver_agent.device_name = "device"
+        driver_agent.value_cache.update({"a": 1, "b": 2})
+        driver_agent.interface.get_multiple_points.return_value = ({"device/c": 3}, {})
+
+        assert driver_agent.get_point("a", max_age=60) == 1
+        assert driver_agent.get_multiple_points(["b", "c"], max_age=60) == ({"device/b": 2, "device/c": 3}, {})
+        driver_agent.interface.get_point.assert_not_called()
+        driver_agent.interface.get_multiple_points.assert_called_once_with("device", ["c"])
+
+        driver_agent.set_point("a", 5)
+        driver_agent.get_point("a", max_age=60)
+        driver_agent.interface.get_point.assert_called_once_with("a")
+        assert driver_agent.get_scrape_statistics()["value_cache"]["hits"] == 2
+
+
 @pytest.mark.driver_unit
 def test_set_point_should_succeed():
     with get_driver_agent() as driver_agent:
@@ -306,6 +570,74 @@ def test_publish_cov_value_should_succeed_when_publish_depth_first_is_true():
         driver_agent._publish_wrapper.assert_called_once()
 
 
+@pytest.mark.driver_unit
+def test_publish_cov_value_should_publish_each_value_without_window():
+    with get_driver_agent(mock_publish_wrapper=True,
+                          meta_data={"a": {"units": "1"}},
+                          has_base_topic=True) as driver_agent:
+        for publish_type in ("publish_depth_first_all", "publish_breadth_first_all",
+                             "publish_depth_first", "publish_breadth_first"):
+            del driver_agent.config[publish_type]
+        driver_agent.update_publish_types(True, False, False, False)
+        driver_agent.all_path_depth, driver_agent.all_path_breadth = "depth/all", "breadth/all"
+
+        driver_agent.publish_cov_value("a", {"presentValue": 1, "statusFlags": 2})
+
+        driver_agent.core._core.spawn_later.assert_not_called()
+        messages = [c[1]["message"] for c in driver_agent._publish_wrapper.call_args_list]
+        assert messages == [[{"a": 1}, {"a": {"units": "1"}}], [{"a": 2}, {"a": {"units": "1"}}]]
+
+
+@pytest.mark.driver_unit
+def test_publish_cov_value_should_coalesce_values_within_window():
+    with get_driver_agent(mock_publish_wrapper=True,
+                          meta_data={"a": {"units": "1"}, "b": {"units": "2"}},
+                          has_base_topic=True) as driver_agent:
+        for publish_type in ("publish_depth_first_all", "publish_breadth_first_all",
+                             "publish_depth_first", "publish_breadth_first"):
+            del driver_agent.config[publish_type]
+        driver_agent.update_publish_types(True, False, False, False)
+        driver_agent.all_path_depth, driver_agent.all_path_breadth = "depth/all", "breadth/all"
+        driver_agent.cov_coalesce_window = 0.5
+
+        driver_agent.publish_cov_value("a", {"presentValue": 1})
+        driver_agent.publish_cov_value("b", {"presentValue": 2})
+        driver_agent.publish_cov_value("a", {"presentValue": 3})
+
+        driver_agent.core._core.spawn_later.assert_called_once()
+        driver_agent._publish_wrapper.assert_not_called()
+
+        driver_agent.flush_cov_values()
+
+        driver_agent._publish_wrapper.assert_called_once()
+        message = driver_agent._publish_wrapper.call_args[1]["message"]
+        assert message == [{"a": 3, "b": 2}, {"a": {"units": "1"}, "b": {"units": "2"}}]
+        stats = driver_agent.get_scrape_statistics()
+        assert (stats["cov_received"], stats["cov_publishes"]) == (3, 1)
+
+
+@pytest.mark.driver_unit
+def test_publish_cov_value_should_publish_only_changed_points():
+    with get_driver_agent(mock_publish_wrapper=True,
+                          meta_data={"a": {"units": "1"}},
+                          has_base_topic=True) as driver_agent:
+        for publish_type in ("publish_depth_first_all", "publish_breadth_first_all",
+                             "publish_depth_first", "publish_breadth_first"):
+            del driver_agent.config[publish_type]
+        driver_agent.update_publish_types(True, False, False, False)
+        driver_agent.all_path_depth, driver_agent.all_path_breadth = "depth/all", "breadth/all"
+        driver_agent.change_filter = ChangeFilter(default_deadband=(0.5, None))
+
+        driver_agent.publish_cov_value("a", {"presentValue": 1.0})
+        driver_agent.publish_cov_value("a", {"presentValue": 1.2})
+
+        driver_agent._publish_wrapper.assert_called_once()
+        kwargs = driver_agent._publish_wrapper.call_args[1]
+        assert kwargs["message"] == [{"a": 1.0}, {"a": {"units": "1"}}]
+        assert kwargs["headers"]["Keyframe"] is False
+        assert driver_agent.get_scrape_statistics()["cov_publishes"] == 1
+
+
 class MockedParent:
     def scrape_starting(self, device_name):
         pass
@@ -313,6 +645,9 @@ class MockedParent:
     def scrape_ending(self, device_name):
         pass
 
+    def record_scrape_duration(self, device_path, duration):
+        pass
+
 
 class MockedBaseTopic:
     def __call__(self, point):
@@ -327,7 +662,7 @@ class MockedPublishWrapper:
 @contextlib.contextmanager
 def get_driver_agent(has_base_topic: bool = False,
                      has_periodic_read_event: bool = False,
-                     has_core_schedule: bool = False,
+                     has_scheduler: bool = False,
                      meta_data: dict = None,
                      mock_publish_wrapper: bool = False,
                      interface_scrape_all: any = None,
@@ -336,7 +671,7 @@ def get_driver_agent(has_base_topic: bool = False,
     Creates a Driver Agent and mocks its dependencies to be used for unit testing.
     :param has_base_topic:
     :param has_periodic_read_event:
-    :param has_core_schedule:
+    :param has_scheduler:
     :param meta_data:
     :param mock_publish_wrapper:
     :param interface_scrape_all:
@@ -348,6 +683,11 @@ def get_driver_agent(has_base_topic: bool = False,
     # since parent is a mock and not a real instance of a class, we have to set attributes directly
     # create_autospec does not set attributes in a class' constructor
     parent.vip = ""
+    parent.core = MagicMock()
+    parent.scrape_scheduler = create_autospec(ScrapeScheduler)
+    parent.scrape_scheduler.clock = TickClock()
+    parent.batch_publisher = None
+    parent.subscription_cache = None
 
     config = {"driver_config": {},
               "driver_type": "fakedriver",
@@ -376,6 +716,7 @@ def get_driver_agent(has_base_topic: bool = False,
                                group, group_offset_interval)
 
     driver_agent.interface = create_autospec(BaseInterface)
+    driver_agent.interface.get_default_max_age.return_value = None
 
     if interface_scrape_all is not None:
         driver_agent.interface.scrape_all.return_value = interface_scrape_all
@@ -384,11 +725,10 @@ def get_driver_agent(has_base_topic: bool = False,
         driver_agent.base_topic = MockedBaseTopic()
 
     if has_periodic_read_event:
-        driver_agent.periodic_read_event = create_autospec(ScheduledEvent)
+        driver_agent.periodic_read_event = create_autospec(ScheduledScrape)
 
-    if has_core_schedule:
-        driver_agent.core.schedule.return_value = create_autospec(ScheduledEvent)
-        driver_agent.core.schedule.cancel = None
+    if has_scheduler:
+        parent.scrape_scheduler.schedule.return_value = create_autospec(ScheduledScrape)
 
     if meta_data is not None:
         driver_agent.meta_data = meta_data
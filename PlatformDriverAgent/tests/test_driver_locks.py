@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import gevent
+import pytest
+
+from platform_driver import driver_locks
+from platform_driver.driver_locks import (EndpointLimiter, configure_endpoint_limit, clear_endpoint_limits,
+                                          endpoint_lock, get_lock_statistics, add_endpoint_device,
+                                          remove_endpoint_device)
+
+
+@pytest.fixture
+def endpoints():
+    yield
+    clear_endpoint_limits(source="main")
+    clear_endpoint_limits(source="device")
+    clear_endpoint_limits(source=None)
+
+
+@pytest.mark.driver_unit
+def test_endpoint_lock_should_limit_concurrent_sessions(endpoints):
+    configure_endpoint_limit("10.0.0.5:502", max_connections=2)
+    active = []
+    peak = []
+
+    def session():
+        with endpoint_lock("10.0.0.5:502"):
+            active.append(1)
+            peak.append(len(active))
+            gevent.sleep(0.01)
+            active.pop()
+
+    gevent.joinall([gevent.spawn(session) for _ in range(6)])
+
+    stats = get_lock_statistics()["endpoints"]["10.0.0.5:502"]
+    assert max(peak) == 2
+    assert stats["acquisitions"] == 6
+    assert stats["contended"] == 4
+    assert stats["in_use"] == 0
+
+
+@pytest.mark.driver_unit
+def test_endpoint_lock_should_not_block_other_endpoints(endpoints):
+    configure_endpoint_limit("10.0.0.5:502", max_connections=1)
+
+    with endpoint_lock("10.0.0.5:502"):
+        with gevent.Timeout(1):
+            with endpoint_lock("10.0.0.6:502"):
+                pass
+
+
+@pytest.mark.driver_unit
+def test_device_limits_should_not_replace_main_limits(endpoints):
+    configure_endpoint_limit("/dev/ttyUSB0", max_connections=1, source="main")
+    configure_endpoint_limit("/dev/ttyUSB0", max_connections=5, source="device")
+
+    assert driver_locks._endpoint_limiters["/dev/ttyUSB0"].max_connections == 1
+
+
+@pytest.mark.driver_unit
+@pytest.mark.parametrize("device_first", [True, False])
+def test_clearing_main_limits_should_restore_device_limits(endpoints, device_first):
+    if device_first:
+        configure_endpoint_limit("/dev/ttyUSB0", max_connections=5, rate=10, source="device")
+    configure_endpoint_limit("/dev/ttyUSB0", max_connections=1, source="main")
+    if not device_first:
+        configure_endpoint_limit("/dev/ttyUSB0", max_connections=5, rate=10, source="device")
+    add_endpoint_device("/dev/ttyUSB0")
+    configure_endpoint_limit("10.0.0.5:502", max_connections=2, source="main")
+    add_endpoint_device("10.0.0.5:502")
+
+    clear_endpoint_limits(source="main")
+
+    limiter = driver_locks._endpoint_limiters["/dev/ttyUSB0"]
+    assert (limiter.max_connections, limiter.rate, limiter.source) == (5, 10.0, "device")
+    assert driver_locks._endpoint_limiters["10.0.0.5:502"].max_connections == 0
+    remove_endpoint_device("/dev/ttyUSB0")
+    remove_endpoint_device("10.0.0.5:502")
+
+
+@pytest.mark.driver_unit
+def test_token_bucket_should_limit_rate():
+    limiter = EndpointLimiter(rate=100.0, burst=1)
+
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release()
+
+    stats = limiter.get_statistics()
+    assert stats["contended"] == 4
+    assert stats["total_wait"] >= 0.03
+
+
+@pytest.mark.driver_unit
+def test_reconfiguring_limits_should_keep_open_sessions_and_statistics(endpoints):
+    configure_endpoint_limit("10.0.0.5:502", max_connections=2)
+    limiter = driver_locks._endpoint_limiters["10.0.0.5:502"]
+    active = []
+    peak = []
+
+    def session():
+        with endpoint_lock("10.0.0.5:502"):
+            active.append(1)
+            peak.append(len(active))
+            gevent.sleep(0.02)
+            active.pop()
+
+    greenlets = [gevent.spawn(session) for _ in range(2)]
+    gevent.sleep(0)
+    # A device configuring the same limits must not let a second pair of sessions in.
+    configure_endpoint_limit("10.0.0.5:502", max_connections=2)
+    greenlets.extend(gevent.spawn(session) for _ in range(2))
+    gevent.sleep(0)
+    configure_endpoint_limit("10.0.0.5:502", max_connections=1)
+    gevent.joinall(greenlets)
+
+    assert driver_locks._endpoint_limiters["10.0.0.5:502"] is limiter
+    assert max(peak) == 2
+    assert peak[2:] == [1, 1]
+    assert limiter.get_statistics()["acquisitions"] == 4
+
+
+@pytest.mark.driver_unit
+def test_raising_limit_should_wake_waiting_sessions(endpoints):
+    configure_endpoint_limit("10.0.0.5:502", max_connections=1)
+    limiter = driver_locks._endpoint_limiters["10.0.0.5:502"]
+    limiter.acquire()
+    waiting = gevent.spawn(limiter.acquire)
+    gevent.sleep(0.01)
+    assert not waiting.dead
+
+    configure_endpoint_limit("10.0.0.5:502", max_connections=2)
+    waiting.join(timeout=1)
+
+    assert waiting.dead
+    assert limiter.in_use == 2
+
+
+@pytest.mark.driver_unit
+def test_killed_waiter_should_not_hold_a_session(endpoints):
+    limiter = EndpointLimiter(max_connections=1)
+    limiter.acquire()
+    killed = gevent.spawn(limiter.acquire)
+    waiting = gevent.spawn(limiter.acquire)
+    gevent.sleep(0.01)
+
+    killed.kill()
+    limiter.release()
+    waiting.join(timeout=1)
+
+    assert waiting.dead
+    assert limiter.in_use == 1
+
+
+@pytest.mark.driver_unit
+def test_unlimited_endpoints_should_be_removed_when_unused(endpoints):
+    add_endpoint_device("10.0.0.7:502")
+    with endpoint_lock("10.0.0.7:502"):
+        pass
+    assert "10.0.0.7:502" in get_lock_statistics()["endpoints"]
+
+    remove_endpoint_device("10.0.0.7:502")
+    assert "10.0.0.7:502" not in get_lock_statistics()["endpoints"]
+
+    # Endpoints used without a device are only kept while a session is open.
+    with endpoint_lock("10.0.0.8:502"):
+        assert "10.0.0.8:502" in get_lock_statistics()["endpoints"]
+    assert "10.0.0.8:502" not in get_lock_statistics()["endpoints"]
+
+
+@pytest.mark.driver_unit
+def test_main_limits_should_outlive_devices(endpoints):
+    configure_endpoint_limit("10.0.0.9:502", max_connections=1)
+    add_endpoint_device("10.0.0.9:502")
+    remove_endpoint_device("10.0.0.9:502")
+
+    assert driver_locks._endpoint_limiters["10.0.0.9:502"].max_connections == 1
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import pytest
+
+from platform_driver.interface_registry import InterfaceRegistry
+
+
+class FakeEntryPoint:
+    def __init__(self, name, klass):
+        self.name = name
+        self.value = "fake_package:" + name
+        self.klass = klass
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return self.klass
+
+
+@pytest.mark.driver_unit
+def test_get_interface_class_should_import_builtin_interface_once():
+    registry = InterfaceRegistry()
+    registry._entry_points = {}
+
+    klass = registry.get_interface_class("fakedriver")
+
+    assert klass.__name__ == "Interface"
+    assert registry.get_interface_class("fakedriver") is klass
+    stats = registry.get_statistics()
+    assert stats["fakedriver"]["source"] == "platform_driver.interfaces.fakedriver"
+    assert stats["fakedriver"]["load_time"] >= 0
+
+
+@pytest.mark.driver_unit
+def test_get_interface_class_should_prefer_entry_points():
+    class PluginInterface:
+        pass
+
+    entry_point = FakeEntryPoint("fakedriver", PluginInterface)
+    registry = InterfaceRegistry()
+    registry._entry_points = {"fakedriver": entry_point}
+
+    assert registry.get_interface_class("fakedriver") is PluginInterface
+    assert registry.get_interface_class("fakedriver") is PluginInterface
+    assert entry_point.loads == 1
+    assert registry.get_statistics()["fakedriver"]["source"] == "fake_package:fakedriver"
+
+
+@pytest.mark.driver_unit
+def test_get_interface_class_should_raise_for_unknown_driver_type():
+    registry = InterfaceRegistry()
+    registry._entry_points = {}
+
+    with pytest.raises(ImportError):
+        registry.get_interface_class("no_such_driver")
+    assert registry.get_statistics() == {}
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import pytest
+
+from platform_driver.lifecycle import DeviceChangeQueue, StartupProgress
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.driver_unit
+def test_device_change_queue_should_keep_latest_change_in_arrival_order():
+    queue = DeviceChangeQueue()
+    queue.add("a", "NEW", {"group": 0})
+    queue.add("b", "NEW", {"group": 1})
+    queue.add("a", "DELETE")
+
+    assert "a" in queue
+    assert queue.drain() == [("b", "NEW", {"group": 1}), ("a", "DELETE", None)]
+    assert len(queue) == 0
+
+
+@pytest.mark.driver_unit
+def test_startup_progress_should_time_starts_and_publishes():
+    clock = FakeClock()
+    progress = StartupProgress(clock=clock)
+    progress.begin(["a", "b", "c"])
+
+    clock.now += 1.0
+    progress.device_started("a")
+    progress.device_started("b", success=False)
+    progress.device_skipped("c")
+    clock.now += 2.0
+    progress.device_published("a")
+    progress.device_published("unknown")
+
+    stats = progress.get_statistics()
+    assert stats["devices"] == 3
+    assert (stats["started"], stats["failed"], stats["skipped"], stats["pending"]) == (1, 1, 1, 0)
+    assert stats["published"] == 1
+    assert stats["time_to_started"] == 1.0
+    assert stats["time_to_first_publish"] == 3.0
+    assert stats["time_to_all_published"] == 3.0
+
+
+@pytest.mark.driver_unit
+def test_startup_progress_should_wait_for_unpublished_devices():
+    progress = StartupProgress()
+    progress.begin(["a", "b"])
+    progress.device_started("a")
+    progress.device_started("b")
+    progress.device_published("a")
+
+    assert progress.get_statistics()["time_to_all_published"] is None
+
+
+@pytest.mark.driver_unit
+def test_startup_progress_should_extend_batch_while_devices_are_starting():
+    clock = FakeClock()
+    progress = StartupProgress(clock=clock)
+    progress.begin(["a", "b"])
+    clock.now += 1.0
+    progress.device_started("a")
+    progress.begin(["b", "c"])
+    clock.now += 1.0
+    progress.device_started("b")
+    progress.device_started("c")
+
+    stats = progress.get_statistics()
+    assert stats["batches"] == 1
+    assert stats["devices"] == 3
+    assert (stats["started"], stats["pending"]) == (3, 0)
+    assert stats["time_to_started"] == 2.0
+
+    clock.now += 1.0
+    progress.begin(["d"])
+
+    stats = progress.get_statistics()
+    assert stats["batches"] == 2
+    assert (stats["devices"], stats["started"], stats["pending"]) == (1, 0, 1)
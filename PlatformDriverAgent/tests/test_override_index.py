@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import pytest
+
+from platform_driver.override_index import OverrideIndex
+
+
+@pytest.mark.driver_unit
+def test_remove_pattern_should_keep_devices_covered_by_other_patterns():
+    index = OverrideIndex()
+    index.add_pattern("campus/building1/*", ["campus/building1/vav1", "campus/building1/vav2"])
+    index.add_pattern("campus/*/vav1", ["campus/building1/vav1", "campus/building2/vav1"])
+
+    assert len(index) == 3
+    assert sorted(index) == ["campus/building1/vav1", "campus/building1/vav2", "campus/building2/vav1"]
+    assert sorted(index.remove_pattern("campus/building1/*")) == ["campus/building1/vav2"]
+    assert "campus/building1/vav1" in index
+    assert "campus/building1/vav2" not in index
+    assert sorted(index.remove_pattern("campus/*/vav1")) == ["campus/building1/vav1", "campus/building2/vav1"]
+    assert len(index) == 0
+
+
+@pytest.mark.driver_unit
+def test_add_device_should_match_existing_patterns():
+    index = OverrideIndex()
+    index.add_pattern("campus/building1/*", [])
+
+    assert index.add_device("campus/building1/ahu1")
+    assert not index.add_device("campus/building2/ahu1")
+    assert index.remove_pattern("campus/building1/*") == ["campus/building1/ahu1"]
+
+
+@pytest.mark.driver_unit
+def test_remove_device_should_drop_it_from_every_pattern():
+    index = OverrideIndex()
+    index.add_pattern("campus/*", ["campus/vav1"])
+    index.add_pattern("*/vav1", ["campus/vav1"])
+
+    index.remove_device("campus/vav1")
+
+    assert "campus/vav1" not in index
+    assert index.remove_pattern("campus/*") == []
+
+
+@pytest.mark.driver_unit
+def test_add_device_should_count_each_pattern_once():
+    index = OverrideIndex()
+    index.add_pattern("campus/*", ["campus/vav1"])
+
+    assert index.add_device("campus/vav1")
+    assert index.add_device("campus/vav1")
+
+    assert index.remove_pattern("campus/*") == ["campus/vav1"]
+    assert "campus/vav1" not in index
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import pytest
+
+from platform_driver.payload import ColumnarEncoder, decode_values
+
+META_DATA = {"temp": {"units": "degF", "type": "float", "tz": ""},
+             "mode": {"units": "", "type": "string", "tz": ""},
+             "occupied": {"units": "", "type": "boolean", "tz": ""},
+             "count": {"units": "", "type": "integer", "tz": ""},
+             "setpoint": {"units": "degF", "type": "float", "tz": ""}}
+
+
+@pytest.mark.driver_unit
+def test_encode_should_group_values_into_typed_columns():
+    encoder = ColumnarEncoder(META_DATA, "v1")
+
+    payload_format, payload = encoder.encode({"temp": 70.5, "mode": "auto", "occupied": True, "count": 3,
+                                              "setpoint": 72.0})
+
+    assert payload_format == "columnar"
+    assert payload == {"version": "v1", "columns": {"float": [70.5, 72.0], "integer": [3],
+                                                    "boolean": [True], "string": ["auto"]}}
+
+
+@pytest.mark.driver_unit
+def test_decode_should_round_trip_and_skip_missing_points():
+    encoder = ColumnarEncoder(META_DATA, "v1")
+    results = {"temp": 70.5, "occupied": False, "count": 0}
+
+    payload_format, payload = encoder.encode(results)
+
+    assert payload["missing"] == {"float": [1], "string": [0]}
+    assert decode_values(payload_format, payload, META_DATA) == results
+
+
+@pytest.mark.driver_unit
+def test_decode_should_keep_null_values():
+    encoder = ColumnarEncoder(META_DATA, "v1")
+    results = {"temp": None, "mode": None, "occupied": True, "count": 1, "setpoint": 72.0}
+
+    payload_format, payload = encoder.encode(results)
+
+    assert "missing" not in payload
+    assert decode_values(payload_format, payload, META_DATA) == results
+
+
+@pytest.mark.driver_unit
+def test_encode_should_compress_large_payloads():
+    meta_data = {"point{}".format(i): {"units": "", "type": "integer", "tz": ""} for i in range(500)}
+    results = {point: 1 for point in meta_data}
+    encoder = ColumnarEncoder(meta_data, "v2", compress_above=100)
+
+    payload_format, payload = encoder.encode(results)
+
+    assert payload_format == "columnar+zlib"
+    assert payload["version"] == "v2"
+    assert len(payload["data"]) < 100
+    assert decode_values(payload_format, payload, meta_data) == results
+    del results["point7"]
+    assert decode_values(*encoder.encode(results), meta_data) == results
+
+
+@pytest.mark.driver_unit
+def test_decode_should_pass_through_standard_payloads():
+    assert decode_values(None, {"temp": 1}, META_DATA) == {"temp": 1}
+    with pytest.raises(ValueError):
+        decode_values("msgpack", {}, META_DATA)
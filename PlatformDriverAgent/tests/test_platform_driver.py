@@ -51,6 +51,8 @@ from volttron.platform import get_services_core
 from volttron.platform.messaging.health import STATUS_GOOD
 from platform_driver import agent
 from platform_driver.agent import PlatformDriverAgent, OverrideError
+from platform_driver.value_cache import ValueCache
+from platform_driver.device_index import DeviceIndex
 from volttrontesting.utils.utils import AgentMock
 from volttron.platform.vip.agent import Agent
 
@@ -131,6 +133,63 @@ def test_stop_driver_should_return_none():
     assert result is None
 
 
+@pytest.mark.driver_unit
+def test_stop_driver_should_cancel_scheduled_scrape():
+    with get_platform_driver_agent() as platform_driver_agent:
+        instance = platform_driver_agent.instances["campus/building1/"]
+        scheduled_scrape = platform_driver_agent.scrape_scheduler.schedule(datetime.now().astimezone(), print)
+        instance.periodic_read_event = scheduled_scrape
+
+        platform_driver_agent.stop_driver("campus/building1/")
+
+        assert scheduled_scrape.cancelled
+        assert instance.stopped
+        assert "campus/building1/" not in platform_driver_agent.instances
+        assert platform_driver_agent.scrape_scheduler.get_statistics()["pending"] == 0
+        platform_driver_agent.scrape_scheduler.stop()
+
+
+@pytest.mark.driver_unit
+def test_reset_scrape_schedules_should_replan_with_measured_durations():
+    with get_platform_driver_agent() as platform_driver_agent:
+        platform_driver_agent.instances = {"fast": MockedInstance(), "slow": MockedInstance()}
+        platform_driver_agent.adaptive_time_slots = True
+        allocator = platform_driver_agent.slot_allocator
+        for topic in ("fast", "slow"):
+            allocator.add(topic, 60)
+        for _ in range(20):
+            allocator.record_duration("fast", 0.01)
+            allocator.record_duration("slow", 5.0)
+
+        platform_driver_agent.driver_scrape_interval = 0.5
+        platform_driver_agent._reset_scrape_schedules()
+
+        assert platform_driver_agent.slot_allocator is allocator
+        assert allocator.driver_scrape_interval == 0.5
+        assert allocator.get_duration("slow") > 4.0
+        assert platform_driver_agent.instances["slow"].time_slot == allocator.get_slot("slow") == 0
+        assert platform_driver_agent.instances["fast"].time_slot == allocator.get_slot("fast")
+
+
+@pytest.mark.driver_unit
+def test_configure_batch_publisher_should_keep_publisher_when_settings_are_unchanged():
+    with get_platform_driver_agent() as platform_driver_agent:
+        platform_driver_agent._configure_batch_publisher(1.0, "driver_batch", False)
+        batch_publisher = platform_driver_agent.batch_publisher
+        batch_publisher.add(0, "campus/building1/", {}, [{}, {}])
+
+        platform_driver_agent._configure_batch_publisher("1.0", "driver_batch/", False)
+        assert platform_driver_agent.batch_publisher is batch_publisher
+        assert batch_publisher.get_statistics()["open_batches"] == 1
+
+        platform_driver_agent._configure_batch_publisher(2.0, "driver_batch", False)
+        assert platform_driver_agent.batch_publisher is not batch_publisher
+        assert batch_publisher.get_statistics()["batches_published"] == 1
+
+        platform_driver_agent._configure_batch_publisher(0.0, "driver_batch", False)
+        assert platform_driver_agent.batch_publisher is None
+
+
 @pytest.mark.driver_unit
 def test_scrape_starting_should_return_none_on_false_scalability_test():
     topic = "mytopic/foobar"
@@ -177,6 +236,74 @@ def test_scrape_ending_should_increase_test_results_iterations():
         assert platform_driver_agent.test_iterations > 0
 
 
+@pytest.mark.driver_unit
+def test_set_override_on_should_return_the_job_ids_of_every_shard():
+    with get_platform_driver_agent() as platform_driver_agent:
+        platform_driver_agent._shard_identities = ["platform.driver", "platform.driver.1", "platform.driver.2"]
+        platform_driver_agent._called_by_shard = lambda: False
+        platform_driver_agent._set_override_on = lambda *args: "1"
+        shard_job_ids = {"platform.driver.1": "4", "platform.driver.2": None}
+        calls = []
+
+        def call_shard(identity, method, *args, **kwargs):
+            calls.append((identity, method, args))
+            return shard_job_ids[identity] if method == 'set_override_on' else {"job_id": args[0]}
+        platform_driver_agent._call_shard = call_shard
+
+        job_ids = platform_driver_agent.set_override_on("campus/*")
+
+        assert job_ids == ["platform.driver/1", "platform.driver.1/4"]
+        assert platform_driver_agent.get_revert_job("platform.driver.1/4") == {"job_id": "4"}
+        assert calls[-1] == ("platform.driver.1", "get_revert_job", ("4",))
+
+
+@pytest.mark.driver_unit
+def test_set_override_off_should_release_device_after_config_update():
+    device = "campus/Building1/vav1"
+
+    with get_platform_driver_agent(override_patterns=set()) as platform_driver_agent:
+        platform_driver_agent.instances = {device: MockedInstance()}
+        platform_driver_agent.device_index = DeviceIndex(platform_driver_agent.instances)
+        platform_driver_agent._name_map[device.lower()] = device
+        platform_driver_agent.set_override_on("campus/Building1/*", failsafe_revert=False)
+
+        # update_driver stops the device and starts it again with the new configuration.
+        platform_driver_agent.stop_driver(device)
+        platform_driver_agent.instances[device] = MockedInstance()
+        platform_driver_agent.device_index.add(device)
+        platform_driver_agent._update_override_state(device, 'add')
+        assert device in platform_driver_agent._override_devices
+
+        platform_driver_agent.set_override_off("campus/Building1/*")
+
+        assert device not in platform_driver_agent._override_devices
+        assert len(platform_driver_agent._override_devices) == 0
+
+
+@pytest.mark.driver_unit
+def test_configure_main_should_size_startup_pool_from_config_store():
+    with get_platform_driver_agent() as platform_driver_agent:
+        platform_driver_agent.instances = {}
+
+        platform_driver_agent.configure_main("config", "NEW", {"max_concurrent_startups": 3})
+
+        assert platform_driver_agent.max_concurrent_startups == 3
+        assert platform_driver_agent.startup_pool.size == 3
+        platform_driver_agent.publish_queue.stop()
+
+
+@pytest.mark.driver_unit
+def test_configure_main_should_size_bulk_pool_from_config_store():
+    with get_platform_driver_agent() as platform_driver_agent:
+        platform_driver_agent.instances = {}
+
+        platform_driver_agent.configure_main("config", "NEW", {"max_concurrent_bulk_requests": 4})
+
+        assert platform_driver_agent.max_concurrent_bulk_requests == 4
+        assert platform_driver_agent.bulk_pool.size == 4
+        platform_driver_agent.publish_queue.stop()
+
+
 @pytest.mark.driver_unit
 def test_clear_overrides():
     override_patterns = set("ffdfdsfd")
@@ -189,10 +316,113 @@ def test_clear_overrides():
         assert len(platform_driver_agent._override_patterns) == 0
 
 
+@pytest.mark.driver_unit
+def test_set_multiple_devices_points_should_return_results_and_errors_per_device():
+    with get_platform_driver_agent() as platform_driver_agent:
+        writable = MockedInstance()
+        overridden = MockedInstance()
+        platform_driver_agent.instances = {"campus/building1/vav1": writable, "campus/building1/vav2": overridden}
+        platform_driver_agent._override_devices.add_pattern("campus/building1/vav2", ["campus/building1/vav2"])
+
+        results, errors = platform_driver_agent.set_multiple_devices_points(
+            {"campus/building1/vav1": [("damper", 50)],
+             "campus/building1/vav2": [("damper", 50)],
+             "campus/building1/missing": [("damper", 50)]})
+
+        assert results == {"campus/building1/vav1": {}}
+        assert writable.written == [("damper", 50)]
+        assert overridden.written == []
+        assert set(errors) == {"campus/building1/vav2", "campus/building1/missing"}
+        assert "OverrideError" in errors["campus/building1/vav2"]
+
+
+@pytest.mark.driver_unit
+def test_get_multiple_devices_points_should_read_every_device():
+    with get_platform_driver_agent() as platform_driver_agent:
+        platform_driver_agent.instances = {"vav1": MockedInstance(), "vav2": MockedInstance()}
+
+        results, errors = platform_driver_agent.get_multiple_devices_points({"vav1": ["temp"], "vav2": ["temp"]})
+
+        assert results == {"vav1": ({"temp": 1}, {}), "vav2": ({"temp": 1}, {})}
+        assert errors == {}
+
+
+@pytest.mark.driver_unit
+def test_get_snapshot_should_page_through_cached_values():
+    with get_platform_driver_agent() as platform_driver_agent:
+        platform_driver_agent.instances = {}
+        platform_driver_agent.device_index = DeviceIndex()
+        for path in ("campus/building1/vav1", "campus/building1/vav2", "campus/building2/vav1"):
+            instance = MockedInstance()
+            instance.value_cache.update({"ZoneTemperature": 21.5, "DamperPosition": 40})
+            platform_driver_agent.instances[path] = instance
+            platform_driver_agent.device_index.add(path)
+
+        first = platform_driver_agent.get_snapshot("campus/building1/*", ["Zone*"], page_size=1)
+        second = platform_driver_agent.get_snapshot("campus/building1/*", ["Zone*"], page_size=1,
+                                                    page_token=first["next_page_token"])
+
+        assert list(first["devices"]) == ["campus/building1/vav1"]
+        value, timestamp = first["devices"]["campus/building1/vav1"]["ZoneTemperature"]
+        assert value == 21.5 and timestamp
+        assert list(first["devices"]["campus/building1/vav1"]) == ["ZoneTemperature"]
+        assert list(second["devices"]) == ["campus/building1/vav2"]
+        assert second["next_page_token"] is None
+        assert first["errors"] == second["errors"] == {}
+
+
+@pytest.mark.driver_unit
+def test_get_snapshot_should_report_shards_that_failed():
+    with get_platform_driver_agent() as platform_driver_agent:
+        platform_driver_agent.instances = {"campus/building1/vav1": MockedInstance()}
+        platform_driver_agent.device_index = DeviceIndex()
+        platform_driver_agent.device_index.add("campus/building1/vav1")
+        platform_driver_agent._shard_identities = ["platform.driver", "platform.driver.1", "platform.driver.2"]
+        platform_driver_agent._called_by_shard = lambda: False
+        pages = {"platform.driver.1": {"devices": {"campus/building1/vav2": {}}, "next_page_token": None,
+                                       "errors": {}}}
+
+        def call_shard(identity, method, *args, **kwargs):
+            if identity not in pages:
+                raise gevent.Timeout()
+            return pages[identity]
+        platform_driver_agent._call_shard = call_shard
+
+        page = platform_driver_agent.get_snapshot("campus/*")
+
+        assert list(page["devices"]) == ["campus/building1/vav1", "campus/building1/vav2"]
+        assert list(page["errors"]) == ["platform.driver.2"]
+
+
 class MockedInstance:
+    def __init__(self):
+        self.written = []
+        self.value_cache = ValueCache()
+        self.periodic_read_event = None
+        self.interval = 60
+        self.group = 0
+        self.time_slot = 0
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def update_scrape_schedule(self, time_slot, driver_scrape_interval, group, group_offset_interval):
+        self.time_slot = time_slot
+
     def revert_all(self):
         pass
 
+    def get_endpoint(self):
+        return None
+
+    def get_multiple_points(self, point_names, **kwargs):
+        return {point: 1 for point in point_names}, {}
+
+    def set_multiple_points(self, point_names_values, **kwargs):
+        self.written.extend(point_names_values)
+        return {}
+
 
 @contextlib.contextmanager
 def get_platform_driver_agent(override_patterns: set = set(),
@@ -215,6 +445,7 @@ def get_platform_driver_agent(override_patterns: set = set(),
 
     platform_driver_agent._override_patterns = override_patterns
     platform_driver_agent.instances = {"campus/building1/": MockedInstance()}
+    platform_driver_agent.device_index = DeviceIndex(platform_driver_agent.instances)
     platform_driver_agent.core.spawn_return_value = None
     platform_driver_agent._override_interval_events = override_interval_events
     platform_driver_agent._cancel_override_events_return_value = None
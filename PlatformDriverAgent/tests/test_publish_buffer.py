@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import gevent
+import pytest
+
+from platform_driver.publish_buffer import PublishBuffer, REPLAYED_HEADER
+
+
+class Recorder:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.published = []
+
+    def __call__(self, topic, headers, message):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("message bus unavailable")
+        self.published.append((topic, headers, message))
+
+
+@pytest.fixture
+def buffer_path(tmp_path):
+    return str(tmp_path / "publish_buffer.sqlite")
+
+
+@pytest.mark.driver_unit
+def test_replay_should_keep_original_headers(buffer_path):
+    recorder = Recorder()
+    buffer = PublishBuffer(buffer_path, recorder, max_messages=10)
+    buffer.store("devices/a/all", {"SyncTimeStamp": "2020-01-01T00:00:00+00:00"}, [{"p": 1}, {}])
+
+    assert len(buffer) == 1
+    assert buffer.replay_one()
+    assert not buffer.replay_one()
+
+    assert recorder.published == [("devices/a/all",
+                                   {"SyncTimeStamp": "2020-01-01T00:00:00+00:00", REPLAYED_HEADER: True},
+                                   [{"p": 1}, {}])]
+    stats = buffer.get_statistics()
+    assert (stats["messages"], stats["stored"], stats["replayed"], stats["replay_lag"]) == (0, 1, 1, 0.0)
+
+
+@pytest.mark.driver_unit
+def test_store_should_discard_oldest_when_full(buffer_path):
+    recorder = Recorder()
+    buffer = PublishBuffer(buffer_path, recorder, max_messages=2)
+    for value in range(3):
+        buffer.store("t", {}, value)
+
+    stats = buffer.get_statistics()
+    assert (stats["messages"], stats["fill"], stats["discarded"]) == (2, 1.0, 1)
+    while buffer.replay_one():
+        pass
+    assert [message for _, _, message in recorder.published] == [1, 2]
+
+
+@pytest.mark.driver_unit
+def test_failed_replay_should_keep_message(buffer_path):
+    recorder = Recorder(failures=1)
+    buffer = PublishBuffer(buffer_path, recorder, max_messages=10)
+    buffer.store("t", {}, 1)
+
+    assert not buffer.replay_one()
+    assert len(buffer) == 1
+    assert buffer.get_statistics()["replay_lag"] >= 0.0
+    assert buffer.replay_one()
+    assert len(buffer) == 0
+
+
+@pytest.mark.driver_unit
+def test_buffer_should_survive_restart(buffer_path):
+    buffer = PublishBuffer(buffer_path, Recorder(), max_messages=10)
+    buffer.store("t", {}, 1)
+    buffer.stop()
+
+    recorder = Recorder()
+    buffer = PublishBuffer(buffer_path, recorder, max_messages=10)
+    assert len(buffer) == 1
+    assert buffer.replay_one()
+    assert recorder.published[0][2] == 1
+
+
+@pytest.mark.driver_unit
+def test_replay_should_wait_for_idle_publishing(buffer_path):
+    recorder = Recorder()
+    idle = [False]
+    buffer = PublishBuffer(buffer_path, recorder, max_messages=10, replay_rate=1000, is_idle=lambda: idle[0])
+    buffer.start()
+    buffer.store("t", {}, 1)
+    gevent.sleep(0.05)
+    assert recorder.published == []
+
+    idle[0] = True
+    gevent.sleep(0.2)
+    assert len(recorder.published) == 1
+    buffer.stop()
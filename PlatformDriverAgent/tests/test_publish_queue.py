@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import gevent
+import pytest
+
+from platform_driver.publish_queue import PublishQueue
+
+
+class Busy(Exception):
+    pass
+
+
+class Recorder:
+    def __init__(self, failures=0, exception=Busy):
+        self.failures = failures
+        self.exception = exception
+        self.published = []
+
+    def __call__(self, topic, headers, message):
+        if self.failures:
+            self.failures -= 1
+            raise self.exception()
+        self.published.append((topic, message))
+
+
+@pytest.mark.driver_unit
+def test_put_should_publish_in_order_without_blocking():
+    recorder = Recorder()
+    queue = PublishQueue(recorder, workers=1)
+
+    queue.put("a", {}, 1)
+    queue.put("b", {}, 2)
+    assert recorder.published == []
+    assert len(queue) == 2
+
+    gevent.sleep(0)
+
+    assert recorder.published == [("a", 1), ("b", 2)]
+    stats = queue.get_statistics()
+    assert (stats["depth"], stats["published"], stats["workers"]) == (0, 2, 0)
+
+
+@pytest.mark.driver_unit
+def test_put_should_drop_oldest_when_full():
+    recorder = Recorder()
+    queue = PublishQueue(recorder, workers=1, max_size=2)
+
+    for value in range(4):
+        queue.put("a", {}, value)
+    gevent.sleep(0)
+
+    assert recorder.published == [("a", 2), ("a", 3)]
+    assert queue.get_statistics()["dropped"] == 2
+
+
+@pytest.mark.driver_unit
+def test_latest_overflow_should_replace_waiting_message_for_topic():
+    recorder = Recorder()
+    queue = PublishQueue(recorder, workers=1, overflow="latest")
+
+    queue.put("a", {}, 1)
+    queue.put("b", {}, 2)
+    queue.put("a", {}, 3)
+    gevent.sleep(0)
+
+    assert recorder.published == [("a", 3), ("b", 2)]
+    assert queue.get_statistics()["collapsed"] == 1
+
+
+@pytest.mark.driver_unit
+def test_publish_should_retry_with_backoff():
+    recorder = Recorder(failures=2)
+    queue = PublishQueue(recorder, retry_on=(Busy,), backoff=0.001)
+
+    queue.put("a", {}, 1)
+    gevent.sleep(0.05)
+
+    assert recorder.published == [("a", 1)]
+    stats = queue.get_statistics()
+    assert (stats["retries"], stats["failed"]) == (2, 0)
+
+
+@pytest.mark.driver_unit
+def test_publish_should_give_up_on_other_errors():
+    recorder = Recorder(failures=1, exception=ValueError)
+    queue = PublishQueue(recorder, retry_on=(Busy,))
+
+    queue.put("a", {}, 1)
+    queue.put("b", {}, 2)
+    gevent.sleep(0)
+
+    assert recorder.published == [("b", 2)]
+    assert queue.get_statistics()["failed"] == 1
+
+
+@pytest.mark.driver_unit
+def test_invalid_overflow_should_raise():
+    with pytest.raises(ValueError):
+        PublishQueue(Recorder(), overflow="newest")
+
+
+@pytest.mark.driver_unit
+def test_put_should_queue_message_once_for_all_topics():
+    recorder = Recorder()
+    queue = PublishQueue(recorder)
+
+    queue.put(["depth", "breadth"], {}, 1)
+    queue.put([], {}, 2)
+    assert len(queue) == 1
+    gevent.sleep(0)
+
+    assert recorder.published == [("depth", 1), ("breadth", 1)]
+    stats = queue.get_statistics()
+    assert (stats["enqueued"], stats["published"]) == (1, 2)
+
+
+@pytest.mark.driver_unit
+def test_failed_publish_should_be_passed_to_on_failure():
+    failed = []
+    queue = PublishQueue(Recorder(failures=2), retry_on=(Busy,), max_retries=1, backoff=0.0,
+                         on_failure=lambda topic, headers, message: failed.append((topic, headers, message)))
+
+    assert queue.is_idle()
+    queue.put(["a", "b"], {"SyncTimeStamp": "t"}, 1)
+    assert not queue.is_idle()
+    gevent.sleep(0.01)
+
+    assert failed == [("a", {"SyncTimeStamp": "t"}, 1)]
+    assert queue.is_idle()
+
+
+@pytest.mark.driver_unit
+def test_stop_should_leave_queue_usable():
+    recorder = Recorder()
+    queue = PublishQueue(recorder, workers=2)
+    queue.put("a", {}, 1)
+    queue.put("b", {}, 2)
+
+    queue.stop()
+    gevent.sleep(0)
+    assert queue.get_statistics()["workers"] == 0
+    assert queue.is_idle()
+
+    queue.put("c", {}, 3)
+    assert queue.get_statistics()["workers"] == 1
+    gevent.sleep(0)
+
+    assert recorder.published == [("c", 3)]
+    assert queue.get_statistics()["workers"] == 0
+    assert queue.is_idle()
+
+
+@pytest.mark.driver_unit
+def test_stop_should_pass_waiting_messages_to_on_failure():
+    failed = []
+    queue = PublishQueue(Recorder(), on_failure=lambda topic, headers, message: failed.append((topic, message)))
+    queue.put(["a", "b"], {}, 1)
+    queue.put("c", {}, 2)
+
+    queue.stop()
+
+    assert failed == [("a", 1), ("b", 1), ("c", 2)]
+    assert queue.get_statistics()["failed"] == 3
+
+
+@pytest.mark.driver_unit
+@pytest.mark.parametrize("max_retries", [None, -1])
+def test_publish_without_retry_limit_should_retry_until_published(max_retries):
+    recorder = Recorder(failures=8)
+    queue = PublishQueue(recorder, retry_on=(Busy,), max_retries=max_retries, backoff=0.0)
+
+    queue.put("a", {}, 1)
+    gevent.sleep(0.05)
+
+    assert recorder.published == [("a", 1)]
+    stats = queue.get_statistics()
+    assert (stats["retries"], stats["failed"]) == (8, 0)
+
+
+@pytest.mark.driver_unit
+def test_message_queued_as_publisher_exits_should_be_published():
+    recorder = Recorder()
+    queue = PublishQueue(recorder, workers=1)
+
+    queue.put("a", {}, 1)
+    gevent.sleep(0)
+    # The publisher has finished but the group has not yet dropped it on its own.
+    queue.put("b", {}, 2)
+    gevent.sleep(0)
+
+    assert recorder.published == [("a", 1), ("b", 2)]
+
+
+@pytest.mark.driver_unit
+def test_take_over_should_move_waiting_messages():
+    old_recorder, new_recorder = Recorder(), Recorder()
+    old_queue = PublishQueue(old_recorder)
+    new_queue = PublishQueue(new_recorder)
+    old_queue.put("a", {}, 1)
+    old_queue.put(["b", "c"], {}, 2)
+
+    new_queue.take_over(old_queue)
+    gevent.sleep(0)
+
+    assert old_recorder.published == []
+    assert new_recorder.published == [("a", 1), ("b", 2), ("c", 2)]
+    assert len(old_queue) == 0
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import pytest
+
+from platform_driver.registry_cache import RegistryCache, metadata_version
+
+
+def make_registry(points=3):
+    return [{"Point Name": "Point{}".format(i), "Units": "degF", "Writable": "TRUE"} for i in range(points)]
+
+
+@pytest.mark.driver_unit
+def test_acquire_should_share_identical_registries():
+    cache = RegistryCache()
+
+    key1, rows1 = cache.acquire(make_registry())
+    key2, rows2 = cache.acquire(make_registry())
+    key3, rows3 = cache.acquire(make_registry(points=2))
+
+    assert key1 == key2 != key3
+    assert rows1 is rows2
+    assert rows1 is not rows3
+    assert rows1 == make_registry()
+    assert cache.get_statistics()["registries"] == 2
+    assert cache.get_statistics()["rows_saved"] == 3
+
+
+@pytest.mark.driver_unit
+def test_release_should_drop_unused_registries():
+    cache = RegistryCache()
+    key, rows = cache.acquire(make_registry())
+    cache.acquire(make_registry())
+
+    cache.release(key)
+    assert cache.get_statistics()["devices"] == 1
+    cache.release(key)
+    assert cache.get_statistics()["registries"] == 0
+    assert cache.acquire(make_registry())[1] is not rows
+
+
+@pytest.mark.driver_unit
+def test_acquire_should_pass_through_unsharable_registries():
+    cache = RegistryCache()
+
+    assert cache.acquire(None) == (None, None)
+    assert cache.acquire("a,b\n1,2") == (None, "a,b\n1,2")
+    cache.release(None)
+
+
+@pytest.mark.driver_unit
+def test_share_meta_data_should_share_equal_metadata():
+    cache = RegistryCache()
+    key, _ = cache.acquire(make_registry())
+
+    meta1 = cache.share_meta_data(key, {"Point0": {"units": "degF", "type": "float", "tz": ""},
+                                        "Point1": {"units": "degF", "type": "float", "tz": ""}})
+    meta2 = cache.share_meta_data(key, {"Point0": {"units": "degF", "type": "float", "tz": ""},
+                                        "Point1": {"units": "degF", "type": "float", "tz": ""}})
+    meta3 = cache.share_meta_data(None, {"Point0": {"units": "degF", "type": "float", "tz": ""}})
+
+    assert meta1 is meta2
+    assert meta1["Point0"] is meta1["Point1"] is meta3["Point0"]
+    assert meta1 == {"Point0": {"units": "degF", "type": "float", "tz": ""},
+                     "Point1": {"units": "degF", "type": "float", "tz": ""}}
+
+
+@pytest.mark.driver_unit
+def test_release_should_drop_point_meta_data_of_unused_registries():
+    cache = RegistryCache()
+    key1, _ = cache.acquire(make_registry())
+    key2, _ = cache.acquire(make_registry() + [{"Point Name": "Extra"}])
+    shared_point = {"units": "degF", "type": "float", "tz": ""}
+    cache.share_meta_data(key1, {"Point0": dict(shared_point), "Point1": {"units": "%", "type": "float", "tz": ""}})
+    cache.share_meta_data(key2, {"Point0": dict(shared_point)})
+    cache.share_meta_data(None, {"Other": {"units": "W", "type": "float", "tz": ""}})
+    assert cache.get_statistics()["point_meta_data"] == 2
+
+    cache.release(key1)
+    assert cache.get_statistics()["point_meta_data"] == 1
+
+    cache.release(key2)
+    assert cache.get_statistics()["point_meta_data"] == 0
+
+
+@pytest.mark.driver_unit
+def test_metadata_version_should_depend_on_content_and_point_order():
+    meta = {"a": {"units": "degF", "type": "float", "tz": ""}, "b": {"units": "%", "type": "float", "tz": ""}}
+    same = {"a": {"tz": "", "type": "float", "units": "degF"}, "b": {"tz": "", "type": "float", "units": "%"}}
+    reordered = {"b": meta["b"], "a": meta["a"]}
+
+    assert metadata_version(meta) == metadata_version(same)
+    assert metadata_version(meta) != metadata_version(reordered)
+    assert metadata_version(meta) != metadata_version({"a": meta["a"]})
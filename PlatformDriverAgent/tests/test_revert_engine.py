@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import gevent
+import pytest
+
+from platform_driver.revert_engine import RevertEngine
+
+
+def make_revert(device, log, delay=0.0, error=None):
+    def revert():
+        log.append(("start", device))
+        gevent.sleep(delay)
+        if error is not None:
+            raise error
+        log.append(("end", device))
+    return revert
+
+
+def wait_for(engine, job_id, timeout=5.0):
+    with gevent.Timeout(timeout):
+        while not engine.get_job(job_id)["done"]:
+            gevent.sleep(0.01)
+    return engine.get_job(job_id)
+
+
+@pytest.mark.driver_unit
+def test_submit_should_revert_every_device_and_report_progress():
+    engine = RevertEngine()
+    log = []
+    reverts = [("device{}".format(i), None, make_revert("device{}".format(i), log)) for i in range(5)]
+
+    job_id = engine.submit(reverts, pattern="device*")
+    status = wait_for(engine, job_id)
+
+    assert status["total"] == 5
+    assert status["reverted"] == 5
+    assert status["pending"] == status["running"] == status["failed"] == 0
+    assert status["pattern"] == "device*"
+    assert set(status["devices"].values()) == {"reverted"}
+    assert engine.get_jobs()[0]["job_id"] == job_id
+    assert "devices" not in engine.get_jobs()[0]
+
+
+@pytest.mark.driver_unit
+def test_submit_should_bound_concurrency():
+    engine = RevertEngine(concurrency=2)
+    running = []
+    peak = []
+
+    def revert():
+        running.append(1)
+        peak.append(len(running))
+        gevent.sleep(0.02)
+        running.pop()
+
+    job_id = engine.submit([("device{}".format(i), None, revert) for i in range(6)])
+    status = wait_for(engine, job_id)
+
+    assert status["reverted"] == 6
+    assert max(peak) == 2
+
+
+@pytest.mark.driver_unit
+def test_submit_should_start_no_more_workers_than_concurrency():
+    engine = RevertEngine(concurrency=3)
+    log = []
+
+    job_id = engine.submit([("device{}".format(i), None, make_revert("device{}".format(i), log)) for i in range(100)])
+
+    assert len(engine._workers) == 3
+    assert wait_for(engine, job_id)["reverted"] == 100
+    gevent.sleep(0)
+    assert len(engine._workers) == 0
+
+
+@pytest.mark.driver_unit
+def test_submit_should_bound_concurrency_per_endpoint():
+    engine = RevertEngine(concurrency=0, per_endpoint=1)
+    running = {"gw1": 0, "gw2": 0}
+    peak = {"gw1": 0, "gw2": 0}
+
+    def make(endpoint):
+        def revert():
+            running[endpoint] += 1
+            peak[endpoint] = max(peak[endpoint], running[endpoint])
+            gevent.sleep(0.02)
+            running[endpoint] -= 1
+        return revert
+
+    reverts = [("device{}".format(i), "gw{}".format(i % 2 + 1), make("gw{}".format(i % 2 + 1))) for i in range(6)]
+    wait_for(engine, engine.submit(reverts))
+
+    assert peak == {"gw1": 1, "gw2": 1}
+
+
+@pytest.mark.driver_unit
+def test_submit_should_interleave_devices_by_endpoint():
+    engine = RevertEngine(concurrency=1)
+    log = []
+    reverts = [("a1", "a", make_revert("a1", log)), ("a2", "a", make_revert("a2", log)),
+               ("a3", "a", make_revert("a3", log)), ("b1", "b", make_revert("b1", log))]
+
+    wait_for(engine, engine.submit(reverts))
+
+    assert [device for event, device in log if event == "start"] == ["a1", "b1", "a2", "a3"]
+
+
+@pytest.mark.driver_unit
+def test_submit_should_stagger_starts():
+    engine = RevertEngine()
+    log = []
+    reverts = [("device{}".format(i), None, make_revert("device{}".format(i), log)) for i in range(3)]
+
+    job_id = engine.submit(reverts, stagger=0.1)
+    gevent.sleep(0.05)
+
+    assert log == [("start", "device0"), ("end", "device0")]
+    status = wait_for(engine, job_id)
+    assert status["reverted"] == 3
+    assert status["finished"] - status["started"] >= 0.15
+
+
+@pytest.mark.driver_unit
+def test_submit_should_report_failures_and_timeouts():
+    engine = RevertEngine(timeout=0.05)
+    log = []
+    reverts = [("ok", None, make_revert("ok", log)),
+               ("broken", None, make_revert("broken", log, error=ValueError("no route"))),
+               ("slow", None, make_revert("slow", log, delay=1.0))]
+
+    status = wait_for(engine, engine.submit(reverts))
+
+    assert status["devices"] == {"ok": "reverted", "broken": "failed", "slow": "timed_out"}
+    assert "no route" in status["errors"]["broken"]
+    assert "slow" in status["errors"]
+
+
+@pytest.mark.driver_unit
+def test_submit_should_not_report_other_timeouts_as_revert_timeouts():
+    engine = RevertEngine(timeout=5.0)
+    log = []
+    reverts = [("inner", None, make_revert("inner", log, error=gevent.Timeout(0.01)))]
+
+    status = wait_for(engine, engine.submit(reverts))
+
+    assert status["devices"] == {"inner": "failed"}
+
+
+@pytest.mark.driver_unit
+def test_engine_should_keep_only_recent_jobs():
+    engine = RevertEngine(max_jobs=2)
+    job_ids = [engine.submit([]) for _ in range(3)]
+
+    assert engine.get_job(job_ids[0]) is None
+    assert [job["job_id"] for job in engine.get_jobs()] == job_ids[1:]
+    assert engine.get_job(job_ids[2])["done"]
@@ -179,3 +179,29 @@ def test_revert_no_default_changing_value():
     interface.revert_point("FloatNoDefault")
     temp_value = interface.get_point("FloatNoDefault")
     assert temp_value == new_value
+
+
+class BatchingInterface(Interface):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    def _set_points(self, point_values):
+        self.batches.append(dict(point_values))
+        return super()._set_points(point_values)
+
+
+@pytest.mark.driver
+def test_revert_all_should_set_points_in_one_batch():
+    interface = BatchingInterface()
+    interface.configure({}, registry_config)
+    initial_value = interface.get_point("FloatNoDefault")
+    interface.scrape_all()
+
+    interface.set_point("Float", 25.0)
+    interface.set_point("FloatNoDefault", initial_value + 1.0)
+    interface.revert_all()
+
+    assert interface.batches == [{"Float": 50.0, "FloatNoDefault": initial_value}]
+    assert interface.get_point("Float") == 50.0
+    assert interface.get_point("FloatNoDefault") == initial_value
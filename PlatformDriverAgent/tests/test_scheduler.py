@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+from datetime import timedelta
+
+import gevent
+import gevent.event
+import pytest
+
+from platform_driver.scheduler import ScrapeScheduler, TickClock
+
+
+@pytest.mark.driver_unit
+def test_pop_due_should_return_due_scrapes_in_deadline_order():
+    scheduler = ScrapeScheduler(spawn=lambda *args: None)
+    now = scheduler.now()
+
+    later = scheduler.schedule(now + timedelta(seconds=2), None)
+    second = scheduler.schedule(now - timedelta(seconds=1), None)
+    first = scheduler.schedule(now - timedelta(seconds=2), None)
+
+    assert scheduler.pop_due(now) == [first, second]
+    assert len(scheduler) == 1
+    assert 1.0 < scheduler.next_timeout(now) <= 2.0
+    later.cancel()
+    assert scheduler.next_timeout(now) is None
+
+
+@pytest.mark.driver_unit
+def test_pop_due_should_skip_cancelled_scrapes():
+    scheduler = ScrapeScheduler(spawn=lambda *args: None)
+    now = scheduler.now()
+
+    scheduler.schedule(now, None).cancel()
+
+    assert scheduler.pop_due(now) == []
+
+
+@pytest.mark.driver_unit
+def test_pending_should_not_count_cancelled_scrapes():
+    scheduler = ScrapeScheduler(spawn=lambda *args: None)
+    now = scheduler.now()
+
+    due = scheduler.schedule(now, None)
+    later = scheduler.schedule(now + timedelta(seconds=2), None)
+    later.cancel()
+    later.cancel()
+
+    assert len(scheduler) == 1
+    assert scheduler.get_statistics()["pending"] == 1
+    assert scheduler.pop_due(now) == [due]
+    # Cancelling a scrape that already left the heap changes nothing.
+    due.cancel()
+    assert len(scheduler) == 0
+    assert scheduler.next_timeout(now) is None
+    assert scheduler.get_statistics()["pending"] == 0
+
+
+@pytest.mark.driver_unit
+def test_scheduler_should_dispatch_scrapes_in_batches():
+    scheduler = ScrapeScheduler()
+    results = []
+    deadline = scheduler.now() + timedelta(seconds=0.05)
+
+    for i in range(100):
+        scheduler.schedule(deadline, results.append, i)
+    gevent.sleep(0.2)
+
+    try:
+        assert sorted(results) == list(range(100))
+        stats = scheduler.get_statistics()
+        assert stats["dispatched"] == 100
+        assert stats["batches"] == 1
+        assert stats["pending"] == 0
+    finally:
+        scheduler.stop()
+
+
+@pytest.mark.driver_unit
+def test_scheduler_should_not_hold_up_scrapes_behind_a_blocked_scrape():
+    scheduler = ScrapeScheduler()
+    release = gevent.event.Event()
+    results = []
+    deadline = scheduler.now() + timedelta(seconds=0.05)
+
+    scheduler.schedule(deadline, lambda: (release.wait(), results.append("blocked")))
+    for i in range(10):
+        scheduler.schedule(deadline, results.append, i)
+    gevent.sleep(0.2)
+
+    try:
+        assert results == list(range(10))
+        release.set()
+        gevent.sleep(0)
+        assert results[-1] == "blocked"
+        assert scheduler.get_statistics()["dispatched"] == 11
+    finally:
+        scheduler.stop()
+
+
+@pytest.mark.driver_unit
+def test_tick_clock_should_share_headers_within_a_tick():
+    clock = TickClock(resolution=60.0)
+    slot = ScrapeScheduler.now()
+
+    first = clock.headers(slot)
+    second = clock.headers(slot)
+    other = clock.headers(slot + timedelta(seconds=1))
+
+    assert first is second
+    assert first["Date"] == first["TimeStamp"] == clock.now_string()
+    assert first["SynchronizedTimeStamp"] == slot.isoformat()
+    assert other["SynchronizedTimeStamp"] == (slot + timedelta(seconds=1)).isoformat()
+    assert clock.get_statistics() == {"resolution": 60.0, "ticks": 1, "shared_headers": 1}
+
+
+@pytest.mark.driver_unit
+def test_tick_clock_without_resolution_should_read_time_every_call():
+    clock = TickClock(resolution=0.0, formatter=lambda timestamp: "formatted")
+    slot = ScrapeScheduler.now()
+
+    first = clock.headers(slot)
+    second = clock.headers(slot)
+
+    assert first is not second
+    assert first == {"Date": "formatted", "TimeStamp": "formatted", "SynchronizedTimeStamp": "formatted"}
+    assert clock.ticks == 2
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+from collections import Counter
+
+import pytest
+
+from platform_driver.sharding import shard_for_device
+
+
+@pytest.mark.driver_unit
+def test_shard_for_device_should_be_stable_and_spread_devices():
+    topics = ["campus/building/device{}".format(i) for i in range(1000)]
+
+    shards = [shard_for_device(topic, 0, 4) for topic in topics]
+
+    assert shards == [shard_for_device(topic, 0, 4) for topic in topics]
+    assert set(shards) == {0, 1, 2, 3}
+    assert min(Counter(shards).values()) > 150
+
+
+@pytest.mark.driver_unit
+def test_shard_for_device_should_ignore_topic_case():
+    assert shard_for_device("Campus/Device", 0, 8) == shard_for_device("campus/device", 0, 8)
+
+
+@pytest.mark.driver_unit
+def test_shard_for_device_by_group():
+    assert [shard_for_device("device", group, 3, "group") for group in range(5)] == [0, 1, 2, 0, 1]
+
+
+@pytest.mark.driver_unit
+def test_single_shard_should_own_everything():
+    assert shard_for_device("campus/building/device", 7, 1) == 0
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import pytest
+
+from platform_driver.slot_allocator import SlotAllocator
+
+
+@pytest.mark.driver_unit
+def test_add_should_fill_empty_slots_in_order():
+    allocator = SlotAllocator(1.0)
+
+    slots = [allocator.add("device{}".format(i), 60) for i in range(5)]
+
+    assert slots == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.driver_unit
+def test_slow_device_should_be_moved_away_from_busy_slots():
+    allocator = SlotAllocator(1.0, replan_threshold=0.5)
+    allocator.smoothing = 1.0
+    for i in range(4):
+        allocator.add("device{}".format(i), 60)
+
+    new_slot = allocator.record_duration("device0", 10.0)
+
+    assert new_slot is not None
+    assert max(allocator.get_load()) == 1
+
+
+@pytest.mark.driver_unit
+def test_remove_should_free_load():
+    allocator = SlotAllocator(1.0)
+    allocator.add("device0", 60)
+    allocator.add("device1", 60)
+
+    allocator.remove("device0")
+
+    assert "device0" not in allocator
+    assert sum(allocator.get_load()) == 1
+    assert allocator.add("device2", 60) == 0
+
+
+@pytest.mark.driver_unit
+def test_replan_should_place_slowest_devices_first():
+    allocator = SlotAllocator(1.0)
+    allocator.smoothing = 1.0
+    allocator.replan_threshold = 100.0
+    allocator.add("fast", 60)
+    allocator.add("slow", 60)
+    allocator.record_duration("slow", 5.0)
+
+    slots = allocator.update_intervals(1.0, 0.0)
+
+    assert slots["slow"] == 0
+    assert slots["fast"] == 5
+    assert max(allocator.get_load()) == 1
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+import pytest
+
+from platform_driver.subscriptions import SubscriptionCache
+
+
+@pytest.mark.driver_unit
+def test_has_subscribers_should_be_true_until_first_update():
+    cache = SubscriptionCache()
+
+    assert cache.has_subscribers("devices/campus/device/point")
+    assert cache.get_statistics()["prefixes"] is None
+
+
+@pytest.mark.driver_unit
+def test_has_subscribers_should_match_prefixes():
+    cache = SubscriptionCache()
+    cache.update(["devices/campus/building/device/all", "analysis/"])
+
+    assert cache.has_subscribers("devices/campus/building/device/all")
+    assert not cache.has_subscribers("devices/campus/building/device/point")
+    assert not cache.has_subscribers("devices/point/device/building/campus")
+
+    cache.update(["devices"])
+
+    assert cache.has_subscribers("devices/campus/building/device/point")
+    stats = cache.get_statistics()
+    assert (stats["updates"], stats["topics_checked"], stats["topics_without_subscribers"]) == (2, 1, 0)
+
+
+@pytest.mark.driver_unit
+def test_empty_prefix_should_match_everything():
+    cache = SubscriptionCache()
+    cache.update([""])
+
+    assert cache.has_subscribers("anything/at/all")
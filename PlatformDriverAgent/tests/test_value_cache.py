@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+from unittest import mock
+
+import pytest
+
+from platform_driver import value_cache
+from platform_driver.value_cache import ValueCache
+
+
+@pytest.mark.driver_unit
+def test_get_should_return_values_no_older_than_max_age():
+    cache = ValueCache()
+    with mock.patch.object(value_cache, "monotonic", return_value=100.0):
+        cache.update({"a": 1, "b": 2})
+    with mock.patch.object(value_cache, "monotonic", return_value=105.0):
+        assert cache.get("a", 10.0) == (True, 1)
+        assert cache.get("a", 2.0) == (False, None)
+        assert cache.get("missing", 10.0) == (False, None)
+        assert cache.get_many(["a", "b", "c"], 10.0) == ({"a": 1, "b": 2}, ["c"])
+
+    assert cache.get_statistics() == {"points": 2, "hits": 3, "misses": 3, "hit_rate": 0.5}
+
+
+@pytest.mark.driver_unit
+def test_invalidate_should_forget_values():
+    cache = ValueCache()
+    cache.update({"a": 1, "b": 2})
+    cache.set("c", 3)
+
+    cache.invalidate("a")
+    assert cache.get("a", 60.0) == (False, None)
+    assert cache.get("c", 60.0) == (True, 3)
+
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+@pytest.mark.driver_unit
+def test_reads_started_before_a_write_should_not_restore_old_values():
+    cache = ValueCache()
+    scrape = cache.generation()
+    read = cache.generation()
+
+    cache.invalidate("a")
+    cache.update({"a": 1, "b": 2}, scrape)
+    cache.set("a", 1, read)
+    assert cache.get("a", 60.0) == (False, None)
+    assert cache.get("b", 60.0) == (True, 2)
+
+    cache.update({"a": 3}, cache.generation())
+    assert cache.get("a", 60.0) == (True, 3)
+
+    scrape = cache.generation()
+    cache.invalidate()
+    cache.update({"a": 1, "b": 1}, scrape)
+    assert len(cache) == 0
+    assert cache.written_since("b", scrape)
+    assert not cache.written_since("b", cache.generation())
+
+
+@pytest.mark.driver_unit
+def test_snapshot_should_return_matching_points_with_age():
+    cache = ValueCache()
+    with mock.patch.object(value_cache, "monotonic", return_value=100.0):
+        cache.update({"ZoneTemperature": 21.5, "DamperPosition": 40})
+    with mock.patch.object(value_cache, "monotonic", return_value=103.0):
+        assert cache.snapshot() == {"ZoneTemperature": (21.5, 3.0), "DamperPosition": (40, 3.0)}
+        assert cache.snapshot(["*Temperature"]) == {"ZoneTemperature": (21.5, 3.0)}
+
+    assert cache.get_statistics()["hits"] == 0